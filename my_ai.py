@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 import streamlit as st
 # 1. 这里改了：
@@ -6,9 +7,12 @@ from langchain_openai import ChatOpenAI
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
 from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import CharacterTextSplitter
 from langchain_core.documents import Document
 
+# 和后端共用同一套切分配置 (server/chunking.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server"))
+from chunking import create_splitter
+
 st.set_page_config(page_title="我的 AI 知识库", page_icon="🤖")
 st.title("🤖 企业知识库问答 Demo")
 
@@ -39,8 +43,7 @@ knowledge_base_content = """
 
 @st.cache_resource
 def load_db():
-    text_splitter = CharacterTextSplitter(separator="\n", chunk_size=100, chunk_overlap=10)
-    docs = [Document(page_content=x) for x in text_splitter.split_text(knowledge_base_content)]
+    docs = create_splitter(profile="text").split_documents([Document(page_content=knowledge_base_content)])
     
     # 2. 这里改了：使用本地模型，而不是 API
     embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
@@ -0,0 +1,161 @@
+# server/admission.py
+# 🚦 聊天请求准入控制：每个模型固定几个并发名额 + 有上限的等待队列，排不上的直接 429
+# 短问题走优先通道先拿名额；客户端一断开就取消上游 LLM 的流，名额马上还回来
+# 只在事件循环里用 (没有加线程锁)
+import asyncio
+import time
+from collections import deque
+from contextlib import suppress
+
+from starlette.responses import StreamingResponse
+
+from observability import CHAT_ADMISSION_REJECTED, CHAT_ADMISSION_WAIT_SECONDS
+
+
+class Overloaded(Exception):
+    """排队的请求已经满了，或者等名额等超时了；接口层回 429。"""
+
+    def __init__(self, gate, reason):
+        super().__init__(f"{gate} 繁忙 ({reason})")
+        self.gate = gate
+        self.reason = reason
+
+
+class _QueueTimeout(Exception):
+    """排队等名额超时 (只在 AdmissionGate 内部用，对外换成 Overloaded)。"""
+
+
+class Ticket:
+    """拿到的一个并发名额；release() 可以重复调用，只有第一次生效。"""
+
+    def __init__(self, gate):
+        self._gate = gate
+
+    def release(self):
+        if self._gate is not None:
+            gate, self._gate = self._gate, None
+            gate._release()
+
+
+class AdmissionGate:
+    """一个模型的名额：同时最多 capacity 个请求在跑，最多 max_queue 个在排队。
+
+    排队分两条通道：短问题 (priority) 和普通问题。有名额空出来时短问题优先，
+    但连续给了 short_lane_burst 个短问题之后必须让一个普通问题，普通问题不会被饿死。
+    名额空出来时直接交给下一个排队的 (active 不变)，不会被新来的请求插队抢走。
+    """
+
+    def __init__(self, name, capacity, max_queue, queue_timeout, short_lane_burst=4):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.short_lane_burst = short_lane_burst
+        self.active = 0
+        self._short = deque()
+        self._normal = deque()
+        self._short_streak = 0
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def waiting(self):
+        return len(self._short) + len(self._normal)
+
+    async def acquire(self, priority=False):
+        lane_name = "short" if priority else "normal"
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            CHAT_ADMISSION_WAIT_SECONDS.labels(self.name, lane_name).observe(0)
+            return Ticket(self)
+        if self.waiting >= self.max_queue:
+            CHAT_ADMISSION_REJECTED.labels(self.name, "queue_full").inc()
+            raise Overloaded(self, "queue_full")
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        lane = self._short if priority else self._normal
+        lane.append(future)
+        # 超时自己用定时器做，不用 wait_for：3.11 的 wait_for 在名额刚交到手上时会吞掉外面的取消
+        timer = loop.call_later(self.queue_timeout, self._expire, future)
+        try:
+            await future
+        except _QueueTimeout:
+            with suppress(ValueError):
+                lane.remove(future)
+            CHAT_ADMISSION_REJECTED.labels(self.name, "queue_timeout").inc()
+            raise Overloaded(self, "queue_timeout") from None
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release()  # 名额刚交到手上就被取消了 (客户端断开)，交给下一个
+            else:
+                future.cancel()
+                with suppress(ValueError):
+                    lane.remove(future)
+            raise
+        finally:
+            timer.cancel()
+        CHAT_ADMISSION_WAIT_SECONDS.labels(self.name, lane_name).observe(time.perf_counter() - start)
+        return Ticket(self)
+
+    @staticmethod
+    def _expire(future):
+        if not future.done():
+            future.set_exception(_QueueTimeout())
+
+    def _next_waiter(self):
+        while self._short or self._normal:
+            if self._short and (not self._normal or self._short_streak < self.short_lane_burst):
+                future = self._short.popleft()
+                self._short_streak += 1
+            else:
+                future = self._normal.popleft()
+                self._short_streak = 0
+            if not future.done():
+                return future
+        return None
+
+    def _release(self):
+        future = self._next_waiter()
+        if future is None:
+            self.active -= 1
+        else:
+            future.set_result(None)
+
+    def stats(self):
+        return {"active": self.active, "capacity": self.capacity, "waiting": self.waiting, "max_queue": self.max_queue}
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """带着准入名额的流式响应。
+
+    - 一边推流一边监听 http.disconnect：客户端断开时立刻取消推流任务，正在等的 LLM 流跟着被取消，
+      不用等到下一个字发送失败才发现 (starlette 在 ASGI 2.4 下只靠发送失败发现断开)
+    - 结束时 (正常结束、断开、出错都算) 关闭 body 生成器并归还名额；生成器还没开始跑也不会漏还
+    """
+
+    def __init__(self, content, ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            stream = asyncio.ensure_future(self.stream_response(send))
+            watcher = asyncio.ensure_future(self.listen_for_disconnect(receive))
+            try:
+                await asyncio.wait({stream, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in (stream, watcher):
+                    task.cancel()
+            with suppress(asyncio.CancelledError, OSError):
+                await stream
+            with suppress(asyncio.CancelledError):
+                await watcher
+        finally:
+            with suppress(Exception):
+                await self.body_iterator.aclose()
+            self.ticket.release()
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,157 @@
+# server/ann_index.py
+# 🧭 可插拔的 ANN 索引：flat (精确) / ivf_flat / hnsw / ivf_pq，外加 mmap 方式加载索引文件
+import logging
+import os
+import pickle
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+import config
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+
+def _vectors_of(index):
+    # 所有索引类型都支持 reconstruct (ivf_pq 是有损还原，够用来重新训练/重建)
+    # IVF 需要临时建 direct map 才能按位置还原，用完再关掉，不影响之后的 remove/add
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+        vectors = index.reconstruct_n(0, index.ntotal)
+        index.make_direct_map(False)
+        return vectors
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def centroid(index, batch_size=65536):
+    """所有向量的均值 (分批还原，不再额外占一整份向量的内存)；空索引返回 None。"""
+    if index.ntotal == 0:
+        return None
+    ivf = isinstance(index, faiss.IndexIVF)
+    if ivf:
+        index.make_direct_map()
+    try:
+        total = np.zeros(index.d, dtype=np.float64)
+        for start in range(0, index.ntotal, batch_size):
+            total += index.reconstruct_n(start, min(batch_size, index.ntotal - start)).sum(axis=0)
+    finally:
+        if ivf:
+            index.make_direct_map(False)
+    return (total / index.ntotal).astype(np.float32)
+
+
+def build_index(index_type, vectors):
+    """按类型新建一个索引并加入 vectors；IVF 类会先用这批向量训练。"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.HNSW_M)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        # 经验值：每个聚类中心至少 39 个训练样本，数据不够时自动缩小 nlist
+        nlist = max(1, min(config.IVF_NLIST, n // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.PQ_M, config.PQ_NBITS)
+        index.train(vectors)
+    else:
+        raise ValueError(f"⚠️ 不支持的索引类型: {index_type}，可选: {INDEX_TYPES}")
+    index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+# 🎛️ 把 nprobe / efSearch 设置到索引上 (每次新建或加载后调用)
+def apply_search_params(index):
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = config.IVF_NPROBE
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.HNSW_EF_SEARCH
+
+
+def index_type_of(index):
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def maybe_upgrade(vector_store):
+    """配置的不是 flat 时，切片数达到 INDEX_TRAIN_MIN 就把精确索引换成 ANN 索引 (首次训练)。
+
+    向量从旧索引里 reconstruct 出来，不需要重新嵌入；位置顺序不变，index_to_docstore_id 照旧可用。
+    返回是否发生了升级。
+    """
+    target = config.INDEX_TYPE
+    index = vector_store.index
+    if target == "flat" or index_type_of(index) != "flat" or index.ntotal < config.INDEX_TRAIN_MIN:
+        return False
+    logger.info(f"🧭 [RAG] 切片数 {index.ntotal} 达到阈值，正在把 flat 索引训练升级为 {target} ...")
+    vector_store.index = build_index(target, _vectors_of(index))
+    return True
+
+
+def delete_ids(vector_store, ids):
+    """按 docstore ID 删除向量。
+
+    flat 索引直接走 FAISS.delete (remove_ids 会把后面的位置往前挪，和 index_to_docstore_id 对得上)。
+    HNSW 不支持 remove_ids，IVF 删除后位置不会重排，和 LangChain 的位置映射对不上，
+    所以这两类用 “克隆索引 + reset + 加回剩下的向量” 重建：保留训练结果，也不需要重新嵌入。
+    """
+    if index_type_of(vector_store.index) == "flat":
+        vector_store.delete(ids)
+        return
+
+    doomed = set(ids)
+    keep = [pos for pos, doc_id in sorted(vector_store.index_to_docstore_id.items()) if doc_id not in doomed]
+    vectors = _vectors_of(vector_store.index)[keep]
+    new_index = faiss.clone_index(vector_store.index)
+    new_index.reset()
+    if len(keep):
+        new_index.add(np.ascontiguousarray(vectors))
+    apply_search_params(new_index)
+
+    vector_store.index_to_docstore_id = {
+        new_pos: vector_store.index_to_docstore_id[old_pos] for new_pos, old_pos in enumerate(keep)
+    }
+    vector_store.docstore.delete([doc_id for doc_id in doomed if doc_id in vector_store.docstore._dict])
+    vector_store.index = new_index
+
+
+def load_store(folder_path, embeddings, mmap=False, index_name="index"):
+    """和 FAISS.load_local 读同样的文件，但可以用 mmap 方式打开 .faiss 文件 (只读，写之前要换成 load_writable_index)。
+
+    FAISS 有 IO_FLAG_MMAP_IFC 时用它：flat / HNSW 的向量和 IVF 的倒排表都留在文件里，由操作系统按需分页，
+    多个进程打开同一个快照时页缓存里只有一份；HNSW 的邻接图、docstore (.pkl) 仍然每个进程各读一份。
+    老版本 FAISS 没有这个标志，只能退回 IO_FLAG_MMAP，它只映射 IVF 的倒排表，flat / HNSW 照样整份读进内存。
+    """
+    flags = 0
+    if mmap:
+        if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+        else:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    index = faiss.read_index(os.path.join(folder_path, f"{index_name}.faiss"), flags)
+    if mmap and not hasattr(faiss, "IO_FLAG_MMAP_IFC") and not isinstance(index, faiss.IndexIVF):
+        logger.warning(f"⚠️ [RAG] 当前 FAISS 没有 IO_FLAG_MMAP_IFC，{type(index).__name__} 索引没法 mmap，已整份读进内存")
+    apply_search_params(index)
+    with open(os.path.join(folder_path, f"{index_name}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+# 完整读进内存的可写版本 (IndexStore.make_writable 用)
+def load_writable_index(folder_path, index_name="index"):
+    index = faiss.read_index(os.path.join(folder_path, f"{index_name}.faiss"))
+    apply_search_params(index)
+    return index
@@ -0,0 +1,84 @@
+# server/answer_cache.py
+# 🗂️ 语义答案缓存：同一个模型、同一版知识库下，意思几乎一样的问题直接回放上次的答案
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """按 (问题向量, 模型名, 索引版本) 缓存完整答案。
+
+    - 查找：同模型同版本的条目里，余弦相似度 >= threshold 的最相似一条算命中
+    - 淘汰：超过 ttl_seconds 的过期，超过 max_entries 按 LRU 淘汰
+    - 知识库一变 (索引版本号 +1) 就调用 invalidate() 整体清空
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # entry_id -> (model_name, index_version, 单位向量, 答案, 写入时间)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def get(self, query_vector, model_name, index_version):
+        q = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            candidates = [
+                (entry_id, entry) for entry_id, entry in self._entries.items()
+                if entry[0] == model_name and entry[1] == index_version
+            ]
+            if candidates:
+                scores = np.stack([entry[2] for _, entry in candidates]) @ q
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry[3]
+            self.misses += 1
+            return None
+
+    def put(self, query_vector, model_name, index_version, answer):
+        with self._lock:
+            self._entries[self._next_id] = (model_name, index_version, self._normalize(query_vector), answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self, now):
+        # OrderedDict 按最近使用排序，不按写入时间，所以这里整体扫一遍
+        expired = [k for k, entry in self._entries.items() if now - entry[4] > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# 🔁 把缓存的答案切成小段，按流式的样子回放给前端
+def iter_replay(answer, piece_size=16):
+    for i in range(0, len(answer), piece_size):
+        yield answer[i:i + piece_size]
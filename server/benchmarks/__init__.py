@@ -0,0 +1,3 @@
+# server/benchmarks/
+# 📏 离线压测：合成语料 + 假嵌入模型 + 按固定速度吐字的假 LLM，不联网、不花 API 额度
+# 用法见 run.py
@@ -0,0 +1,202 @@
+# server/benchmarks/corpus.py
+# 📄 合成语料：直接拼 PDF / DOCX / XLSX 的文件结构，不依赖 reportlab / python-docx / openpyxl
+# 同一个 seed 生成的文件逐字节相同，压测结果才能前后对比
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+# PDF 用标准 Helvetica 字体，只能放 ASCII；DOCX / XLSX 里中英混排
+_ASCII_WORDS = (
+    "invoice contract policy budget quarterly revenue supplier warranty compliance audit "
+    "employee onboarding leave reimbursement travel approval deadline customer refund "
+    "inventory shipment server backup incident security password network license renewal"
+).split()
+_CJK_WORDS = (
+    "合同 报销 审批 流程 预算 季度 供应商 质保 合规 审计 员工 入职 请假 差旅 客户 退款 "
+    "库存 发货 服务器 备份 故障 安全 密码 网络 许可证 续期 部门 负责人 制度 附件"
+).split()
+
+
+def _sentence(rng, words, n_words):
+    return " ".join(rng.choice(words) for _ in range(n_words)) + "."
+
+
+def _paragraphs(rng, words, n, words_per_paragraph=60):
+    return [_sentence(rng, words, words_per_paragraph) for _ in range(n)]
+
+
+# ---------- PDF ----------
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, rng, lines_per_page=40, words_per_line=12):
+    """每页 lines_per_page 行文字的最小 PDF (pypdf 能正常抽出文本)。"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages，等所有页的对象号定下来再填
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for _ in range(pages):
+        lines = [_pdf_escape(_sentence(rng, _ASCII_WORDS, words_per_line)) for _ in range(lines_per_page)]
+        stream = ("BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_no = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_no
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{n} 0 R" for n in page_refs).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+# ---------- DOCX ----------
+_CONTENT_TYPES_DOCX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    "</Types>"
+)
+_RELS_DOCX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    "</Relationships>"
+)
+
+
+def write_docx(path, pages, rng, paragraphs_per_page=6):
+    """每“页”若干段落，页与页之间插分页符。"""
+    body = []
+    for page in range(pages):
+        if page:
+            body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+        for text in _paragraphs(rng, _CJK_WORDS + _ASCII_WORDS, paragraphs_per_page):
+            body.append(f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>')
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        + "".join(body)
+        + "</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _CONTENT_TYPES_DOCX)
+        z.writestr("_rels/.rels", _RELS_DOCX)
+        z.writestr("word/document.xml", document)
+
+
+# ---------- XLSX ----------
+_CONTENT_TYPES_XLSX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    "</Types>"
+)
+_RELS_XLSX = _RELS_DOCX.replace("word/document.xml", "xl/workbook.xml")
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/>'
+    "</Relationships>"
+)
+_XLSX_HEADER = ["编号", "部门", "事项", "金额", "说明"]
+
+
+def _cell(ref, value, shared):
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    return f'<c r="{ref}" t="s"><v>{shared.setdefault(value, len(shared))}</v></c>'
+
+
+def write_xlsx(path, rows, rng):
+    """一张表：表头 + rows 行数据。文本和 Excel 自己保存的一样放在 sharedStrings 里。"""
+    shared = {}
+    sheet_rows = []
+    for r in range(rows + 1):
+        if r == 0:
+            values = _XLSX_HEADER
+        else:
+            values = [
+                r,
+                rng.choice(_CJK_WORDS),
+                " ".join(rng.choice(_CJK_WORDS) for _ in range(3)),
+                round(rng.uniform(10, 100000), 2),
+                _sentence(rng, _CJK_WORDS + _ASCII_WORDS, 20),
+            ]
+        cells = "".join(_cell(f"{chr(65 + c)}{r + 1}", v, shared) for c, v in enumerate(values))
+        sheet_rows.append(f'<row r="{r + 1}">{cells}</row>')
+    sheet = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        + "".join(sheet_rows)
+        + "</sheetData></worksheet>"
+    )
+    strings = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" uniqueCount="{len(shared)}">'
+        + "".join(f"<si><t>{escape(text)}</t></si>" for text in shared)
+        + "</sst>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _CONTENT_TYPES_XLSX)
+        z.writestr("_rels/.rels", _RELS_XLSX)
+        z.writestr("xl/workbook.xml", _WORKBOOK)
+        z.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        z.writestr("xl/worksheets/sheet1.xml", sheet)
+        z.writestr("xl/sharedStrings.xml", strings)
+
+
+def generate_corpus(folder, files, pdf_pages, docx_pages, xlsx_rows, seed=42):
+    """每种格式各生成 files 个文件，返回 {".pdf": [(路径, 页数/行数), ...], ...}。"""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = {".pdf": [], ".docx": [], ".xlsx": []}
+    for i in range(files):
+        path = os.path.join(folder, f"bench-{i:03d}.pdf")
+        write_pdf(path, pdf_pages, rng)
+        corpus[".pdf"].append((path, pdf_pages))
+        path = os.path.join(folder, f"bench-{i:03d}.docx")
+        write_docx(path, docx_pages, rng)
+        corpus[".docx"].append((path, docx_pages))
+        path = os.path.join(folder, f"bench-{i:03d}.xlsx")
+        write_xlsx(path, xlsx_rows, rng)
+        corpus[".xlsx"].append((path, xlsx_rows))
+    return corpus
@@ -0,0 +1,57 @@
+# server/benchmarks/fakes.py
+# 🎭 压测用的假模型：哈希嵌入 (确定性、几乎不耗时) + 按固定速度吐字的本地 LLM
+import asyncio
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessageChunk
+
+
+class HashEmbeddings(Embeddings):
+    """同一段文本永远得到同一个单位向量 (用 crc32 当随机种子)。
+
+    量的是管线本身的开销 (解析 / 切分 / 写索引)，不含真实模型的推理时间；要带上模型就用 --embedding hf/onnx。
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _vector(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        v = rng.standard_normal(self.dim).astype(np.float32)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class FakeStreamingLLM:
+    """只实现 rag_core 用到的 stream / astream：等 ttft_ms 后按 tokens_per_second 每次吐一个字。"""
+
+    _TEXT = "根据已知信息，该流程需要部门负责人审批后提交财务复核，预计三个工作日内完成。"
+
+    def __init__(self, tokens_per_second=50, answer_tokens=100, ttft_ms=200):
+        self.interval = 1 / tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.ttft = ttft_ms / 1000
+
+    def _tokens(self):
+        for i in range(self.answer_tokens):
+            yield self._TEXT[i % len(self._TEXT)]
+
+    def stream(self, prompt):
+        time.sleep(self.ttft)
+        for token in self._tokens():
+            yield AIMessageChunk(content=token)
+            time.sleep(self.interval)
+
+    async def astream(self, prompt):
+        await asyncio.sleep(self.ttft)
+        for token in self._tokens():
+            yield AIMessageChunk(content=token)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,521 @@
+# server/benchmarks/run.py
+# 🏁 离线压测入口 (在 server/ 目录下运行)：
+#   python -m benchmarks.run --output bench.json
+#   python -m benchmarks.run --sizes 10000,100000 --files 2 --baseline bench.json --max-regression 0.2
+#
+# 依次测：
+#   ingest       合成 PDF / DOCX / XLSX 入库吞吐 (页/秒、切片/秒)
+#   persistence  入库后的知识库保存快照 / 重新加载 (含 mmap) 耗时
+#   search       10k~1M 个随机向量上的 similarity_search p50/p99 (外加每个规模的快照保存/加载)
+#   chat         通过 FastAPI 应用并发请求 /chat (假 LLM 按固定速度吐字)，吞吐和 TTFT/总耗时分位数
+#   workers      多个 worker 进程同时打开同一份快照 (整份读入 vs mmap)，每个进程的 RSS / PSS / 私有内存
+# 每个阶段结束记一次峰值 RSS。结果写成 JSON；给了 --baseline 就逐项对比，退化超过阈值时退出码为 1
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fakes import FakeStreamingLLM, HashEmbeddings
+
+FAKE_MODEL = "bench-fake"
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {}
+    a = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(a, 50)), 3),
+        "p99_ms": round(float(np.percentile(a, 99)), 3),
+        "mean_ms": round(float(a.mean()), 3),
+    }
+
+
+# 🧪 config 在 import 时读环境变量，所以要在 import 任何服务模块之前把路径都指到临时目录
+def configure_env(args, workdir):
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(workdir, "index")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'chat.sqlite3')}"
+    os.environ["WARMUP_ON_STARTUP"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # 每个问题都不一样也可能撞上语义缓存，默认关掉，量的是完整的检索 + 生成
+    os.environ["ANSWER_CACHE_ENABLED"] = "1" if args.answer_cache else "0"
+    if args.embedding != "fake":
+        os.environ["EMBEDDING_BACKEND"] = args.embedding
+
+
+# ---------- 入库 ----------
+def bench_ingest(service, corpus):
+    handlers = {".pdf": service.add_pdf, ".docx": service.add_word, ".xlsx": service.add_excel}
+    results = {}
+    for ext, files in corpus.items():
+        chunks = 0
+        units = 0
+        size = 0
+
+        def progress(chunks_total=None, **_):
+            nonlocal file_chunks
+            if chunks_total is not None:
+                file_chunks = chunks_total
+
+        start = time.perf_counter()
+        try:
+            for path, n in files:
+                file_chunks = 0
+                handlers[ext](path, progress=progress)
+                chunks += file_chunks
+                units += n
+                size += os.path.getsize(path)
+        except Exception as e:
+            results[ext.lstrip(".")] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        seconds = time.perf_counter() - start
+        unit = "rows" if ext == ".xlsx" else "pages"
+        results[ext.lstrip(".")] = {
+            "files": len(files),
+            unit: units,
+            "chunks": chunks,
+            "seconds": round(seconds, 3),
+            f"{unit}_per_s": round(units / seconds, 2),
+            "chunks_per_s": round(chunks / seconds, 2),
+            "mb_per_s": round(size / seconds / 1e6, 3),
+        }
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+# ---------- 快照保存 / 加载 ----------
+def bench_persistence(kb, root, embeddings):
+    from knowledge_base import KnowledgeBase
+
+    result = {"chunks": kb.ntotal()}
+    start = time.perf_counter()
+    kb.save(force=True)
+    result["save_s"] = round(time.perf_counter() - start, 3)
+    for mmap in (False, True):
+        fresh = KnowledgeBase(kb.name, root)
+        start = time.perf_counter()
+        fresh.ensure_loaded(embeddings, mmap=mmap)
+        result["load_mmap_s" if mmap else "load_s"] = round(time.perf_counter() - start, 3)
+        fresh.unload()
+    return result
+
+
+# ---------- 向量检索 ----------
+def synthetic_vectors(n, dim, rng, clusters=256, block=100_000):
+    # 带聚类结构的随机向量 (比纯高斯噪声更像真实嵌入，IVF 的召回/速度才有参考意义)，分块生成省临时内存
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for s in range(0, n, block):
+        e = min(s + block, n)
+        out[s:e] = centers[rng.integers(0, clusters, e - s)] + 0.3 * rng.standard_normal((e - s, dim), dtype=np.float32)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def bench_search(sizes, dim, queries, k, root, embeddings, seed, persistence=True):
+    import ann_index
+    import config
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from knowledge_base import KnowledgeBase
+
+    results = []
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        vectors = synthetic_vectors(n, dim, rng)
+        start = time.perf_counter()
+        index = ann_index.build_index(config.INDEX_TYPE, vectors)
+        build_s = time.perf_counter() - start
+        ids = [str(i) for i in range(n)]
+        docstore = InMemoryDocstore({i: Document(page_content=f"synthetic chunk {i}", id=i) for i in ids})
+
+        kb = KnowledgeBase(f"bench-{n}", root)
+        kb.ensure_loaded(embeddings)
+        kb.vector_store = FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+        kb.file_index = {"synthetic": ids}
+
+        # 查询向量取库里的点加一点扰动；先跑几次预热
+        picks = vectors[rng.integers(0, n, queries)] + 0.05 * rng.standard_normal((queries, dim), dtype=np.float32)
+        for qv in picks[:10]:
+            kb.search("", qv.tolist(), k, hybrid=False)
+        latencies = []
+        for qv in picks:
+            qv = qv.tolist()
+            start = time.perf_counter()
+            kb.search("", qv, k, hybrid=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        row = {"chunks": n, "index_type": ann_index.index_type_of(index), "build_s": round(build_s, 3), "k": k}
+        row.update(percentiles(latencies))
+        row["qps"] = round(len(latencies) / (sum(latencies) / 1000), 1)
+        if persistence:
+            row.update({f"snapshot_{key}": v for key, v in bench_persistence(kb, root, embeddings).items() if key != "chunks"})
+        kb.unload()
+        shutil.rmtree(kb.path, ignore_errors=True)
+        del vectors, index, docstore
+        row["peak_rss_mb"] = peak_rss_mb()
+        results.append(row)
+        print(f"🔍 {n} 个切片: p50 {row['p50_ms']}ms / p99 {row['p99_ms']}ms", file=sys.stderr)
+    return results
+
+
+# ---------- 多 worker 共享快照 ----------
+def _memory_mb():
+    """当前进程的 RSS / PSS / 私有 (匿名) 内存，单位 MB；PSS 把共享页按进程数平摊，最能看出共享省了多少。"""
+    fields = {}
+    for path in ("/proc/self/smaps_rollup", "/proc/self/status"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if value.strip().endswith("kB"):
+                        fields.setdefault(key, int(value.split()[0]) / 1024)
+        except OSError:
+            continue
+    return {
+        "rss_mb": round(fields.get("VmRSS", fields.get("Rss", 0)), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "anon_mb": round(fields.get("RssAnon", fields.get("Anonymous", 0)), 1),
+    }
+
+
+def _worker_load(root, kb_name, dim, mmap, queries, loaded, measured, results):
+    # 在子进程里跑 (spawn)：像一个 uvicorn worker 一样打开知识库、查几次，等所有 worker 都加载好了再量内存
+    from knowledge_base import KnowledgeBase
+
+    before = _memory_mb()
+    kb = KnowledgeBase(kb_name, root)
+    kb.ensure_loaded(HashEmbeddings(dim), mmap=mmap)
+    for qv in queries:
+        kb.search("", qv, 4, hybrid=False)
+    loaded.wait()
+    after = _memory_mb()
+    results.put({key: round(after[key] - before[key], 1) for key in after})
+    measured.wait()
+    kb.unload()
+
+
+def bench_workers(chunks, workers, dim, root, embeddings, seed):
+    """SHARED_INDEX 的内存账：N 个 worker 同时打开同一份快照，整份读入时每个进程一份向量，mmap 时页缓存里只有一份。"""
+    import ann_index
+    import config
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from knowledge_base import KnowledgeBase
+
+    rng = np.random.default_rng(seed)
+    vectors = synthetic_vectors(chunks, dim, rng)
+    ids = [str(i) for i in range(chunks)]
+    kb = KnowledgeBase("bench-workers", root)
+    kb.ensure_loaded(embeddings)
+    kb.vector_store = FAISS(
+        embeddings, ann_index.build_index(config.INDEX_TYPE, vectors),
+        InMemoryDocstore({i: Document(page_content=i, id=i) for i in ids}), dict(enumerate(ids)),
+    )
+    kb.file_index = {"synthetic": ids}
+    kb.save(force=True)
+    kb.unload()
+    queries = [qv.tolist() for qv in vectors[rng.integers(0, chunks, 20)]]
+    del vectors
+
+    result = {"chunks": chunks, "workers": workers, "vector_mb": round(chunks * dim * 4 / 1024 / 1024, 1)}
+    ctx = multiprocessing.get_context("spawn")
+    for mode, mmap in (("copy", False), ("mmap", True)):
+        loaded, measured, results = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1), ctx.Queue()
+        procs = [
+            ctx.Process(target=_worker_load, args=(root, kb.name, dim, mmap, queries, loaded, measured, results))
+            for _ in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        loaded.wait()
+        per_worker = [results.get() for _ in procs]
+        measured.wait()
+        for proc in procs:
+            proc.join()
+        # 每个 worker 加载知识库之后多出来的内存 (取平均)，total_pss 是所有 worker 合计实际占用的物理内存
+        row = {key: round(sum(w[key] for w in per_worker) / workers, 1) for key in per_worker[0]}
+        row["total_pss_mb"] = round(sum(w["pss_mb"] for w in per_worker), 1)
+        result[mode] = row
+        print(f"🧮 {workers} 个 worker ({mode}): 每个 +{row['rss_mb']}MB RSS / +{row['anon_mb']}MB 私有，合计 PSS {row['total_pss_mb']}MB", file=sys.stderr)
+    shutil.rmtree(kb.path, ignore_errors=True)
+    return result
+
+
+# ---------- /chat 并发 ----------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _chat_load(client, requests, concurrency):
+    queue = asyncio.Queue()
+    for i in range(requests):
+        # 问题各不相同，避免命中查询向量缓存
+        queue.put_nowait(f"报销审批流程需要多久？#{i}")
+    ttfts, latencies, chars, errors = [], [], [], 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            first = None
+            received = 0
+            try:
+                async with client.stream("POST", "/chat", json={"question": question, "model": FAKE_MODEL}) as r:
+                    if r.status_code != 200:
+                        errors += 1
+                        continue
+                    async for piece in r.aiter_text():
+                        if piece and first is None:
+                            first = time.perf_counter()
+                        received += len(piece)
+            except Exception:
+                errors += 1
+                continue
+            end = time.perf_counter()
+            ttfts.append(((first or end) - start) * 1000)
+            latencies.append((end - start) * 1000)
+            chars.append(received)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, ttfts, latencies, chars, errors
+
+
+async def bench_chat(requests, concurrency):
+    """优先起一个真的 uvicorn (流式响应逐块到达，TTFT 才准)；没装 uvicorn 就退回 ASGITransport (整段缓冲，TTFT≈总耗时)。"""
+    import httpx
+    from main import app
+
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+
+    if uvicorn is not None:
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        serve_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        transport_name = "uvicorn"
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            timeout=300,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+    else:
+        # ASGITransport 不跑 startup/shutdown，手动建表、启动批量写入
+        for handler in app.router.on_startup:
+            await handler()
+        transport_name = "asgi"
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+    try:
+        async with client:
+            seconds, ttfts, latencies, chars, errors = await _chat_load(client, requests, concurrency)
+    finally:
+        if uvicorn is not None:
+            server.should_exit = True
+            await serve_task
+        else:
+            for handler in app.router.on_shutdown:
+                await handler()
+
+    done = len(latencies)
+    return {
+        "transport": transport_name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "requests_per_s": round(done / seconds, 2),
+        "chars_per_s": round(sum(chars) / seconds, 1),
+        "ttft": percentiles(ttfts),
+        "latency": percentiles(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ---------- 回归对比 ----------
+def flatten_metrics(report):
+    """挑出可以比较的指标：*_per_s / qps 越大越好，*_ms / *_s 越小越好。"""
+    metrics = {}
+
+    def walk(prefix, node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                walk(f"{prefix}.{key}" if prefix else key, value)
+        elif isinstance(node, list):
+            for row in node:
+                if isinstance(row, dict) and "chunks" in row:
+                    walk(f"{prefix}[{row['chunks']}]", row)
+        elif isinstance(node, (int, float)) and not isinstance(node, bool):
+            metrics[prefix] = node
+
+    walk("", {k: v for k, v in report.items() if k in ("ingest", "persistence", "search", "chat")})
+    return metrics
+
+
+def compare(report, baseline, max_regression):
+    regressions = []
+    current, previous = flatten_metrics(report), flatten_metrics(baseline)
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None or not old:
+            continue
+        leaf = name.rsplit(".", 1)[-1]
+        if leaf.endswith("_per_s") or leaf == "qps":
+            change = (old - new) / old
+        elif leaf.endswith("_ms") or leaf.endswith("_s"):
+            change = (new - old) / old
+        else:
+            continue
+        if change > max_regression:
+            regressions.append({"metric": name, "baseline": old, "current": new, "regression": round(change, 3)})
+    return regressions
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="RAG 服务离线压测，结果输出为 JSON")
+    p.add_argument("--output", help="结果写到这个文件 (默认只打印到标准输出)")
+    p.add_argument("--workdir", help="索引 / 数据库 / 语料放在这里 (默认临时目录，跑完删除)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--phases", default="ingest,persistence,search,chat,workers", help="要跑的阶段，逗号分隔")
+    p.add_argument("--embedding", choices=("fake", "hf", "onnx"), default="fake",
+                   help="fake = 哈希假嵌入 (不加载模型)，hf / onnx = 真实嵌入模型")
+    p.add_argument("--dim", type=int, default=384, help="假嵌入和检索压测的向量维度")
+    # 语料
+    p.add_argument("--files", type=int, default=4, help="每种格式生成几个文件")
+    p.add_argument("--pdf-pages", type=int, default=50)
+    p.add_argument("--docx-pages", type=int, default=20)
+    p.add_argument("--xlsx-rows", type=int, default=2000)
+    # 检索
+    p.add_argument("--sizes", default="10000,100000,1000000", help="检索压测的切片数，逗号分隔")
+    p.add_argument("--queries", type=int, default=1000)
+    p.add_argument("--k", type=int, default=4)
+    # 聊天
+    p.add_argument("--chat-requests", type=int, default=200)
+    p.add_argument("--chat-concurrency", type=int, default=32)
+    p.add_argument("--tokens-per-second", type=float, default=50, help="假 LLM 的吐字速度")
+    p.add_argument("--answer-tokens", type=int, default=100)
+    p.add_argument("--ttft-ms", type=float, default=200, help="假 LLM 的首字延迟")
+    p.add_argument("--answer-cache", action="store_true", help="聊天压测时打开语义答案缓存")
+    # 多 worker
+    p.add_argument("--workers", type=int, default=2, help="workers 阶段同时打开快照的进程数")
+    p.add_argument("--worker-chunks", type=int, default=200000, help="workers 阶段快照里的切片数")
+    # 回归
+    p.add_argument("--baseline", help="上一次的结果 JSON，逐项对比")
+    p.add_argument("--max-regression", type=float, default=0.2, help="允许的退化比例 (0.2 = 20%%)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    phases = set(args.phases.split(","))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    configure_env(args, workdir)
+
+    import config
+    from observability import setup_logging
+    from ingest_pipeline import shutdown_process_pool
+    from rag_core import RAGService, set_rag_service
+
+    setup_logging(config.LOG_LEVEL)
+    report = {
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "index_type": config.INDEX_TYPE,
+            "embedding": args.embedding,
+            "seed": args.seed,
+            "args": vars(args),
+        }
+    }
+    try:
+        service = RAGService(embeddings=HashEmbeddings(args.dim) if args.embedding == "fake" else None)
+        set_rag_service(service)
+        service.llm_registry.register(
+            FAKE_MODEL,
+            FakeStreamingLLM(args.tokens_per_second, args.answer_tokens, args.ttft_ms),
+            max_concurrency=max(args.chat_concurrency, config.LLM_DEFAULT_MAX_CONCURRENCY),
+        )
+
+        if "ingest" in phases:
+            print("📄 生成合成语料...", file=sys.stderr)
+            corpus = generate_corpus(
+                os.path.join(workdir, "corpus"), args.files, args.pdf_pages, args.docx_pages, args.xlsx_rows, args.seed
+            )
+            print("📥 入库压测...", file=sys.stderr)
+            report["ingest"] = bench_ingest(service, corpus)
+
+        if "persistence" in phases:
+            from knowledge_base import DEFAULT_KB
+            with service._use_kb(DEFAULT_KB) as kb:
+                if kb.ntotal():
+                    report["persistence"] = bench_persistence(kb, service.vector_store_path, service.embeddings)
+
+        if "search" in phases:
+            print("🔍 检索压测...", file=sys.stderr)
+            sizes = [int(s) for s in args.sizes.split(",") if s]
+            report["search"] = bench_search(
+                sizes, args.dim, args.queries, args.k, os.path.join(workdir, "search"),
+                service.embeddings, args.seed,
+            )
+
+        if "chat" in phases:
+            print("💬 /chat 并发压测...", file=sys.stderr)
+            report["chat"] = asyncio.run(bench_chat(args.chat_requests, args.chat_concurrency))
+
+        if "workers" in phases:
+            print("🧮 多 worker 内存压测...", file=sys.stderr)
+            report["workers"] = bench_workers(
+                args.worker_chunks, args.workers, args.dim, os.path.join(workdir, "workers"), service.embeddings, args.seed
+            )
+    finally:
+        shutdown_process_pool()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.max_regression)
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+# server/bulk_import.py
+# 📦 命令行批量导入：python bulk_import.py <文件夹>
+import sys
+
+import config
+from observability import setup_logging
+from rag_core import get_rag_service
+
+if __name__ == "__main__":
+    setup_logging(config.LOG_LEVEL)
+    if len(sys.argv) != 2:
+        print("用法: python bulk_import.py <文件夹>")
+        sys.exit(1)
+    failed = get_rag_service().add_directory(sys.argv[1])
+    if failed:
+        print(f"❌ 以下文件导入失败: {failed}")
+        sys.exit(1)
@@ -0,0 +1,79 @@
+# server/chat_sessions.py
+# 💬 多轮对话的会话历史：进程内每个会话一个定长 deque，不在内存里的会话再按索引查数据库
+#
+# ⚠️ deque 是每个 worker 进程各一份：多 worker 部署 (SHARED_INDEX=1) 时同一个会话的请求落到别的 worker，
+# 这边内存里的历史就少了那几轮。需要严格的多轮上下文时设 SESSION_CACHE_SIZE=0，每次都查数据库
+# (别的 worker 还攒在写入队列里、没写进数据库的最后 DB_WRITE_FLUSH_MS 毫秒的消息仍然看不到)。
+from collections import OrderedDict, deque
+
+from sqlalchemy import select
+
+import config
+from database import SessionLocal
+from models import ChatHistory
+from write_buffer import write_buffer
+
+
+class SessionHistory:
+    """会话 ID -> 最近 window 条消息 [(role, content), ...]，最多记 max_sessions 个会话 (LRU)。"""
+
+    def __init__(self, window=6, max_sessions=10000):
+        self.window = window
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, session_id):
+        turns = self._sessions.get(session_id)
+        if turns is None:
+            return None
+        self._sessions.move_to_end(session_id)
+        return list(turns)
+
+    def put(self, session_id, messages):
+        self._sessions[session_id] = deque(messages, maxlen=self.window)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    # 只更新已经在内存里的会话；不在的下次用到时从数据库加载，不会漏消息
+    def append(self, session_id, role, content):
+        turns = self._sessions.get(session_id)
+        if turns is not None:
+            turns.append((role, content))
+
+
+session_history = SessionHistory(window=config.SESSION_HISTORY_MESSAGES, max_sessions=config.SESSION_CACHE_SIZE)
+
+
+def buffered_messages(session_id=None):
+    """批量写入队列里还没确认写进数据库的聊天记录，按入队顺序；session_id 为 None 时是所有会话的。"""
+    return [
+        row for row in write_buffer.pending()
+        if isinstance(row, ChatHistory) and (session_id is None or row.session_id == session_id)
+    ]
+
+
+async def load_session_history(session_id):
+    """取会话最近的几条消息：先查内存，没有再走 (session_id, id) 索引查最后 window 条。
+
+    不等批量写入队列 flush：还没写进数据库的消息直接从队列里取出来接在后面 (按 msg_id 去重)。
+    """
+    history = session_history.get(session_id)
+    if history is not None:
+        return history
+    # 先拍下队列再查库：查询期间刚提交的记录要么查得到，要么还在这份快照里，不会两头都漏
+    buffered = buffered_messages(session_id)
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(ChatHistory.msg_id, ChatHistory.role, ChatHistory.content)
+            .where(ChatHistory.session_id == session_id)
+            .order_by(ChatHistory.id.desc())
+            .limit(session_history.window)
+        )
+        rows = result.all()[::-1]
+    stored = {msg_id for msg_id, _, _ in rows}
+    history = [(role, content) for _, role, content in rows]
+    history += [(row.role, row.content) for row in buffered if row.msg_id not in stored]
+    history = history[-session_history.window:]
+    session_history.put(session_id, history)
+    return history
@@ -0,0 +1,133 @@
+# server/chunking.py
+# ✂️ 按文件格式切分：PDF 按页 + 标题切、Word 按段落 + 标题切、Excel 按行组，切片大小统一按 token 算
+# 每个切片带上“血缘”元数据：用的哪套切分配置、属于哪个章节、是所在页/文档里的第几片
+import bisect
+import os
+import re
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import config
+from context_builder import estimate_tokens
+
+# 章节标题行：“第三章 / 第2节 / 第十条”、“一、”、“1.2 / 3.1.4”、“【福利政策】”、Markdown 的 “# ”
+_SECTION = (
+    r"第[一二三四五六七八九十百零〇\d]+[章节条篇部分]"
+    r"|[一二三四五六七八九十]+、"
+    r"|\d+(?:\.\d+)+\s*\S"
+    r"|【[^】\n]+】"
+    r"|#{1,6}\s"
+)
+# 当章节名用的标题行还要够短，免得把正文里以编号开头的长句当成章节
+_SECTION_LINE = re.compile(rf"^[ \t]*(?:{_SECTION})[^\n]{{0,40}}$", re.MULTILINE)
+
+# 断开的优先级：标题 (含 “1. / 2、” 这样的条目) 之前 > 空行 > 句末 > 换行 > 分句 > 空格 > 逐字
+# 句末排在换行前面：标题和它下面第一句话连在一起，不会单独成为一个几个字的切片
+_HEADING_BREAK = rf"\n(?=[ \t]*(?:{_SECTION}|\d+[.、．]\s*\S))"
+_SENTENCE_END = [re.escape(s) for s in ("。", "！", "？", ". ", "! ", "? ")]
+_SOFT = [re.escape(s) for s in ("；", "; ", "，", ", ", " ")] + [""]
+_STRUCTURED = [_HEADING_BREAK, r"\n\s*\n"] + _SENTENCE_END + [r"\n"] + _SOFT
+_LINES = [r"\n\s*\n", r"\n"] + _SENTENCE_END + _SOFT
+
+
+class ChunkProfile:
+    """一种文件格式的切分配置。chunk_tokens / overlap_tokens 都是 estimate_tokens 口径的 token 数。"""
+
+    def __init__(self, name, chunk_tokens, overlap_tokens, separators=None):
+        self.name = name
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+        self.separators = separators  # None 表示文档已经按结构切好了 (Excel 行组)，不再二次切分
+
+
+PROFILES = {
+    # PDF 每页一个 Document 进来，切片不会跨页；页内优先在标题前、段落之间断开
+    "pdf": ChunkProfile("pdf", config.CHUNK_TOKENS_PDF, config.CHUNK_OVERLAP_TOKENS, _STRUCTURED),
+    # Word 整篇一个 Document，段落之间是空行
+    "docx": ChunkProfile("docx", config.CHUNK_TOKENS_DOCX, config.CHUNK_OVERLAP_TOKENS, _STRUCTURED),
+    # Excel 由 iter_excel_row_groups 按行组好 (带表头)，这里只补血缘元数据
+    "xlsx": ChunkProfile("xlsx", config.CHUNK_TOKENS_XLSX, 0),
+    # 纯文本 (init_from_text)：一行一条规定，按行攒成短切片
+    "text": ChunkProfile("text", config.CHUNK_TOKENS_TEXT, config.CHUNK_OVERLAP_TOKENS, _LINES),
+}
+
+_PROFILE_OF_EXT = {".pdf": "pdf", ".docx": "docx", ".doc": "docx", ".xlsx": "xlsx", ".xls": "xlsx"}
+
+
+def profile_for(file_path):
+    """按扩展名选切分配置，不认识的格式按纯文本切。"""
+    return PROFILES[_PROFILE_OF_EXT.get(os.path.splitext(file_path)[1].lower(), "text")]
+
+
+class StructuredSplitter:
+    """一个文件用一个实例：按顺序喂进来的 Document 逐个切分，章节标题跨页/跨文档延续。
+
+    产出的切片元数据在原文档元数据之外加上：
+    - chunker: 切分配置名 (pdf / docx / xlsx / text)
+    - chunk_index: 在所属 Document (PDF 的一页、Word 整篇、Excel 一个行组) 里的序号
+    - section: 切片开头所在的最近一个标题 (没有标题就不写)
+    - start_index: 在所属 Document 原文里的起始位置 (拼上下文时合并相邻片段用)
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self._section = None
+        self._splitter = None
+        if profile.separators is not None:
+            self._splitter = RecursiveCharacterTextSplitter(
+                separators=profile.separators,
+                is_separator_regex=True,
+                keep_separator="end",
+                chunk_size=profile.chunk_tokens,
+                chunk_overlap=profile.overlap_tokens,
+                length_function=estimate_tokens,
+            )
+
+    def split_documents(self, docs):
+        chunks = []
+        for doc in docs:
+            chunks.extend(self._split_one(doc))
+        return chunks
+
+    def split_text(self, text):
+        return [chunk.page_content for chunk in self._split_one(Document(page_content=text))]
+
+    def _split_one(self, doc):
+        if self._splitter is None:
+            for key, value in (("chunker", self.profile.name), ("chunk_index", 0)):
+                doc.metadata[key] = value
+            return [doc]
+        # start_index 自己算：切片大小和重叠按 token 计，langchain 按字符数推算的起点会错位
+        text = doc.page_content
+        pieces, start = [], -1
+        for chunk in self._splitter.split_text(text):
+            found = text.find(chunk, start + 1)
+            start = found if found >= 0 else text.find(chunk)
+            pieces.append(Document(page_content=chunk, metadata={**doc.metadata, "start_index": start}))
+
+        # 本文档里每个标题行的位置，切片的 section 取它起点之前最近的那个
+        starts, titles = [], []
+        for m in _SECTION_LINE.finditer(text):
+            starts.append(m.start())
+            titles.append(" ".join(m.group().split()))
+        carried = self._section
+        for i, piece in enumerate(pieces):
+            pos = bisect.bisect_right(starts, piece.metadata.get("start_index", 0))
+            section = titles[pos - 1] if pos else carried
+            piece.metadata["chunker"] = self.profile.name
+            piece.metadata["chunk_index"] = i
+            if section:
+                piece.metadata["section"] = section
+        if titles:
+            self._section = titles[-1]
+        return pieces
+
+
+def create_splitter(file_path=None, profile=None):
+    """按文件格式 (或直接指定配置名) 创建切分器；每个文件入库时新建一个。"""
+    if profile is None:
+        profile = profile_for(file_path or "")
+    elif isinstance(profile, str):
+        profile = PROFILES[profile]
+    return StructuredSplitter(profile)
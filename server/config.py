@@ -0,0 +1,122 @@
+# server/config.py
+# 统一放可调参数，全部支持用环境变量覆盖，改配置不用动业务代码
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# === 向量索引 ===
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "faiss_index")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hf")   # hf / onnx (int8 量化，需要 optimum + onnxruntime)
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "onnx/model_qint8_avx2.onnx")
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"  # 启动时就加载模型并预热，第一个请求不用等
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# === 嵌入缓存 (按 切片哈希 + 模型名 缓存向量，放在索引目录旁边) ===
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000")) # 进程内查询向量 LRU 条数
+SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", "256"))   # /search 一次最多多少个问题
+SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", "50"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# === 后台入库任务 ===
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))          # 同时处理几个文件
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "100")) # 排队上限，超过直接 429
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", "3600")) # 完成的任务状态保留多久
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "200"))           # 单个上传文件的大小上限，超过返回 413
+UPLOAD_CHUNK_KB = int(os.getenv("UPLOAD_CHUNK_KB", "1024"))      # 上传落盘时每次读写多少 KB
+
+# === 流式入库流水线 ===
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))               # 每个解析任务处理几页
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "0")) or None   # 解析进程数，0 表示用满 CPU
+INGEST_MAX_INFLIGHT_BATCHES = int(os.getenv("INGEST_MAX_INFLIGHT_BATCHES", "4")) # 同时在嵌入的批次上限
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))            # 嵌入线程数
+BULK_IMPORT_FILE_CONCURRENCY = int(os.getenv("BULK_IMPORT_FILE_CONCURRENCY", "4")) # 批量导入时同时处理的文件数
+EXCEL_ROWS_PER_CHUNK = int(os.getenv("EXCEL_ROWS_PER_CHUNK", "20"))  # Excel 每个切片最多几行
+
+# === 切分 (chunking.py，按 token 计，中文 1 字约 1 token、英文约 4 字符 1 token) ===
+# 默认嵌入模型 all-MiniLM-L6-v2 只看前 256 个 token，切片再长后面的字也嵌入不进去
+CHUNK_TOKENS_PDF = int(os.getenv("CHUNK_TOKENS_PDF", "240"))     # PDF 每个切片的 token 上限 (不跨页)
+CHUNK_TOKENS_DOCX = int(os.getenv("CHUNK_TOKENS_DOCX", "240"))   # Word 每个切片的 token 上限
+CHUNK_TOKENS_XLSX = int(os.getenv("CHUNK_TOKENS_XLSX", "240"))   # Excel 每个行组的 token 上限 (行不会被切断)
+CHUNK_TOKENS_TEXT = int(os.getenv("CHUNK_TOKENS_TEXT", "64"))    # init_from_text 的纯文本切片
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24")) # 相邻切片重叠的 token 数
+
+# === LLM 客户端连接池 ===
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))        # 每个 provider 的最大连接数
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))             # 保持的空闲长连接数
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))     # 空闲连接保留秒数
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_DEFAULT_MAX_CONCURRENCY", "32")) # model_config 没写 max_concurrency 时的默认值
+
+# === 聊天准入控制 (admission.py，每个模型一道闸，名额数就是该模型在 model_config 里的 max_concurrency) ===
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))                       # 每个模型最多几个请求排队 (model_config 的 max_queue 优先)，再多直接 429
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "10")) # 排队这么久还没轮到也 429
+CHAT_SHORT_QUERY_TOKENS = int(os.getenv("CHAT_SHORT_QUERY_TOKENS", "32"))     # 单轮且不超过这么多 token 的问题走优先通道
+CHAT_SHORT_LANE_BURST = int(os.getenv("CHAT_SHORT_LANE_BURST", "4"))          # 优先通道连续放行几个后让普通通道走一个
+
+# === 数据库 (连接池 + 聊天记录批量写入) ===
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))          # 等空闲连接的秒数
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))          # 连接用多久就换新的 (秒)
+DB_WRITE_FLUSH_MS = int(os.getenv("DB_WRITE_FLUSH_MS", "200"))       # 攒多久写一次库
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))   # 攒够这么多条提前写
+DB_WRITE_MAX_PENDING = int(os.getenv("DB_WRITE_MAX_PENDING", "10000")) # 数据库挂了时最多在内存里压多少条
+
+# === 会话 (多轮对话 + 历史记录翻页) ===
+SESSION_HISTORY_MESSAGES = int(os.getenv("SESSION_HISTORY_MESSAGES", "6"))       # 多轮模式带上最近几条消息
+SESSION_HISTORY_MAX_TOKENS = int(os.getenv("SESSION_HISTORY_MAX_TOKENS", "1000")) # 历史消息占提示词的 token 上限
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))               # 内存里最多记多少个会话的历史 (每个 worker 一份，多 worker 时设 0 每次查库)
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "100"))                     # /history 每页最多几条
+
+# === 语义答案缓存 ===
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")) # 余弦相似度阈值
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# === ANN 索引 ===
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")                       # flat / ivf_flat / hnsw / ivf_pq
+INDEX_TRAIN_MIN = int(os.getenv("INDEX_TRAIN_MIN", "10000"))       # 切片数达到这个值才从 flat 训练升级
+INDEX_MMAP = os.getenv("INDEX_MMAP", "0") == "1"                   # 启动时用 mmap 打开索引文件 (flat/HNSW 需要 FAISS 支持 IO_FLAG_MMAP_IFC，老版本只对 IVF 有效)
+IVF_NLIST = int(os.getenv("IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+PQ_M = int(os.getenv("PQ_M", "48"))       # 子向量个数，必须能整除向量维度 (MiniLM 是 384)
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+
+# === 索引持久化 (快照 + delta 日志) ===
+DELTA_COMPACT_CHUNKS = int(os.getenv("DELTA_COMPACT_CHUNKS", "20000")) # 日志攒够这么多切片就压缩成新快照
+SNAPSHOTS_TO_KEEP = int(os.getenv("SNAPSHOTS_TO_KEEP", "2"))            # 保留几个历史快照用于回退
+INDEX_FSYNC = os.getenv("INDEX_FSYNC", "1") == "1"                      # 每次追加日志后 fsync
+
+# === 共享索引 (多个 worker / 多台机器共用 VECTOR_STORE_PATH) ===
+# 注意：共享模式下每次写入 (上传、删除) 都会发布一份完整快照，写入成本是 O(全部切片)，不再是只追加 delta 日志
+SHARED_INDEX = os.getenv("SHARED_INDEX", "0") == "1"                     # 写完发布快照，其它进程 mmap 打开并热切换
+SHARED_INDEX_POLL_SECONDS = float(os.getenv("SHARED_INDEX_POLL_SECONDS", "2")) # 多久检查一次有没有新快照
+
+# === 多知识库 (每个分类一份索引，用到才加载) ===
+KB_MEMORY_LIMIT_MB = int(os.getenv("KB_MEMORY_LIMIT_MB", "2048"))        # 已加载知识库的内存上限，超了按 LRU 卸载
+KB_ROUTE_TOP_N = int(os.getenv("KB_ROUTE_TOP_N", "2"))                    # 不指定知识库时只检索向量均值离问题最近的几个，0 表示全部检索
+
+# === 检索 ===
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "2"))                    # 送进提示词的片段数
+HYBRID_ENABLED = os.getenv("HYBRID_ENABLED", "1") == "1"            # 向量 + BM25 混合检索
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))             # 每一路各取多少候选参与融合
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))                 # RRF 平滑常数
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("DEFAULT_CONTEXT_TOKENS", "4000"))       # model_config 没写 context_tokens 时的预算
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.85"))   # 片段 3-gram 相似度超过它算重复
+
+# === 重排 (可选，需要 sentence-transformers) ===
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "BAAI/bge-reranker-base")  # 支持中文的 cross-encoder
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))       # 召回多少个候选送去重排
+RERANK_BUDGET_MS = int(os.getenv("RERANK_BUDGET_MS", "300"))        # 每个请求的重排时间预算
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+RERANK_MAX_INFLIGHT = int(os.getenv("RERANK_MAX_INFLIGHT", "4"))   # 重排线程池里最多积压几个任务 (在跑的 + 排队的)，再多直接跳过重排
@@ -0,0 +1,110 @@
+# server/context_builder.py
+# 🧱 拼上下文：合并相邻/重叠的片段、去掉几乎重复的片段，按模型的 token 预算装箱，并带上出处
+import os
+import re
+
+_CJK = re.compile(r"[㐀-䶿一-鿿豈-﫿　-〿＀-￯]")
+
+
+def estimate_tokens(text):
+    """粗估 token 数：中文 (含全角标点) 按 1 字 1 token，其余按 4 个字符 1 token。
+
+    不依赖具体模型的分词器，偏保守，用来控预算足够了。
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _shingles(text, n=3):
+    text = re.sub(r"\s+", "", text)
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Block:
+    """合并后的一段上下文，rank 取组成它的片段里最靠前的检索名次。"""
+
+    def __init__(self, doc, rank):
+        self.source = doc.metadata.get("source", "")
+        self.page = doc.metadata.get("page")
+        self.sheet = doc.metadata.get("sheet")
+        self.rows = (doc.metadata.get("row_start"), doc.metadata.get("row_end"))
+        self.section = doc.metadata.get("section")
+        self.start = doc.metadata.get("start_index")
+        self.text = doc.page_content
+        self.end = self.start + len(self.text) if self.start is not None else None
+        self.rank = rank
+
+    def try_merge(self, doc, rank):
+        # 同一来源、同一页，且起始位置落在当前块内 (重叠) 或紧挨着 (相邻) 才合并
+        start = doc.metadata.get("start_index")
+        if (doc.metadata.get("source", "") != self.source or doc.metadata.get("page") != self.page
+                or start is None or self.end is None or start > self.end + 1):
+            return False
+        overlap = self.end - start
+        if overlap < len(doc.page_content):
+            self.text += doc.page_content[max(0, overlap):]
+            self.end = start + len(doc.page_content)
+        self.rank = min(self.rank, rank)
+        return True
+
+    def citation(self):
+        label = os.path.basename(self.source) or "未知来源"
+        if self.page is not None:
+            label += f" 第{int(self.page) + 1}页"
+        if self.sheet is not None:
+            label += f" {self.sheet} 第{self.rows[0]}-{self.rows[1]}行"
+        if self.section:
+            label += f" 「{self.section}」"
+        return label
+
+
+def build_context(docs, budget_tokens, dedup_threshold=0.85):
+    """docs 按相关度从高到低排好。返回 (上下文字符串, 实际用到的出处列表)。"""
+    # 1. 按来源 + 位置排序后合并重叠/相邻的片段 (chunk_overlap 带来的重复文字在这里去掉)
+    ranked = list(enumerate(docs))
+    ranked.sort(key=lambda x: (
+        x[1].metadata.get("source", ""),
+        x[1].metadata.get("page") if x[1].metadata.get("page") is not None else -1,
+        x[1].metadata.get("start_index") if x[1].metadata.get("start_index") is not None else -1,
+    ))
+    blocks = []
+    for rank, doc in ranked:
+        if not (blocks and blocks[-1].try_merge(doc, rank)):
+            blocks.append(_Block(doc, rank))
+
+    # 2. 恢复相关度顺序，去掉和前面某块几乎一样的块 (不同文件里的同一段样板文字)
+    blocks.sort(key=lambda b: b.rank)
+    kept, kept_shingles = [], []
+    for block in blocks:
+        sh = _shingles(block.text)
+        if any(_jaccard(sh, other) >= dedup_threshold for other in kept_shingles):
+            continue
+        kept.append(block)
+        kept_shingles.append(sh)
+
+    # 3. 按预算装箱：装不下的块跳过；第一块就超预算时截断它，保证至少有一段上下文
+    parts, citations, used = [], [], 0
+    for block in kept:
+        header = f"[{len(parts) + 1}] 来源: {block.citation()}\n"
+        cost = estimate_tokens(header) + estimate_tokens(block.text)
+        if used + cost > budget_tokens:
+            if parts:
+                continue
+            text = block.text
+            while text and estimate_tokens(header + text) > budget_tokens:
+                text = text[: len(text) * 3 // 4]
+            if not text:
+                break
+            cost = estimate_tokens(header + text)
+            parts.append(header + text)
+        else:
+            parts.append(header + block.text)
+        citations.append(block.citation())
+        used += cost
+    return "\n\n".join(parts), citations
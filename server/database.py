@@ -1,10 +1,16 @@
 # server/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+# ⚡ 异步数据库：请求处理里 await 数据库时不占线程、不卡事件循环
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 import os
 from dotenv import load_dotenv
 
+import config
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 # 读取配置
@@ -14,21 +20,54 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "ai_chat_db")
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# 异步驱动：MySQL 用 aiomysql；本地测试可以用 DATABASE_URL=sqlite+aiosqlite:///./chat.db 顶替
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+)
 
-# 1. 创建引擎
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# 1. 创建引擎 (连接池参数按并发量调；SQLite 用 SQLAlchemy 默认的池，不传这些参数)
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+else:
+    engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,  # MySQL 默认 8 小时踢掉空闲连接，提前回收
+        pool_pre_ping=True,
+    )
 
-# 2. 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 2. 创建会话工厂 (commit 之后对象属性还能读，不用再查一次库)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 # 3. 创建基类 (所有模型都要继承它)
 Base = declarative_base()
 
 # 4. 提供依赖 (给 FastAPI 用)
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+# 5. 建表 (启动时调用)
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+
+# 🔧 create_all 不会改已有的表：老表缺的列 (都是可空的) 和索引在这里补上
+def _add_missing_columns(conn):
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                col_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+                logger.info(f"🔧 [DB] 表 {table.name} 新增列 {column.name}")
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn)
+                logger.info(f"🔧 [DB] 表 {table.name} 新增索引 {index.name}")
@@ -0,0 +1,46 @@
+# server/embedding_backend.py
+# 🧠 嵌入模型后端：hf = 原版 sentence-transformers (PyTorch)；onnx = ONNX Runtime + int8 量化，CPU 上更快
+# 两种后端对外都是 LangChain 的 Embeddings 接口，上层代码不用改
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def cache_model_key(backend=None):
+    """嵌入缓存的模型键：量化模型算出来的向量和原版有细微差别，不能混用同一份缓存。
+
+    要传 create_embeddings 返回的实际后端：ONNX 加载失败退回 PyTorch 时，键也得是 PyTorch 的。
+    """
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "onnx":
+        return f"{config.EMBEDDING_MODEL_NAME}@onnx:{config.ONNX_MODEL_FILE}"
+    return config.EMBEDDING_MODEL_NAME
+
+
+def create_embeddings(backend=None, strict=False):
+    """返回 (Embeddings, 实际加载的后端 "hf" / "onnx")。
+
+    ONNX 加载失败默认退回 PyTorch 版 (服务照常启动)；strict=True 时直接抛异常，
+    给一致性检查这类必须用上指定后端的场景用。
+    """
+    # 重依赖 (torch / sentence-transformers) 放在函数里 import，只 import 模块不会付出加载代价
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "onnx":
+        try:
+            # sentence-transformers >= 3.2 支持 backend="onnx"，file_name 选仓库里自带的量化模型
+            return HuggingFaceEmbeddings(
+                model_name=config.EMBEDDING_MODEL_NAME,
+                model_kwargs={
+                    "backend": "onnx",
+                    "model_kwargs": {"file_name": config.ONNX_MODEL_FILE, "provider": "CPUExecutionProvider"},
+                },
+            ), "onnx"
+        except Exception as e:
+            if strict:
+                raise
+            logger.warning(f"⚠️ [RAG] ONNX 嵌入后端加载失败，退回 PyTorch 版: {e}")
+    return HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL_NAME), "hf"
@@ -0,0 +1,166 @@
+# server/embedding_cache.py
+# 💽 内容寻址的嵌入缓存：同一段文本 + 同一个模型，只算一次向量
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """包一层 Embeddings，文档向量先查 SQLite 缓存，没命中才交给真正的模型。
+
+    键是 sha256(模型名 + 文本)，值是 float32 字节串；超过 max_entries 时按最近使用时间淘汰。
+    查询向量另有一个进程内 LRU (query_cache_size 条)，重复的问题不用再跑模型。
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache_path: str, max_entries: int = 200000,
+                 query_cache_size: int = 10000):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.query_cache_size = query_cache_size
+        self.query_hits = 0
+        self.query_misses = 0
+        self._query_cache = OrderedDict()  # 文本 -> 向量
+
+        # 上传会在不同线程里处理，这里用一个连接 + 锁串行访问
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used ON embedding_cache (last_used)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self._key(t) for t in texts]
+        vectors = [None] * len(texts)
+
+        with self._lock:
+            found = {}
+            # SQLite 单条语句的参数个数有限制，分批查
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+
+        missing = []
+        for i, key in enumerate(keys):
+            blob = found.get(key)
+            if blob is not None:
+                vectors[i] = np.frombuffer(blob, dtype=np.float32).tolist()
+            else:
+                missing.append(i)
+
+        if missing:
+            # 同一批里重复的文本只算一次
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            new_vectors = dict(zip(unique_texts, self.underlying.embed_documents(unique_texts)))
+            for i in missing:
+                vectors[i] = new_vectors[texts[i]]
+            self._put({self._key(t): v for t, v in new_vectors.items()})
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return vectors
+
+    def embed_query(self, text):
+        vector = self._query_cache_get(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self._query_cache_put(text, vector)
+        return vector
+
+    async def aembed_query(self, text):
+        vector = self._query_cache_get(text)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            self._query_cache_put(text, vector)
+        return vector
+
+    # 🚀 批量嵌入查询：没命中 LRU 的问题一次性送进模型，只跑一次前向
+    # (MiniLM 这类对称模型的 query / document 编码方式相同，所以可以直接用 embed_documents)
+    def embed_queries(self, texts):
+        vectors = [self._query_cache_get(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            new_vectors = dict(zip(missing, self.underlying.embed_documents(missing)))
+            for t, v in new_vectors.items():
+                self._query_cache_put(t, v)
+            vectors = [v if v is not None else new_vectors[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def _query_cache_get(self, text):
+        with self._lock:
+            vector = self._query_cache.get(text)
+            if vector is None:
+                self.query_misses += 1
+            else:
+                self._query_cache.move_to_end(text)
+                self.query_hits += 1
+            return vector
+
+    def _query_cache_put(self, text, vector):
+        with self._lock:
+            self._query_cache[text] = vector
+            self._query_cache.move_to_end(text)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def _put(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    # 🧹 超出容量时淘汰最久没用过的条目
+    def _evict(self):
+        total = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        overflow = total - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        query_total = self.query_hits + self.query_misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "query_hits": self.query_hits,
+            "query_misses": self.query_misses,
+            "query_hit_rate": round(self.query_hits / query_total, 4) if query_total else 0.0,
+        }
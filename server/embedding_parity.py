@@ -0,0 +1,80 @@
+# server/embedding_parity.py
+# ⚖️ 召回一致性检查：换嵌入后端 (比如 int8 ONNX) 之前，先确认检索结果和原版基本一致
+#
+# 用法: python embedding_parity.py [--k 5] [--samples 200] [--min-recall 0.9]
+# 从所有知识库里抽样切片当语料，用每个切片的前半段当查询，分别用 hf 和 onnx 两个后端检索，
+# 比较两边 top-k 的重合率 (recall@k) 和同一段文本两种向量的余弦相似度。
+# ONNX 后端加载失败直接报错退出 (不会退回 PyTorch 拿 hf 和 hf 比)；索引只读加载，不动线上的文件。
+import argparse
+import json
+import random
+import sys
+
+import numpy as np
+
+import config
+from embedding_backend import create_embeddings
+from index_store import IndexStore
+from knowledge_base import kb_path, list_kb_names
+
+
+def _normalize(m):
+    m = np.asarray(m, dtype=np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def _topk(queries, corpus, k):
+    return np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+
+
+def _sample_texts(embeddings):
+    texts = []
+    for name in list_kb_names(config.VECTOR_STORE_PATH):
+        store = IndexStore(kb_path(config.VECTOR_STORE_PATH, name))
+        vector_store, _, _ = store.load(embeddings, read_only=True)
+        store.close()
+        if vector_store:
+            texts.extend(vector_store.docstore.search(i).page_content for i in vector_store.index_to_docstore_id.values())
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    args = parser.parse_args()
+
+    reference, _ = create_embeddings("hf")
+    candidate, _ = create_embeddings("onnx", strict=True)
+
+    texts = _sample_texts(reference)
+    if not texts:
+        print("知识库为空，请先上传文件！")
+        sys.exit(1)
+
+    random.Random(0).shuffle(texts)
+    texts = texts[:args.samples]
+    queries = [t[: max(10, len(t) // 2)] for t in texts]
+
+    ref_corpus, cand_corpus = _normalize(reference.embed_documents(texts)), _normalize(candidate.embed_documents(texts))
+    ref_queries, cand_queries = _normalize(reference.embed_documents(queries)), _normalize(candidate.embed_documents(queries))
+
+    ref_top, cand_top = _topk(ref_queries, ref_corpus, args.k), _topk(cand_queries, cand_corpus, args.k)
+    recall = float(np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ref_top, cand_top)]))
+    cosine = np.sum(ref_corpus * cand_corpus, axis=1)
+
+    report = {
+        "samples": len(texts),
+        "k": args.k,
+        f"recall@{args.k}": round(recall, 4),
+        "cosine_mean": round(float(cosine.mean()), 4),
+        "cosine_min": round(float(cosine.min()), 4),
+        "passed": recall >= args.min_recall,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
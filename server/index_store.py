@@ -0,0 +1,428 @@
+# server/index_store.py
+# 💾 崩溃安全 + 增量的索引持久化
+#
+# 目录结构 (VECTOR_STORE_PATH 下)：
+#   CURRENT                  -> 当前快照的名字，例如 "snapshot-000007"，用 os.replace 原子切换
+#   snapshot-000007/         -> 完整快照：index.faiss / index.pkl / file_index.json / file_hashes.json / lexical.pkl / meta.json
+#   delta-000007.log         -> 快照 7 之后新增/删除的切片，只追加；重启时在快照上重放
+#
+# 每次上传只追加 delta 日志 (O(新切片))，日志攒到一定量再压缩成新快照。
+# 快照先写到临时目录、fsync 后再 rename，CURRENT 最后切换，任何时刻崩溃都能读到一份完整的数据。
+import json
+import logging
+import os
+import pickle
+import shutil
+import struct
+import time
+import zlib
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+import ann_index
+import config
+from lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")  # (payload 长度, crc32)
+
+
+def _fsync_dir(path):
+    # Windows 不支持对目录 fsync，忽略即可
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_tree(path):
+    for name in os.listdir(path):
+        with open(os.path.join(path, name), "rb+") as f:
+            os.fsync(f.fileno())
+    _fsync_dir(path)
+
+
+# 🔁 把一条日志记录应用到内存里的向量库、文件清单和 BM25 倒排索引上；返回 (可能新建的) 向量库
+def apply_record(vector_store, file_index, lexical, record, embeddings):
+    if record["op"] == "add":
+        lexical.add(record["ids"], record["texts"])
+        text_embeddings = list(zip(record["texts"], record["vectors"]))
+        if vector_store:
+            vector_store.add_embeddings(text_embeddings, metadatas=record["metadatas"], ids=record["ids"])
+        else:
+            vector_store = FAISS.from_embeddings(
+                text_embeddings, embeddings, metadatas=record["metadatas"], ids=record["ids"]
+            )
+        file_index.setdefault(record["filename"], []).extend(record["ids"])
+    elif record["op"] == "delete":
+        # 删除是幂等的：已经不在索引里的 ID 跳过 (FAISS.delete 遇到不存在的 ID 会直接抛异常)
+        if vector_store:
+            present = set(vector_store.index_to_docstore_id.values())
+            live = [i for i in record["ids"] if i in present]
+            if live:
+                ann_index.delete_ids(vector_store, live)
+        lexical.remove(record["ids"])
+        doomed = set(record["ids"])
+        remaining = [i for i in file_index.get(record["filename"], []) if i not in doomed]
+        if remaining:
+            file_index[record["filename"]] = remaining
+        else:
+            file_index.pop(record["filename"], None)
+    return vector_store
+
+
+class IndexStore:
+    def __init__(self, root):
+        self.root = root
+        self.version = 0          # 当前快照版本，0 表示还没有快照
+        self.delta_chunks = 0     # 当前 delta 日志里记了多少个切片
+        self.log_offset = 0       # 已经应用到内存的日志字节数
+        self.mmapped = False
+        self.file_hashes = {}     # 文件名 -> 入库时的 sha256，上传时用来跳过重复内容
+        self.current_token = None # 加载/发布时 CURRENT 文件的 (inode, mtime)，共享索引模式下用来发现别的进程发布了新快照
+        self.read_only = False    # 没拿写锁加载的 (共享索引模式的读进程)：加载过程不改目录里的任何文件
+        self._log = None
+
+    # ---------- 路径 ----------
+    def _snapshot_dir(self, version):
+        return os.path.join(self.root, f"snapshot-{version:06d}")
+
+    def _log_path(self, version):
+        return os.path.join(self.root, f"delta-{version:06d}.log")
+
+    def _snapshot_versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in os.listdir(self.root):
+            if name.startswith("snapshot-"):
+                try:
+                    versions.append(int(name[len("snapshot-"):]))
+                except ValueError:
+                    pass
+        return sorted(versions, reverse=True)
+
+    # CURRENT 每次都是写临时文件再 os.replace，换一次 inode 就变；比版本号可靠 (删空重建后版本号会从头开始)
+    def _current_token(self):
+        try:
+            st = os.stat(os.path.join(self.root, "CURRENT"))
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.root, "CURRENT"), "r", encoding="utf-8") as f:
+                return int(f.read().strip()[len("snapshot-"):])
+        except (OSError, ValueError):
+            return None
+
+    # CURRENT 指向的快照的 meta.json (不加载快照)；还没有快照或读不了就返回 {}
+    def snapshot_meta(self):
+        version = self._current_version()
+        if version is None:
+            return {}
+        try:
+            with open(os.path.join(self._snapshot_dir(version), "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # ---------- 加载 ----------
+    def load(self, embeddings, mmap=False, read_only=False):
+        """加载 CURRENT 指向的快照并重放它的 delta 日志。
+
+        快照坏了就依次退回更早的快照 (保留了它们各自的日志)，而不是直接丢掉整个知识库。
+        read_only=True 时只读：不迁移旧格式、不改写 CURRENT、不截断日志、不建日志文件，
+        这些修复留给拿着写锁的进程做。
+        返回 (vector_store 或 None, file_index, lexical)。
+        """
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(self.root, exist_ok=True)
+        # 先记下 CURRENT 再读快照：读的过程中又发布了新快照的话，下次检查会发现过时，不会漏掉
+        self.current_token = self._current_token()
+        if self._current_version() is None and os.path.exists(os.path.join(self.root, "index.faiss")):
+            if read_only:
+                self.version = 0
+                self.file_hashes = {}
+                return self._open_log(0, *self._read_legacy(embeddings), embeddings)
+            return self._migrate_legacy(embeddings)
+
+        current = self._current_version()
+        candidates = self._snapshot_versions()
+        if current in candidates:
+            candidates.remove(current)
+            candidates.insert(0, current)
+
+        for version in candidates:
+            try:
+                vector_store, file_index, lexical = self._load_snapshot(version, embeddings, mmap)
+                self.mmapped = mmap
+            except Exception as e:
+                logger.warning(f"⚠️ [RAG] 快照 {version} 加载失败，尝试更早的快照: {e}")
+                continue
+            if version != current and not read_only:
+                self._write_current(version)
+                self.current_token = self._current_token()
+            return self._open_log(version, vector_store, file_index, lexical, embeddings)
+
+        # 一个快照都没有：可能只有 delta-000000.log (第一次上传后还没压缩过)
+        self.file_hashes = {}
+        return self._open_log(0, None, {}, LexicalIndex(), embeddings)
+
+    def _load_snapshot(self, version, embeddings, mmap):
+        path = self._snapshot_dir(version)
+        vector_store = ann_index.load_store(path, embeddings, mmap=mmap)
+        with open(os.path.join(path, "file_index.json"), "r", encoding="utf-8") as f:
+            file_index = json.load(f)
+        # 老快照没有 file_hashes.json：这些文件下次上传时按“内容变了”增量替换一次，之后就有哈希了
+        hashes_path = os.path.join(path, "file_hashes.json")
+        if os.path.exists(hashes_path):
+            with open(hashes_path, "r", encoding="utf-8") as f:
+                self.file_hashes = json.load(f)
+        else:
+            self.file_hashes = {}
+        lexical_path = os.path.join(path, "lexical.pkl")
+        if os.path.exists(lexical_path):
+            with open(lexical_path, "rb") as f:
+                lexical = pickle.load(f)
+        else:
+            lexical = LexicalIndex.from_vector_store(vector_store)
+        logger.info(f"✅ [RAG] 成功加载索引快照 {version}！({ann_index.index_type_of(vector_store.index)}, {vector_store.index.ntotal} 个向量)")
+        return vector_store, file_index, lexical
+
+    def _open_log(self, version, vector_store, file_index, lexical, embeddings):
+        self.version = version
+        self.delta_chunks = 0
+        self.log_offset = 0
+        vector_store = self.replay(vector_store, file_index, lexical, embeddings)
+        if not self.read_only:
+            self._log = open(self._log_path(version), "ab")
+        return vector_store, file_index, lexical
+
+    def replay(self, vector_store, file_index, lexical, embeddings):
+        """从 log_offset 开始读日志并应用。末尾写了一半的记录 (崩溃导致) 会被截掉。"""
+        path = self._log_path(self.version)
+        if not os.path.exists(path):
+            return vector_store
+        applied = 0
+        with open(path, "rb") as f:
+            f.seek(self.log_offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                record = pickle.loads(payload)
+                if record["op"] == "hash":
+                    self.file_hashes[record["filename"]] = record["sha256"]
+                else:
+                    # 一条应用不了的记录只跳过它本身，不能让整个知识库 (和默认知识库所在的服务) 起不来
+                    try:
+                        self.make_writable(vector_store)
+                        vector_store = apply_record(vector_store, file_index, lexical, record, embeddings)
+                    except Exception as e:
+                        logger.error(f"❌ [RAG] delta 日志记录应用失败，已跳过 ({record['op']} '{record['filename']}'): {e}")
+                    self.forget_removed(file_index, record["filename"])
+                self.delta_chunks += len(record["ids"])
+                self.log_offset = f.tell()
+                applied += 1
+        # 共享索引模式下别的进程可能正写到一半，加载时不截断，由拿着写锁的进程调用 truncate_tail 处理
+        if self._log is None and not self.read_only and not config.SHARED_INDEX and os.path.getsize(path) > self.log_offset:
+            logger.warning("⚠️ [RAG] delta 日志末尾有不完整的记录，已截断")
+            with open(path, "rb+") as f:
+                f.truncate(self.log_offset)
+        if applied:
+            logger.info(f"🔁 [RAG] 重放了 {applied} 条 delta 日志记录")
+        return vector_store
+
+    def _migrate_legacy(self, embeddings):
+        # 老版本直接把 index.faiss / index.pkl 写在根目录：读出来写成第一个快照，再删掉旧文件
+        logger.info("🔄 [RAG] 发现旧格式索引，迁移成快照格式...")
+        vector_store, file_index, lexical = self._read_legacy(embeddings)
+        self.version = 0
+        self.file_hashes = {}
+        self.write_snapshot(vector_store, file_index, lexical)
+        for name in ("index.faiss", "index.pkl", "file_index.json"):
+            path = os.path.join(self.root, name)
+            if os.path.exists(path):
+                os.remove(path)
+        return vector_store, file_index, lexical
+
+    def _read_legacy(self, embeddings):
+        vector_store = ann_index.load_store(self.root, embeddings)
+        legacy_manifest = os.path.join(self.root, "file_index.json")
+        if os.path.exists(legacy_manifest):
+            with open(legacy_manifest, "r", encoding="utf-8") as f:
+                file_index = json.load(f)
+        else:
+            # 更老的索引连文件清单都没有，从 docstore 的 source 元数据里反推一份
+            file_index = {}
+            for doc_id in vector_store.index_to_docstore_id.values():
+                doc = vector_store.docstore.search(doc_id)
+                source = getattr(doc, "metadata", {}).get("source", "")
+                if source:
+                    file_index.setdefault(os.path.basename(source), []).append(doc_id)
+        lexical = LexicalIndex.from_vector_store(vector_store)
+        return vector_store, file_index, lexical
+
+    # 🔄 共享索引模式：别的进程发布了新快照 (或者把知识库删空了)，内存里的版本已经过时
+    def is_stale(self):
+        return self._current_token() != self.current_token
+
+    # 拿着写锁、已经追上日志之后调用：日志末尾残留的半条记录 (写的进程崩溃了) 截掉，新记录才能接着追加
+    def truncate_tail(self):
+        path = self._log_path(self.version)
+        if os.path.exists(path) and os.path.getsize(path) > self.log_offset:
+            logger.warning("⚠️ [RAG] delta 日志末尾有不完整的记录，已截断")
+            with open(path, "rb+") as f:
+                f.truncate(self.log_offset)
+
+    # ✍️ 写之前调用：mmap 打开的向量是文件的只读视图，往里加向量 FAISS 会直接 abort 整个进程
+    def make_writable(self, vector_store):
+        if self.mmapped and vector_store:
+            vector_store.index = ann_index.load_writable_index(self._snapshot_dir(self.version))
+            self.mmapped = False
+
+    # ---------- 追加日志 ----------
+    def _append(self, record):
+        if self._log is None:
+            # 只读加载的进程第一次写 (已经拿到写锁、追上日志并截掉残缺的末尾)
+            self._log = open(self._log_path(self.version), "ab")
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._log.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._log.flush()
+        if config.INDEX_FSYNC:
+            os.fsync(self._log.fileno())
+        self.log_offset = self._log.tell()
+        self.delta_chunks += len(record["ids"])
+
+    def append_add(self, filename, ids, texts, metadatas, vectors):
+        self._append({
+            "op": "add",
+            "filename": filename,
+            "ids": list(ids),
+            "texts": list(texts),
+            "metadatas": list(metadatas),
+            "vectors": np.asarray(vectors, dtype=np.float32),
+        })
+
+    def append_delete(self, filename, ids):
+        self._append({"op": "delete", "filename": filename, "ids": list(ids)})
+
+    # 🔑 文件全部切片都写完之后才记哈希：中途失败的文件下次上传不会被当成重复内容跳过
+    def append_hash(self, filename, sha256):
+        self._append({"op": "hash", "filename": filename, "sha256": sha256, "ids": []})
+        self.file_hashes[filename] = sha256
+
+    # 文件的切片删光了，哈希也跟着去掉
+    def forget_removed(self, file_index, filename):
+        if filename not in file_index:
+            self.file_hashes.pop(filename, None)
+
+    def needs_compaction(self):
+        return self.delta_chunks >= config.DELTA_COMPACT_CHUNKS
+
+    # ---------- 快照 ----------
+    def write_snapshot(self, vector_store, file_index, lexical):
+        """写一份完整快照：临时目录 -> fsync -> rename -> 原子切换 CURRENT -> 新日志。"""
+        existing = self._snapshot_versions()
+        version = max([self.version] + existing) + 1
+        tmp_dir = os.path.join(self.root, f".tmp-snapshot-{version:06d}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        vector_store.save_local(tmp_dir)
+        with open(os.path.join(tmp_dir, "file_index.json"), "w", encoding="utf-8") as f:
+            json.dump(file_index, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "file_hashes.json"), "w", encoding="utf-8") as f:
+            json.dump({name: h for name, h in self.file_hashes.items() if name in file_index}, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "lexical.pkl"), "wb") as f:
+            pickle.dump(lexical, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # centroid: 所有向量的均值，不指定知识库检索时用它挑出离问题最近的几个知识库 (不用先加载知识库)
+        centroid = ann_index.centroid(vector_store.index)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": version,
+                "created_at": time.time(),
+                "ntotal": vector_store.index.ntotal,
+                "centroid": centroid.tolist() if centroid is not None else None,
+            }, f)
+        _fsync_tree(tmp_dir)
+
+        os.rename(tmp_dir, self._snapshot_dir(version))
+        # 新快照的日志先建好 (空文件)，再切 CURRENT，这样切过去之后永远有日志可追加
+        open(self._log_path(version), "ab").close()
+        self._write_current(version)
+        self.current_token = self._current_token()
+
+        if self._log:
+            self._log.close()
+        self._log = open(self._log_path(version), "ab")
+        self.version = version
+        self.delta_chunks = 0
+        self.log_offset = 0
+        self._gc()
+        logger.info(f"💾 [RAG] 索引快照 {version} 已保存 ({vector_store.index.ntotal} 个向量)")
+
+    def _write_current(self, version):
+        tmp = os.path.join(self.root, "CURRENT.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"snapshot-{version:06d}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, "CURRENT"))
+        _fsync_dir(self.root)
+
+    # 🧹 只保留最近几个快照 (和它们的日志)，用来在最新快照损坏时回退
+    def _gc(self):
+        keep = set(self._snapshot_versions()[:config.SNAPSHOTS_TO_KEEP])
+        keep.add(self.version)
+        for name in os.listdir(self.root):
+            for prefix, suffix in (("snapshot-", ""), ("delta-", ".log")):
+                if name.startswith(prefix) and name.endswith(suffix):
+                    try:
+                        version = int(name[len(prefix):len(name) - len(suffix)])
+                    except ValueError:
+                        continue
+                    if version not in keep:
+                        path = os.path.join(self.root, name)
+                        if os.path.isdir(path):
+                            shutil.rmtree(path, ignore_errors=True)
+                        else:
+                            os.remove(path)
+
+    # 📕 卸载知识库时关掉日志文件
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    # 🗑️ 知识库删空了：关掉日志，删掉自己的快照和日志 (目录里其它知识库的子目录不动)，回到初始状态
+    def clear(self):
+        self.close()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(("snapshot-", ".tmp-snapshot-")):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.startswith("delta-") or name in ("CURRENT", "CURRENT.tmp"):
+                os.remove(path)
+        self.version = 0
+        self.delta_chunks = 0
+        self.log_offset = 0
+        self.mmapped = False
+        self.file_hashes = {}
+        self.current_token = None
+        self._log = open(self._log_path(0), "ab")
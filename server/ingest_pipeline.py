@@ -0,0 +1,158 @@
+# server/ingest_pipeline.py
+# 🏭 流式入库流水线：多进程解析 PDF 页 / 流式读 Excel 行 -> 边到边切分 -> 固定大小的批次送去嵌入
+# 注意：这个模块会被解析子进程 import，顶部只能放轻量依赖，别在这里 import rag_core / torch
+import multiprocessing
+import os
+import datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+
+from context_builder import estimate_tokens
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# 🔧 进程池全局共享、懒加载；用 spawn 启动，避免 fork 出带着 torch 线程状态的子进程
+# (spawn 会在子进程里重新 import 主模块，推荐用 `uvicorn main:app` 启动，而不是 python main.py)
+def get_process_pool(max_workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# 💥 进程池坏了 (BrokenProcessPool：某个解析子进程崩溃或被 OOM 杀掉) 就扔掉，下次 get_process_pool 重建
+# 只扔调用方用的那个池：几个任务同时撞上同一次崩溃时，先到的已经换上了新池，不能把新池也关掉
+def discard_process_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def pdf_page_count(file_path):
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+# 子进程里执行：只解析 [start, end) 这几页，返回纯文本，传回主进程的数据量很小
+def _parse_pdf_range(file_path, start, end):
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def iter_pdf_pages(file_path, pages_per_task=8, max_pending_tasks=None, pool=None):
+    """按页范围把 PDF 分给进程池解析，按页码顺序逐页产出 Document。
+
+    同时在跑的任务最多 max_pending_tasks 个，所以不管 PDF 多大，内存里只有一个窗口的页面。
+    元数据和 PyPDFLoader 保持一致 (source / page)。
+    """
+    pool = pool or get_process_pool()
+    max_pending_tasks = max_pending_tasks or (os.cpu_count() or 1) * 2
+    total = pdf_page_count(file_path)
+    ranges = deque((s, min(s + pages_per_task, total)) for s in range(0, total, pages_per_task))
+    pending = deque()
+
+    while ranges or pending:
+        while ranges and len(pending) < max_pending_tasks:
+            start, end = ranges.popleft()
+            pending.append(pool.submit(_parse_pdf_range, file_path, start, end))
+        for page_no, text in pending.popleft().result():
+            yield Document(
+                page_content=text,
+                metadata={"source": file_path, "page": page_no, "total_pages": total},
+            )
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d") if value.time() == datetime.time() else value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+def iter_excel_row_groups(file_path, rows_per_chunk=20, max_tokens=240):
+    """openpyxl 只读模式逐行流式读取，每 rows_per_chunk 行 (或攒够 max_tokens 个 token，含表头) 产出一个 Document。
+
+    每个工作表第一行非空的行当表头，每个切片开头都带上 “工作表名 + 表头”，切片单独拿出来也看得懂每一列是什么；
+    行永远不会被切断 (单独一行超过 max_tokens 就自成一个切片)。内存里只有当前这一组行。
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            header, header_tokens = None, 0
+            rows, size = [], 0  # rows: [(行号, 文本), ...]，size: 这些行的 token 数
+
+            def row_group():
+                return Document(
+                    page_content=f"[{sheet.title}] {header}\n" + "\n".join(line for _, line in rows),
+                    metadata={"source": file_path, "sheet": sheet.title, "row_start": rows[0][0], "row_end": rows[-1][0]},
+                )
+
+            for row_no, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+                cells = [_cell_text(v) for v in values]
+                while cells and not cells[-1]:
+                    cells.pop()
+                if not cells:
+                    continue
+                if header is None:
+                    header = " | ".join(c or f"列{i + 1}" for i, c in enumerate(cells))
+                    header_tokens = estimate_tokens(f"[{sheet.title}] {header}") + 1
+                    continue
+                line = " | ".join(cells)
+                line_tokens = estimate_tokens(line) + 1
+                if rows and (len(rows) >= rows_per_chunk or header_tokens + size + line_tokens > max_tokens):
+                    yield row_group()
+                    rows, size = [], 0
+                rows.append((row_no, line))
+                size += line_tokens
+            if rows:
+                yield row_group()
+    finally:
+        workbook.close()
+
+
+def iter_chunk_batches(docs, splitter, batch_size, timer=None):
+    """逐个文档切分，攒够 batch_size 个切片就产出一批，最后不满的一批也会产出。
+
+    产出 (已消费的文档数, 切片列表)，调用方拿前者汇报解析进度。传了 timer 的话切分耗时累加到 "split" 阶段。
+    """
+    batch = []
+    parsed = 0
+    for doc in docs:
+        parsed += 1
+        start = time.perf_counter()
+        batch.extend(splitter.split_documents([doc]))
+        if timer is not None:
+            timer.add("split", (time.perf_counter() - start) * 1000)
+        while len(batch) >= batch_size:
+            yield parsed, batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield parsed, batch
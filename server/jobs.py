@@ -0,0 +1,131 @@
+# server/jobs.py
+# 🧵 后台入库任务：上传接口只负责存文件 + 丢任务，解析/切分/嵌入/保存都在线程池里跑
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from observability import request_id_var
+
+logger = logging.getLogger(__name__)
+
+
+class IngestJob:
+    def __init__(self, filename, file_path, kb=None, sha256=None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_path = file_path
+        self.kb = kb
+        self.sha256 = sha256
+        self.status = "pending"  # pending / running / success / failed
+        self.error = None
+        self.progress = {"pages_parsed": 0, "chunks_total": 0, "chunks_embedded": 0}
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def key(self):
+        return (self.kb, self.filename) if self.kb is not None else None
+
+    # 给 RAGService 用的进度回调
+    def update(self, **kwargs):
+        self.progress.update(kwargs)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "progress": dict(self.progress),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobManager:
+    """固定大小的线程池 + 内存里的任务表。
+
+    worker 数量限制了同时入库的文件数，pending 数量超过上限时 submit 返回 None，由接口层回 429。
+    传了 kb 的任务按 (知识库, 文件名) 串行执行：前一个跑完才把下一个交给线程池，
+    同一个文件的两个版本不会同时对着同一批旧切片做增量替换。
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._queued = {}  # (kb, 文件名) -> [(job, handler), ...] 等前一个同名任务跑完
+        self._lock = threading.Lock()
+
+    def submit(self, filename, file_path, handler, kb=None, sha256=None):
+        """提交任务。排队已满返回 None；同一个知识库里已经有相同内容 (sha256) 的任务在排队/在跑时，
+        不再提交，直接返回那个任务 (调用方比较 file_path 就知道是不是自己的)。"""
+        with self._lock:
+            self._cleanup()
+            active = [j for j in self._jobs.values() if j.status in ("pending", "running")]
+            if sha256 is not None:
+                same = next((j for j in active if j.sha256 == sha256 and j.kb == kb), None)
+                if same is not None:
+                    return same
+            if len(active) >= self.max_pending:
+                return None
+            job = IngestJob(filename, file_path, kb, sha256)
+            self._jobs[job.id] = job
+            if job.key is not None and any(j.key == job.key for j in active):
+                self._queued.setdefault(job.key, []).append((job, handler))
+                return job
+        self._executor.submit(self._run, job, handler)
+        return job
+
+    # 同名的下一个任务交给线程池
+    def _start_next(self, key):
+        with self._lock:
+            queued = self._queued.get(key)
+            if not queued:
+                self._queued.pop(key, None)
+                return
+            job, handler = queued.pop(0)
+        self._executor.submit(self._run, job, handler)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    # 这个文件 (知识库 + 文件名) 有排队中或正在跑的任务就返回它，没有返回 None
+    def active(self, filename, kb=None):
+        with self._lock:
+            return next(
+                (j for j in self._jobs.values() if j.filename == filename and j.kb == kb and j.status in ("pending", "running")),
+                None,
+            )
+
+    def _run(self, job, handler):
+        # 后台线程里没有 HTTP 请求 ID，用任务 ID 代替，这个任务的所有日志都能串起来
+        token = request_id_var.set(f"job-{job.id[:8]}")
+        job.status = "running"
+        logger.info(f"📂 [Job {job.id[:8]}] 开始处理文件: {job.filename}")
+        try:
+            handler(job.file_path, progress=job.update)
+            job.status = "success"
+            logger.info(f"✅ [Job {job.id[:8]}] 处理完成")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.exception(f"❌ [Job {job.id[:8]}] 处理失败: {e}")
+        finally:
+            job.finished_at = time.time()
+            request_id_var.reset(token)
+            if job.key is not None:
+                self._start_next(job.key)
+
+    # 🧹 清理过期的已完成任务，避免任务表无限增长
+    def _cleanup(self):
+        deadline = time.time() - config.INGEST_JOB_TTL_SECONDS
+        expired = [job_id for job_id, j in self._jobs.items() if j.finished_at and j.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = IngestJobManager(config.INGEST_WORKERS, config.INGEST_MAX_PENDING)
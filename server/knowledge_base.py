@@ -0,0 +1,313 @@
+# server/knowledge_base.py
+# 📚 多知识库：每个分类 (文件名里的 [xxx] 前缀) 一份独立的索引，互不影响
+#
+# 目录结构 (VECTOR_STORE_PATH 下)：
+#   CURRENT / snapshot-* / delta-*.log   -> 默认知识库 (和以前单索引的位置一样，老数据不用搬)
+#   kbs/<分类>-<hash>/                    -> 其它分类各自一套 IndexStore，外加 kb.json 记录原始分类名
+#
+# 共享索引模式 (SHARED_INDEX=1)：多个 worker / 多台机器共用同一个目录
+#   - 写：每个知识库目录下的 LOCK 文件做跨进程写锁，写之前先追上别的进程写的内容，写完发布新快照
+#   - 读：不拿写锁、只读加载 (不改目录里任何文件)，后台轮询 CURRENT，发现新快照就加载好再换上
+#   - 内存：快照的 .faiss 用 mmap 打开，flat / IVF 的向量和 HNSW 的向量存储在页缓存里只有一份
+#     (要 FAISS 支持 IO_FLAG_MMAP_IFC，见 ann_index.load_store)；HNSW 的邻接图、docstore、BM25 倒排索引每个进程各一份
+#   - 代价：每次写完都发布一份完整快照 (O(全部切片))，不像单进程模式只追加日志，适合读多写少
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+import ann_index
+import config
+from index_store import IndexStore, apply_record
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+try:
+    import fcntl  # 共享索引模式的跨进程写锁 (Windows 上没有，只能单进程写)
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KB = "默认"
+
+
+def kb_name_of(filename):
+    """和 /upload/list 一样的规则：[xxx] 前缀就是分类，没有前缀归到默认知识库。"""
+    if filename.startswith("[") and "]" in filename:
+        name = filename.split("]")[0].strip("[").strip()
+        if name:
+            return name
+    return DEFAULT_KB
+
+
+def kb_path(root, name):
+    if name == DEFAULT_KB:
+        return root
+    # 分类名可能带 / 之类的字符，替换掉再拼上 hash，不同分类不会撞到同一个目录
+    safe = re.sub(r'[\\/:*?"<>|\s.]+', "_", name)[:40]
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(root, "kbs", f"{safe}-{digest}")
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_kb_names(root):
+    names = [DEFAULT_KB]
+    kbs_dir = os.path.join(root, "kbs")
+    if os.path.isdir(kbs_dir):
+        for entry in sorted(os.listdir(kbs_dir)):
+            try:
+                with open(os.path.join(kbs_dir, entry, "kb.json"), "r", encoding="utf-8") as f:
+                    names.append(json.load(f)["name"])
+            except (OSError, ValueError, KeyError):
+                continue
+    return names
+
+
+def snapshot_centroid(root, name):
+    """知识库当前快照里所有向量的均值 (只读 meta.json，不加载知识库)；还没有快照就返回 None。"""
+    centroid = IndexStore(kb_path(root, name)).snapshot_meta().get("centroid")
+    return np.asarray(centroid, dtype=np.float32) if centroid else None
+
+
+class KnowledgeBase:
+    """一个知识库的全部状态：向量库、文件清单、BM25 索引和它的持久化目录。
+
+    所有读写都拿自己的锁，不同知识库的上传和检索互不阻塞。
+    busy 是正在使用它的请求数，RAGService 只会卸载 busy == 0 的知识库。
+    """
+
+    def __init__(self, name, root):
+        self.name = name
+        self.path = kb_path(root, name)
+        self.store = IndexStore(self.path)
+        self.lock = threading.RLock()
+        self.busy = 0
+        self.loaded = False
+        self.vector_store = None
+        self.file_index = {}
+        self.lexical_index = LexicalIndex()
+        self._doc_bytes = 0  # 文本 + 元数据的粗估字节数，算内存占用用
+        self._embeddings = None
+        self._mmap = False
+        self._lock_file = None  # 共享索引模式下拿着的 LOCK 文件
+        self._lock_depth = 0
+
+    def exists(self):
+        return self.name == DEFAULT_KB or os.path.exists(os.path.join(self.path, "kb.json"))
+
+    # 🔄 第一次用到才加载 (快照 + 重放 delta 日志)
+    def ensure_loaded(self, embeddings, mmap=False):
+        with self.lock:
+            if self.loaded:
+                return
+            if self.name != DEFAULT_KB and not self.exists():
+                os.makedirs(self.path, exist_ok=True)
+                with open(os.path.join(self.path, "kb.json"), "w", encoding="utf-8") as f:
+                    json.dump({"name": self.name}, f, ensure_ascii=False)
+            self._embeddings, self._mmap = embeddings, mmap
+            # 共享索引模式下没拿写锁，只读加载；要修的 (截断残缺日志等) 等写的时候拿着锁再做
+            self._set_state(*self.store.load(embeddings, mmap=mmap, read_only=config.SHARED_INDEX))
+            self.loaded = True
+            logger.info(f"📚 [RAG] 知识库 '{self.name}' 已加载 ({self.ntotal()} 个切片)")
+
+    def _set_state(self, vector_store, file_index, lexical_index):
+        self.vector_store, self.file_index, self.lexical_index = vector_store, file_index, lexical_index
+        self._doc_bytes = 0
+        if self.vector_store:
+            for doc in self.vector_store.docstore._dict.values():
+                self._doc_bytes += len(doc.page_content.encode("utf-8")) + 200
+
+    # ---------- 共享索引模式 ----------
+    # 🔒 跨进程写锁 (flock)，可重入：delete_file 里还会调 save
+    @contextmanager
+    def _writer_lock(self):
+        if self._lock_depth == 0 and config.SHARED_INDEX and fcntl is not None:
+            os.makedirs(self.path, exist_ok=True)
+            self._lock_file = open(os.path.join(self.path, "LOCK"), "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0 and self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
+
+    # ✍️ 所有写操作的入口：本进程的锁 + 跨进程写锁，最外层进来时先追上别的进程已经写进去的内容
+    @contextmanager
+    def _writing(self):
+        with self.lock, self._writer_lock():
+            if config.SHARED_INDEX and self.loaded and self._lock_depth == 1:
+                if self.store.is_stale():
+                    self._reload()
+                else:
+                    self.vector_store = self.store.replay(
+                        self.vector_store, self.file_index, self.lexical_index, self._embeddings
+                    )
+                self.store.truncate_tail()
+            yield
+
+    # 换成最新发布的快照 (调用方拿着 self.lock；不传 store 时还要拿着写锁)；store / state 可以是在锁外只读加载好的
+    def _reload(self, store=None, state=None):
+        if store is None:
+            store = IndexStore(self.path)
+            state = store.load(self._embeddings, mmap=self._mmap)
+        self.store.close()
+        self.store = store
+        self._set_state(*state)
+
+    # 🔄 后台轮询调用：别的进程发布了新快照就换过去。加载在锁外做，检索只在最后换引用时等一下；返回是否换了
+    def refresh(self):
+        if not self.loaded or not self.store.is_stale():
+            return False
+        store = IndexStore(self.path)
+        state = store.load(self._embeddings, mmap=self._mmap, read_only=True)
+        with self.lock:
+            # 加载期间本进程自己追上了 (写操作会先追)，或者知识库被卸载了，就不用换
+            if not self.loaded or not self.store.is_stale():
+                store.close()
+                return False
+            self._reload(store, state)
+        logger.info(f"🔄 [RAG] 知识库 '{self.name}' 已切换到最新快照 ({self.ntotal()} 个切片)")
+        return True
+
+    # 💤 卸载：内存里的东西都丢掉，数据都在快照和日志里，下次用到再加载
+    def unload(self):
+        with self.lock:
+            self.store.close()
+            self.vector_store = None
+            self.file_index = {}
+            self.lexical_index = LexicalIndex()
+            self._doc_bytes = 0
+            self.loaded = False
+            logger.info(f"💤 [RAG] 知识库 '{self.name}' 已卸载")
+
+    def ntotal(self):
+        return self.vector_store.index.ntotal if self.vector_store else 0
+
+    # 📏 粗估常驻内存：向量 (按索引类型算每条的字节数) + 文本和元数据
+    def memory_bytes(self):
+        if not self.vector_store:
+            return 0
+        index = self.vector_store.index
+        if ann_index.index_type_of(index) == "ivf_pq":
+            per_vector = config.PQ_M * config.PQ_NBITS // 8 + 8
+        else:
+            per_vector = index.d * 4
+            if ann_index.index_type_of(index) == "hnsw":
+                per_vector += config.HNSW_M * 2 * 4
+        return index.ntotal * per_vector + self._doc_bytes
+
+    # ➕ 先追加 delta 日志再改内存 (write-ahead)
+    def add_embedded(self, filename, ids, texts, metadatas, vectors, embeddings):
+        with self._writing():
+            self.store.make_writable(self.vector_store)
+            if not self.vector_store:
+                logger.info(f"✅ 初始化了新的知识库 '{self.name}'")
+            self.store.append_add(filename, ids, texts, metadatas, vectors)
+            self.vector_store = apply_record(
+                self.vector_store,
+                self.file_index,
+                self.lexical_index,
+                {"op": "add", "filename": filename, "ids": ids, "texts": texts, "metadatas": metadatas, "vectors": vectors},
+                embeddings,
+            )
+            self._doc_bytes += sum(len(t.encode("utf-8")) + 200 for t in texts)
+
+    # 🗑️ 按文件清单里的切片 ID 删除；返回删掉的切片数 (0 表示这个知识库里没有这个文件)
+    # ids: 只删这个文件的一部分切片 (增量替换时删掉新版本里已经没有的切片)，不传就是整个文件
+    def delete_file(self, filename, embeddings, ids=None):
+        with self._writing():
+            ids = list(self.file_index.get(filename, []) if ids is None else ids)
+            if not self.vector_store:
+                return 0
+            # 只把索引里确实还在的 ID 写进日志：日志里的删除记录重放时必须能应用
+            present = set(self.vector_store.index_to_docstore_id.values())
+            ids = [i for i in ids if i in present]
+            if not ids:
+                return 0
+            before = self.ntotal()
+            self.store.make_writable(self.vector_store)
+            self.store.append_delete(filename, ids)
+            self.vector_store = apply_record(
+                self.vector_store, self.file_index, self.lexical_index,
+                {"op": "delete", "filename": filename, "ids": ids}, embeddings,
+            )
+            self.store.forget_removed(self.file_index, filename)
+            if self.vector_store.index.ntotal == 0:
+                # 删光了，本地的索引文件也删掉
+                self.vector_store = None
+                self.file_index = {}
+                self.lexical_index = LexicalIndex()
+                self._doc_bytes = 0
+                self.store.clear()
+            else:
+                self._doc_bytes -= self._doc_bytes * len(ids) // max(before, 1)
+                self.save()
+            return len(ids)
+
+    # 🔑 文件入库完成后记下内容哈希
+    def record_hash(self, filename, sha256):
+        with self._writing():
+            if filename in self.file_index:
+                self.store.append_hash(filename, sha256)
+
+    # 这份内容已经在这个知识库里了就返回对应的文件名 (同名文件优先)，否则 None
+    def file_with_hash(self, sha256, filename=None):
+        with self.lock:
+            hashes = self.store.file_hashes
+            if filename is not None and hashes.get(filename) == sha256:
+                return filename
+            return next((name for name, h in hashes.items() if h == sha256), None)
+
+    # 某个文件现有的切片 [(id, Document), ...]，增量替换时用来比对哪些切片没变
+    def chunks_of(self, filename):
+        with self.lock:
+            if not self.vector_store:
+                return []
+            return [(doc_id, self.vector_store.docstore.search(doc_id)) for doc_id in self.file_index.get(filename, [])]
+
+    # 💾 把 delta 日志压缩成新快照：只在日志攒够 DELTA_COMPACT_CHUNKS 个切片 (或 force=True) 时才写
+    # 共享索引模式下只要有新写入就发布快照，其它进程轮询到后切换过去
+    def save(self, force=False):
+        with self._writing():
+            publish = config.SHARED_INDEX and self.store.log_offset > 0
+            if self.vector_store and (force or publish or self.store.needs_compaction()):
+                self.store.make_writable(self.vector_store)
+                # 切片数够多了就把 flat 训练升级成配置的 ANN 索引
+                ann_index.maybe_upgrade(self.vector_store)
+                self.store.write_snapshot(self.vector_store, self.file_index, self.lexical_index)
+                if config.SHARED_INDEX:
+                    # 自己也换回 mmap 打开的快照，不再单独占一份可写的内存副本
+                    self._reload()
+
+    # 🔍 混合检索：向量和 BM25 各取 HYBRID_FETCH_K 个候选，再用 RRF 融合排名，返回 [(Document, 分数), ...]
+    # 只开向量检索时分数是 FAISS 的 L2 距离 (越小越相似)，混合检索时是 RRF 分数 (越大越相关)
+    def search(self, question, query_vector, k, hybrid):
+        with self.lock:
+            if not self.vector_store:
+                return []
+            if not hybrid or not len(self.lexical_index):
+                return self.vector_store.similarity_search_with_score_by_vector(query_vector, k=k)
+
+            fetch_k = max(k, config.HYBRID_FETCH_K)
+            # 直接查 FAISS 拿位置，再映射回 docstore ID (老索引里的 Document 可能没有 id 字段)
+            _, positions = self.vector_store.index.search(np.array([query_vector], dtype=np.float32), fetch_k)
+            dense = [self.vector_store.index_to_docstore_id[p] for p in positions[0] if p != -1]
+            lexical = [doc_id for doc_id, _ in self.lexical_index.search(question, k=fetch_k)]
+            fused = reciprocal_rank_fusion([dense, lexical], k=config.HYBRID_RRF_K)[:k]
+            return [(self.vector_store.docstore.search(doc_id), score) for doc_id, score in fused]
@@ -0,0 +1,163 @@
+# server/lexical_index.py
+# 🔤 BM25 倒排索引：补上向量检索对金额、条款号、产品编码这类精确词的短板
+import math
+import re
+from array import array
+
+import numpy as np
+
+# 一段连续汉字 (CJK 统一表意文字，含扩展 A 区和兼容区)
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+# 英文单词 / 数字 / 编码：允许中间带 . - _ / ，例如 3.5、2024-01、AB-1234、v1.2
+_ASCII_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-_/][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """CJK 感知的分词：汉字按单字 + 相邻双字切，英文数字整词切 (复合编码同时保留整体和各部分)。
+
+    不依赖词典，中文里的 “迟到”“扣款” 这类词靠双字命中，单字保证召回。
+    """
+    text = text.lower().replace(",", "").replace("，", "")
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _ASCII_TOKEN.findall(text):
+        tokens.append(word)
+        parts = re.split(r"[.\-_/]", word)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+class LexicalIndex:
+    """数组存储的倒排表 + BM25 打分。
+
+    每个词一对 array('I')：文档内部编号、词频；文档长度也是 array，比 dict 套 dict 省一个数量级的内存。
+    删除只打墓碑，死文档超过一定比例再整体压缩。
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []            # 内部编号 -> docstore ID
+        self._doc_pos = {}           # docstore ID -> 内部编号
+        self.doc_len = array("I")
+        self.alive = bytearray()
+        self.postings = {}           # 词 -> (array 文档编号, array 词频)
+        self.total_len = 0
+        self.n_alive = 0
+
+    def __len__(self):
+        return self.n_alive
+
+    def add(self, ids, texts):
+        for doc_id, text in zip(ids, texts):
+            pos = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self._doc_pos[doc_id] = pos
+            tokens = tokenize(text)
+            self.doc_len.append(len(tokens))
+            self.alive.append(1)
+            self.total_len += len(tokens)
+            self.n_alive += 1
+
+            counts = {}
+            for t in tokens:
+                counts[t] = counts.get(t, 0) + 1
+            for t, tf in counts.items():
+                plist = self.postings.get(t)
+                if plist is None:
+                    plist = self.postings[t] = (array("I"), array("I"))
+                plist[0].append(pos)
+                plist[1].append(tf)
+
+    def remove(self, ids):
+        for doc_id in ids:
+            pos = self._doc_pos.pop(doc_id, None)
+            if pos is None or not self.alive[pos]:
+                continue
+            self.alive[pos] = 0
+            self.total_len -= self.doc_len[pos]
+            self.n_alive -= 1
+        # 墓碑太多会拖慢检索，超过一半就压缩
+        if len(self.doc_ids) > 1000 and self.n_alive < len(self.doc_ids) // 2:
+            self.compact()
+
+    def compact(self):
+        remap = {}
+        for old, doc_id in enumerate(self.doc_ids):
+            if self.alive[old]:
+                remap[old] = len(remap)
+        postings = {}
+        for t, (docs, tfs) in self.postings.items():
+            new_docs, new_tfs = array("I"), array("I")
+            for d, tf in zip(docs, tfs):
+                if d in remap:
+                    new_docs.append(remap[d])
+                    new_tfs.append(tf)
+            if new_docs:
+                postings[t] = (new_docs, new_tfs)
+        self.doc_ids = [self.doc_ids[old] for old in remap]
+        self._doc_pos = {doc_id: pos for pos, doc_id in enumerate(self.doc_ids)}
+        self.doc_len = array("I", (self.doc_len[old] for old in remap))
+        self.alive = bytearray([1]) * len(self.doc_ids)
+        self.postings = postings
+
+    def search(self, query, k=10):
+        """返回 [(docstore ID, BM25 分数), ...]，分数从高到低。"""
+        if not self.n_alive:
+            return []
+        n = len(self.doc_ids)
+        scores = np.zeros(n, dtype=np.float32)
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        doc_len = np.frombuffer(self.doc_len, dtype=np.uint32).astype(np.float32)
+        avgdl = self.total_len / self.n_alive or 1.0
+
+        for t in set(tokenize(query)):
+            plist = self.postings.get(t)
+            if plist is None:
+                continue
+            docs = np.frombuffer(plist[0], dtype=np.uint32)
+            tfs = np.frombuffer(plist[1], dtype=np.uint32).astype(np.float32)
+            live = alive[docs]
+            df = int(live.sum())
+            if not df:
+                continue
+            docs, tfs = docs[live], tfs[live]
+            idf = math.log(1 + (self.n_alive - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_len[docs] / avgdl)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        hit = np.nonzero(scores)[0]
+        if not len(hit):
+            return []
+        top = hit[np.argsort(-scores[hit])[:k]]
+        return [(self.doc_ids[i], float(scores[i])) for i in top]
+
+    # 💾 持久化：只存数组和列表，pickle 体积小、加载快
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_doc_pos"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._doc_pos = {doc_id: pos for pos, doc_id in enumerate(self.doc_ids) if self.alive[pos]}
+
+    @classmethod
+    def from_vector_store(cls, vector_store):
+        index = cls()
+        if vector_store:
+            ids = list(vector_store.index_to_docstore_id.values())
+            index.add(ids, [vector_store.docstore.search(i).page_content for i in ids])
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """RRF：score(d) = Σ 1 / (k + rank)，rankings 是若干个按相关度排好序的 ID 列表。"""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
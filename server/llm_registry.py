@@ -0,0 +1,126 @@
+# server/llm_registry.py
+# 🏊 LLM 客户端注册表：每个模型只建一次 ChatOpenAI，同一家厂商共享一个 keep-alive 连接池
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+import config
+from admission import AdmissionGate
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRegistry:
+    """按 model_config 懒加载 LLM 客户端。
+
+    - 同一个 provider 的模型共用一对 httpx.Client / httpx.AsyncClient，TLS 握手和连接都能复用
+    - 每个模型有自己的并发上限 (model_config 里该模型的 max_concurrency)，用 limit()/alimit() 包住调用；
+      同一厂商的不同模型 (例如 deepseek-chat 和 deepseek-reasoner) 限额不同、互不占名额
+    - 接口层用 admission_gate() 在请求进来时就按同样的名额排队，排不上直接 429；
+      拿到名额的请求不再过 alimit (achat_stream 的 ticket 参数)，alimit 只管没走准入的调用
+    """
+
+    def __init__(self, model_config):
+        self.model_config = model_config
+        self._clients = {}       # model_name -> ChatOpenAI
+        self._http = {}          # provider -> (httpx.Client, httpx.AsyncClient)
+        self._async_limits = {}  # model_name -> asyncio.Semaphore
+        self._sync_limits = {}   # model_name -> threading.BoundedSemaphore
+        self._gates = {}         # model_name -> AdmissionGate
+        self._lock = threading.Lock()
+
+    def _provider(self, model_name):
+        config_ = self.model_config[model_name]
+        return config_.get("provider") or config_.get("base_url") or "default"
+
+    def _http_clients(self, provider):
+        if provider not in self._http:
+            limits = httpx.Limits(
+                max_connections=config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_MAX_KEEPALIVE,
+                keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY,
+            )
+            timeout = httpx.Timeout(config.LLM_TIMEOUT_SECONDS, connect=10.0)
+            self._http[provider] = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout),
+            )
+        return self._http[provider]
+
+    # 🛠️ 取（必要时创建）某个模型的客户端
+    def get(self, model_name):
+        config_ = self.model_config.get(model_name)
+        if not config_:
+            raise ValueError(f"⚠️ 模型 {model_name} 的 API Key 未配置，请检查 .env 文件")
+        
+        client = self._clients.get(model_name)
+        if client is not None:
+            return client
+        with self._lock:
+            if model_name not in self._clients:
+                logger.info(f"🔄 正在初始化模型: {model_name} (URL: {config_['base_url']})")
+                http_client, http_async_client = self._http_clients(self._provider(model_name))
+                self._clients[model_name] = ChatOpenAI(
+                    api_key=config_["api_key"],
+                    base_url=config_["base_url"],
+                    model=model_name,
+                    temperature=config_.get("temperature", 0.3),
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                )
+            return self._clients[model_name]
+
+    # 🔌 直接登记一个现成的客户端 (例如压测用的本地假模型)，只要有 stream / astream 就行
+    def register(self, model_name, client, **model_config):
+        with self._lock:
+            self.model_config.setdefault(model_name, {"provider": model_name, **model_config})
+            self._clients[model_name] = client
+
+    def _max_concurrency(self, model_name):
+        return self.model_config[model_name].get("max_concurrency", config.LLM_DEFAULT_MAX_CONCURRENCY)
+
+    # 🚦 异步版并发限制：同一个模型同时最多 max_concurrency 个请求在跑
+    @asynccontextmanager
+    async def alimit(self, model_name):
+        with self._lock:
+            if model_name not in self._async_limits:
+                self._async_limits[model_name] = asyncio.Semaphore(self._max_concurrency(model_name))
+            semaphore = self._async_limits[model_name]
+        async with semaphore:
+            yield
+
+    # 🚦 请求级的准入名额：和 alimit 同样的并发数，外加有上限的等待队列 (见 admission.py)；两者不叠加使用
+    def admission_gate(self, model_name):
+        with self._lock:
+            if model_name not in self._gates:
+                model_config = self.model_config[model_name]
+                self._gates[model_name] = AdmissionGate(
+                    model_name,
+                    capacity=self._max_concurrency(model_name),
+                    max_queue=model_config.get("max_queue", config.CHAT_MAX_QUEUE),
+                    queue_timeout=config.CHAT_QUEUE_TIMEOUT_SECONDS,
+                    short_lane_burst=config.CHAT_SHORT_LANE_BURST,
+                )
+            return self._gates[model_name]
+
+    # 🚦 同步版并发限制，给 chat_stream 这种线程里跑的调用用
+    @contextmanager
+    def limit(self, model_name):
+        with self._lock:
+            if model_name not in self._sync_limits:
+                self._sync_limits[model_name] = threading.BoundedSemaphore(self._max_concurrency(model_name))
+            semaphore = self._sync_limits[model_name]
+        with semaphore:
+            yield
+
+    # 🧹 关闭所有连接池 (应用退出时调用)
+    async def aclose(self):
+        for http_client, http_async_client in self._http.values():
+            http_client.close()
+            await http_async_client.aclose()
+        self._http.clear()
+        self._clients.clear()
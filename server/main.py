@@ -1,16 +1,21 @@
 # server/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import config
+from observability import RequestContextMiddleware, setup_logging
+
+# 📝 日志统一带上请求 ID (要在 import 其它模块之前配置好)
+setup_logging(config.LOG_LEVEL)
+
 # 👇 变化在这里：
-from database import engine
+from database import engine, init_db
 import models # 👈 必须导入这个，不然 create_all 找不到表！
+from write_buffer import write_buffer
 
 # 引入路由模块
-from routers import upload, chat
-
-# 初始化数据库表
-# Base.metadata.create_all(bind=engine)
-models.Base.metadata.create_all(bind=engine)
+from routers import upload, chat, search, metrics
+from fastapi.concurrency import run_in_threadpool
+from rag_core import close_rag_service, warm_up
 
 app = FastAPI(title="企业知识库助手 Pro")
 
@@ -21,11 +26,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id", "X-Message-Id", "X-Request-Id"], # 让前端读得到会话 ID、消息 ID 和请求 ID
 )
 
+# 🏷️ 每个请求分配一个请求 ID (或沿用请求头 X-Request-Id)，日志里都带上；顺便记录请求耗时
+app.add_middleware(RequestContextMiddleware)
+
 # 🔗 注册路由 (把拆分出去的模块挂载回来)
 app.include_router(upload.router) # 负责 /upload
 app.include_router(chat.router)   # 负责 /chat, /history, /feedback
+app.include_router(search.router) # 负责 /search
+app.include_router(metrics.router) # 负责 /metrics
+
+# 🗄️ 启动时建表 (异步引擎，不再在 import 时同步连库)，并启动聊天记录的批量写入任务
+@app.on_event("startup")
+async def start_database():
+    # Base.metadata.create_all(bind=engine)
+    await init_db()
+    write_buffer.start()
+
+# 🔥 启动时加载模型并预热 (放到线程池里，不卡事件循环)
+@app.on_event("startup")
+async def warm_up_models():
+    if config.WARMUP_ON_STARTUP:
+        await run_in_threadpool(warm_up)
+
+# 🧹 退出时关闭 LLM 连接池
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await close_rag_service()
+
+# 🧹 退出时把没写完的聊天记录写完，再关掉数据库连接池
+@app.on_event("shutdown")
+async def stop_database():
+    await write_buffer.stop()
+    await engine.dispose()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,5 @@
 # server/models.py
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
 from sqlalchemy.sql import func
 # 记得保留这个 MySQL 专用的类型
 from sqlalchemy.dialects.mysql import DATETIME 
@@ -8,21 +8,36 @@ from datetime import datetime
 # 👈 从 database.py 引入基类
 from database import Base 
 
+# MySQL 上用带微秒的 DATETIME(fsp=6)，其它数据库 (例如测试用的 SQLite) 用通用的 DateTime
+PreciseDateTime = DateTime().with_variant(DATETIME(fsp=6), "mysql")
+
 # --- 聊天记录表 ---
 class ChatHistory(Base):
     __tablename__ = "chat_history"
 
     id = Column(Integer, primary_key=True, index=True)
+    # 会话 ID：同一个对话的消息共用一个 (老数据是 NULL)
+    session_id = Column(String(64))
+    # 消息 ID (uuid，入队时就生成，不用等 INSERT 拿自增 id)，点赞反馈用它
+    msg_id = Column(String(36))
+    # AI 回答对应的用户问题的 msg_id
+    reply_to = Column(String(36))
     role = Column(String(20)) # user / ai
     content = Column(Text)
     # 保留微秒精度
-    create_time = Column(DATETIME(fsp=6), default=datetime.now)
+    create_time = Column(PreciseDateTime, default=datetime.now, index=True)
+
+    __table_args__ = (
+        # 按会话翻页：WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT n 直接走这个索引，不用排序
+        Index("ix_chat_history_session_id_id", "session_id", "id"),
+        Index("uq_chat_history_msg_id", "msg_id", unique=True),
+    )
 
 # --- 点赞反馈表 ---
 class Feedback(Base):
     __tablename__ = "feedback_log"
 
     id = Column(Integer, primary_key=True, index=True)
-    msg_id = Column(String(50))
+    msg_id = Column(String(50), index=True)
     score = Column(Integer)
-    create_time = Column(DATETIME(fsp=6), default=datetime.now)
\ No newline at end of file
+    create_time = Column(PreciseDateTime, default=datetime.now)
\ No newline at end of file
@@ -0,0 +1,127 @@
+# server/observability.py
+# 📈 可观测性：请求 ID (贯穿整条请求的日志) + Prometheus 指标
+# prometheus_client 是可选依赖，没装时指标全部是空操作，/metrics 返回 503
+import contextvars
+import logging
+import time
+import uuid
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain"
+
+# ---------- 请求 ID ----------
+# 每个 HTTP 请求 / 后台入库任务一个 ID，日志里自动带上；asyncio 任务和 run_in_threadpool 都会继承
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+def setup_logging(level="INFO"):
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+# ---------- 指标 ----------
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+def _histogram(name, documentation, labels, buckets):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _counter(name, documentation, labels):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labels)
+
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# 聊天各阶段：query_embed / retrieve / rerank / prompt_build / ttft (请求开始到第一个字) / generation
+CHAT_STAGE_SECONDS = _histogram("rag_chat_stage_seconds", "聊天请求各阶段耗时", ["stage"], _LATENCY_BUCKETS)
+CHAT_TOKENS_PER_SECOND = _histogram(
+    "rag_chat_tokens_per_second", "生成速度 (估算 token 数 / 生成耗时)", [], (1, 5, 10, 20, 40, 60, 80, 120, 200, 400)
+)
+# 聊天准入 (admission.py)：排队等名额的时间 (lane: short / normal)，以及排不上被 429 的次数 (reason: queue_full / queue_timeout)
+CHAT_ADMISSION_WAIT_SECONDS = _histogram(
+    "rag_chat_admission_wait_seconds", "聊天请求排队等并发名额的时间", ["provider", "lane"], _LATENCY_BUCKETS
+)
+CHAT_ADMISSION_REJECTED = _counter("rag_chat_admission_rejected", "聊天请求因排队已满/超时被拒绝的次数", ["provider", "reason"])
+# 入库各阶段 (每个文件一次)：parse / split / embed / save
+INGEST_STAGE_SECONDS = _histogram(
+    "rag_ingest_stage_seconds", "文件入库各阶段耗时", ["stage"], _LATENCY_BUCKETS + (300, 600, 1800)
+)
+HTTP_REQUEST_SECONDS = _histogram(
+    "rag_http_request_seconds", "HTTP 请求耗时 (流式响应算到最后一个字节)", ["method", "route", "status"], _LATENCY_BUCKETS
+)
+
+
+def render_metrics():
+    """返回 (内容, content-type)；没装 prometheus_client 时内容是 None。"""
+    if not PROMETHEUS_AVAILABLE:
+        return None, CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ---------- 中间件 ----------
+class RequestContextMiddleware:
+    """纯 ASGI 中间件 (不缓冲流式响应)：
+
+    - 读请求头 X-Request-Id，没有就生成一个，放进 contextvar 并写回响应头
+    - 记录 HTTP 请求耗时直方图，route 用路由模板 (例如 /upload/jobs/{job_id})，避免标签爆炸
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            ).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
@@ -1,23 +1,45 @@
 # 文件位置: server/rag_core.py
+import json
+import logging
 import os
+import asyncio
+import uuid
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack, aclosing, contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import CharacterTextSplitter
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter  # ➕ 新增：递归切分器
-from langchain_openai import OpenAIEmbeddings   # 👈 嵌入模型
-from langchain_openai import ChatOpenAI         # 👈 聊天模型
 
 # ➕ 新增：引入 PDF,word,excel 加载器
-from langchain_community.document_loaders import PyPDFLoader,Docx2txtLoader,UnstructuredExcelLoader
+from langchain_community.document_loaders import Docx2txtLoader
+
+import config
+from knowledge_base import DEFAULT_KB, KnowledgeBase, file_sha256, kb_name_of, list_kb_names, snapshot_centroid
+from lexical_index import LexicalIndex
+from embedding_cache import CachedEmbeddings
+from embedding_backend import create_embeddings, cache_model_key
+from llm_registry import LLMRegistry
+from answer_cache import SemanticAnswerCache, iter_replay
+from reranker import CrossEncoderReranker
+from timing import StageTimer, timed_iter
+from observability import CHAT_STAGE_SECONDS, CHAT_TOKENS_PER_SECOND, INGEST_STAGE_SECONDS
+from context_builder import build_context, estimate_tokens
+from chunking import PROFILES, create_splitter
+from ingest_pipeline import discard_process_pool, get_process_pool, iter_pdf_pages, iter_chunk_batches, iter_excel_row_groups
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 # 这里的逻辑和你之前的一模一样，只是封装成了类
 class RAGService:
-    def __init__(self):
+    # embeddings: 可以传入现成的 Embeddings 对象 (压测里用假模型)，不传就按 EMBEDDING_BACKEND 创建
+    def __init__(self, embeddings=None):
         # # 1. 初始化模型
         # self.llm = ChatOpenAI(
         #     api_key=api_key,
@@ -31,107 +53,322 @@ class RAGService:
         self.model_config = {
             # === DeepSeek 系列 ===
             "deepseek-chat": {
+                "provider": "deepseek",
                 "api_key": os.getenv("DEEPSEEK_API_KEY"),
                 "base_url": os.getenv("DEEPSEEK_BASE_URL"),
+                "max_concurrency": int(os.getenv("DEEPSEEK_CHAT_MAX_CONCURRENCY") or os.getenv("DEEPSEEK_MAX_CONCURRENCY", "32")), # 这个模型自己的名额，没配就用厂商的默认值
+                "context_tokens": 6000, # 上下文 token 预算 (提示词里已知信息部分的上限)
                 "temperature": 0.3
             },
             "deepseek-reasoner": {
+                "provider": "deepseek",
                 "api_key": os.getenv("DEEPSEEK_API_KEY"),
                 "base_url": os.getenv("DEEPSEEK_BASE_URL"),
+                "max_concurrency": int(os.getenv("DEEPSEEK_REASONER_MAX_CONCURRENCY") or os.getenv("DEEPSEEK_MAX_CONCURRENCY", "32")), # 这个模型自己的名额，没配就用厂商的默认值
+                "context_tokens": 6000, # 上下文 token 预算 (提示词里已知信息部分的上限)
                 "temperature": 0.1 # 推理模型通常低温
             },
             
             # === 阿里云通义千文系列 ===
             "qwen-plus": {
+                "provider": "qwen",
                 "api_key": os.getenv("QWEN_API_KEY"),
                 "base_url": os.getenv("QWEN_BASE_URL"),
+                "max_concurrency": int(os.getenv("QWEN_PLUS_MAX_CONCURRENCY") or os.getenv("QWEN_MAX_CONCURRENCY", "32")), # 这个模型自己的名额，没配就用厂商的默认值
+                "context_tokens": 8000, # 上下文 token 预算 (提示词里已知信息部分的上限)
                 "temperature": 0.5
             },
             "qwen-max": { # 通义千文最强版
+                "provider": "qwen",
                 "api_key": os.getenv("QWEN_API_KEY"),
                 "base_url": os.getenv("QWEN_BASE_URL"),
+                "max_concurrency": int(os.getenv("QWEN_MAX_MAX_CONCURRENCY") or os.getenv("QWEN_MAX_CONCURRENCY", "32")), # 这个模型自己的名额，没配就用厂商的默认值
+                "context_tokens": 6000, # 上下文 token 预算 (提示词里已知信息部分的上限)
                 "temperature": 0.5
             },
 
             # === OpenAI 系列 ===
             "gpt-4o": {
+                "provider": "openai",
                 "api_key": os.getenv("OPENAI_API_KEY"),
                 "base_url": os.getenv("OPENAI_BASE_URL"),
+                "max_concurrency": int(os.getenv("GPT_4O_MAX_CONCURRENCY") or os.getenv("OPENAI_MAX_CONCURRENCY", "32")), # 这个模型自己的名额，没配就用厂商的默认值
+                "context_tokens": 8000, # 上下文 token 预算 (提示词里已知信息部分的上限)
                 "temperature": 0.7
             }
         }
         
-        # 默认初始化一个模型 (防止启动报错)
-        self.current_llm = self._create_llm("deepseek-chat")   
+        # 🏊 模型客户端注册表：用到哪个模型才创建哪个，之后一直复用 (连接池也复用)
+        self.llm_registry = LLMRegistry(self.model_config)
         
-        print("正在加载本地嵌入模型 (首次运行可能需要下载)...")
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2") 
-        # ✅ 使用这个！它会下载一个小模型到你电脑上，不用联网也能跑
-        self.vector_store_path = "faiss_index" # 💾 索引保存路径
-        self.vector_store = self._load_vector_store() # 🔄 启动时尝试加载
-    
-    # 🛠️ 工厂方法：专门负责生产 LLM 对象
-    def _create_llm(self, model_name):
-        config = self.model_config.get(model_name)
-        if not config:
-            raise ValueError(f"⚠️ 模型 {model_name} 的 API Key 未配置，请检查 .env 文件")
+        # 🗂️ 语义答案缓存 + 索引版本号 (知识库每变一次 +1，旧答案自动作废)
+        self.answer_cache = SemanticAnswerCache(
+            threshold=config.ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        )
+        self.index_version = 0
         
-        print(f"🔄 正在初始化模型: {model_name} (URL: {config['base_url']})")
+        # 🎯 可选的重排模型 (RERANK_ENABLED=1 才加载)
+        self.reranker = None
+        if config.RERANK_ENABLED:
+            reranker = CrossEncoderReranker(
+                config.RERANK_MODEL,
+                batch_size=config.RERANK_BATCH_SIZE,
+                cache_size=config.RERANK_CACHE_SIZE,
+                max_inflight=config.RERANK_MAX_INFLIGHT,
+            )
+            self.reranker = reranker if reranker.available else None
         
-        return ChatOpenAI(
-            api_key=config["api_key"],
-            base_url=config["base_url"],
-            model=model_name,
-            temperature=config.get("temperature", 0.3)
+        logger.info("正在加载本地嵌入模型 (首次运行可能需要下载)...")
+        # ✅ 使用这个！它会下载一个小模型到你电脑上，不用联网也能跑
+        # 外面再包一层磁盘缓存：重复上传、共享的样板文字都不用再跑一遍模型
+        # EMBEDDING_BACKEND=onnx 时换成 int8 量化的 ONNX 模型，接口不变；缓存键按实际加载上的后端算
+        backend = None
+        if embeddings is None:
+            embeddings, backend = create_embeddings()
+        self.embeddings = CachedEmbeddings(
+            embeddings,
+            model_name=cache_model_key(backend),
+            cache_path=config.EMBEDDING_CACHE_PATH,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            query_cache_size=config.QUERY_EMBEDDING_CACHE_SIZE,
         )
+        self.vector_store_path = config.VECTOR_STORE_PATH # 💾 索引保存路径
+        # 🧮 嵌入专用线程池，所有入库任务共享
+        self._embed_executor = ThreadPoolExecutor(max_workers=config.INGEST_EMBED_WORKERS, thread_name_prefix="embed")
+        # 📚 每个分类一个知识库 (各自的 FAISS + 文件清单 + BM25 + 快照/日志)，用到才加载
+        # OrderedDict 按最近使用排序，已加载的总内存超过 KB_MEMORY_LIMIT_MB 就从最久没用的开始卸载
+        self.kbs = OrderedDict()
+        # 🔒 只保护 self.kbs 这张表；每个知识库的读写用它自己的锁
+        self._lock = threading.Lock()
+        # 🧭 各知识库快照里的向量均值 (不指定知识库时挑要检索哪几个用)，知识库内容变了就清空重读
+        self._kb_centroids = {}
+        # 🔄 启动时先加载默认知识库 (老版本的单索引就在这里)
+        with self._use_kb(DEFAULT_KB):
+            pass
+        # 👀 共享索引模式：后台线程盯着其它 worker 发布的新快照
+        if config.SHARED_INDEX:
+            threading.Thread(target=self._watch_shared_index, name="index-watch", daemon=True).start()
+    
+    # 🛠️ 工厂方法：专门负责提供 LLM 对象 (从注册表里取，不再每次请求都新建)
+    def _create_llm(self, model_name):
+        return self.llm_registry.get(model_name)
         
-    # 🔄 内部方法：尝试从硬盘加载索引
-    def _load_vector_store(self):
-        if os.path.exists(self.vector_store_path):
-            try:
-                # allow_dangerous_deserialization=True 是为了加载本地 pickle 文件
-                vs = FAISS.load_local(self.vector_store_path, self.embeddings, allow_dangerous_deserialization=True)
-                print("✅ [RAG] 成功加载本地索引！")
-                return vs
-            except Exception as e:
-                print(f"⚠️ [RAG] 加载索引失败，将重建: {e}")
-                return None
-        return None
-
-    # 💾 内部方法：保存索引到硬盘
-    def _save_vector_store(self):
-        if self.vector_store:
-            self.vector_store.save_local(self.vector_store_path)
-            print("💾 [RAG] 索引已保存到本地")
+    # 📚 内部方法：取一个知识库来用 (没加载就加载：快照 + 重放 delta 日志，最新快照坏了会自动退回上一个)
+    # 用的期间 busy +1，不会被卸载；用完再按内存上限卸载最久没用的知识库
+    @contextmanager
+    def _use_kb(self, name):
+        with self._lock:
+            kb = self.kbs.get(name)
+            if kb is None:
+                kb = self.kbs[name] = KnowledgeBase(name, self.vector_store_path)
+            self.kbs.move_to_end(name)
+            kb.busy += 1
+        try:
+            # INDEX_MMAP=1 时 .faiss 用 mmap 打开 (见 ann_index.load_store)；共享索引模式总是 mmap
+            kb.ensure_loaded(self.embeddings, mmap=config.INDEX_MMAP or config.SHARED_INDEX)
+            self._evict()
+            yield kb
+        finally:
+            with self._lock:
+                kb.busy -= 1
+
+    # 💤 内部方法：已加载知识库的总内存超过上限，从最久没用的开始卸载 (正在用的跳过)
+    def _evict(self):
+        limit = config.KB_MEMORY_LIMIT_MB * 1024 * 1024
+        with self._lock:
+            loaded = [kb for kb in self.kbs.values() if kb.loaded]
+            total = sum(kb.memory_bytes() for kb in loaded)
+            for kb in loaded:
+                if total <= limit:
+                    break
+                if kb.busy == 0:
+                    total -= kb.memory_bytes()
+                    kb.unload()
+                    del self.kbs[kb.name]
+
+    # 🔄 共享索引模式的轮询：已加载的知识库有新快照就热切换，旧答案缓存跟着作废
+    def _watch_shared_index(self):
+        while True:
+            time.sleep(config.SHARED_INDEX_POLL_SECONDS)
+            with self._lock:
+                kbs = [kb for kb in self.kbs.values() if kb.loaded]
+            for kb in kbs:
+                try:
+                    if kb.refresh():
+                        self._bump_index_version()
+                except Exception as e:
+                    logger.warning(f"⚠️ [RAG] 知识库 '{kb.name}' 切换新快照失败，下次再试: {e}")
+
+    # 📋 有哪些知识库 (默认知识库 + 硬盘上已经建过的分类)
+    def list_kbs(self):
+        return list_kb_names(self.vector_store_path)
+
+    # 💾 把所有已加载知识库攒够的 delta 日志压缩成快照
+    def _save_all(self, force=False):
+        with self._lock:
+            kbs = [kb for kb in self.kbs.values() if kb.loaded]
+        for kb in kbs:
+            kb.save(force=force)
+        with self._lock:
+            self._kb_centroids.clear()
     
-    # 1. 保留原来的字符串初始化方法 (为了兼容)
+    # 1. 保留原来的字符串初始化方法 (为了兼容，写进默认知识库，只在内存里)
     def init_from_text(self, text_content):
-        text_splitter = CharacterTextSplitter(separator="\n", chunk_size=100, chunk_overlap=10)
-        docs = [Document(page_content=x) for x in text_splitter.split_text(text_content)]
-        self.vector_store = FAISS.from_documents(docs, self.embeddings)
-        print("✅ 文本知识库初始化完成")
+        docs = create_splitter(profile="text").split_documents([Document(page_content=text_content)])
+        with self._use_kb(DEFAULT_KB) as kb, kb.lock:
+            kb.vector_store = FAISS.from_documents(docs, self.embeddings)
+            kb.store.mmapped = False  # 换成了内存里的新索引，不再是 mmap 打开的快照
+            kb.lexical_index = LexicalIndex.from_vector_store(kb.vector_store)
+        self._bump_index_version()
+        logger.info("✅ 文本知识库初始化完成")
 
     # 🔄 [重构] 这是一个内部通用方法，不管什么文件，读出来后都走这套流程
-    def _proccess_and_save(self, docs,file_path):
-        print(f"✅ 成功加载 {len(docs)} 页 文档")
+    # docs 可以是列表，也可以是边解析边产出的生成器：来一页切一页，攒够一批就送去嵌入
+    # progress: 可选的进度回调，后台任务用它汇报 “解析了几页 / 嵌入了几个切片”
+    # save: 批量导入时由调用方最后统一保存一次
+    # timer: 调用方已经计过时的阶段 (例如 Word/Excel 一次性解析的 parse)，后面的阶段接着记在里面
+    # sha256: 文件内容哈希，全部切片写完后记进文件清单，下次上传同样的内容直接跳过
+    # file_path 是文件在知识库里的“身份” (uploads/<文件名>)，切片的 source 统一写成它，不管实际是从哪个临时文件解析的
+    def _proccess_and_save(self, docs, file_path, progress=None, save=True, timer=None, sha256=None):
+        # ✂️ 按文件格式选切分配置 (chunking.PROFILES)：PDF 页内按标题/段落、Word 按段落、Excel 行组原样保留
+        # 切片带 start_index (拼上下文时合并重叠/相邻的片段) 和 chunker / chunk_index / section 等血缘信息
+        splitter = create_splitter(file_path)
+        docs = self._with_source(docs, file_path)
+        filename = os.path.basename(file_path)
+        # 📚 按文件名的 [分类] 前缀写进对应的知识库
+        with self._use_kb(kb_name_of(filename)) as kb:
+            self._ingest(kb, docs, filename, splitter, progress, save, timer or StageTimer(), sha256)
+        logger.info(f"✅ 文件 '{filename}' 已成功添加到知识库 '{kb.name}'！") 
+
+    # 切分 -> 嵌入 -> 写进 kb (调用方已经拿着这个知识库，入库期间不会被卸载)
+    # 各阶段耗时累加在 timer 里：parse (从生成器取页) / split / embed (各批嵌入之和) / save (写日志 + 索引 + 快照)
+    def _ingest(self, kb, docs, filename, splitter, progress, save, timer, sha256=None):
+        hits_before, misses_before = self.embeddings.hits, self.embeddings.misses
+        docs = timed_iter(docs, timer, "parse")
         
-        # 统一使用配置好的切分器
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        split_docs = splitter.split_documents(docs)
-        print(f"✅ 切分成 {len(split_docs)} 知识片段")
+        # 🔁 同名文件再次入库 (内容改过)：文本和元数据都没变的切片原样保留，不嵌入也不动索引，
+        # 新版本全部写完后只删掉已经没有的旧切片；替换过程中旧版本一直可以被检索到
+        reusable = {}
+        for doc_id, doc in kb.chunks_of(filename):
+            reusable.setdefault(self._chunk_key(doc), []).append(doc_id)
+        replacing = bool(reusable)
         
-        if self.vector_store:
-            self.vector_store.add_documents(split_docs)
-            print("✅ 已经追加到现有知识库")
-        else:
-            self.vector_store = FAISS.from_documents(split_docs, self.embeddings)
-            print("✅ 初始化了新的知识库")  
-            
-        self._save_vector_store()
-        print(f"✅ 文件 '{os.path.basename(file_path)}' 已成功添加到知识库！") 
+        # 嵌入在单独的线程池里跑，同时在飞的批次有上限：解析再快，内存里也只压着这么几批
+        inflight = deque()
+        ids = []
+        stale = []
+        pages = chunks = embedded = kept = 0
+
+        def drain_one():
+            nonlocal embedded
+            batch, batch_ids, future = inflight.popleft()
+            vectors = future.result()
+            # 给每个切片分配一个 ID，并记到文件清单里，删除时只删这些 ID
+            with timer.stage("save", accumulate=True):
+                self._add_embedded(kb, batch, vectors, batch_ids, filename)
+            ids.extend(batch_ids)
+            embedded += len(batch)
+            if progress:
+                progress(chunks_embedded=embedded)
+
+        try:
+            for pages, batch in iter_chunk_batches(docs, splitter, config.EMBEDDING_BATCH_SIZE, timer=timer):
+                chunks += len(batch)
+                if progress:
+                    progress(pages_parsed=pages, chunks_total=chunks)
+                if replacing:
+                    fresh = []
+                    for doc in batch:
+                        old_ids = reusable.get(self._chunk_key(doc))
+                        if old_ids:
+                            old_ids.pop()
+                            kept += 1
+                            embedded += 1
+                        else:
+                            fresh.append(doc)
+                    batch = fresh
+                    if progress:
+                        progress(chunks_embedded=embedded)
+                    if not batch:
+                        continue
+                if len(inflight) >= config.INGEST_MAX_INFLIGHT_BATCHES:
+                    drain_one()
+                batch_ids = [str(uuid.uuid4()) for _ in batch]
+                future = self._embed_executor.submit(self._timed_embed, [d.page_content for d in batch], timer)
+                inflight.append((batch, batch_ids, future))
+            while inflight:
+                drain_one()
+            stale = [doc_id for old_ids in reusable.values() for doc_id in old_ids]
+            if stale:
+                with timer.stage("save", accumulate=True):
+                    kb.delete_file(filename, self.embeddings, ids=stale)
+            if sha256:
+                kb.record_hash(filename, sha256)
+        finally:
+            # 中途失败时已经写进索引 (和日志) 的切片也登记在清单里了，这里只需要让旧答案作废
+            # (没记哈希，下次重新上传会按增量替换接着做，已经写进去的切片直接复用)
+            if ids or stale:
+                self._bump_index_version()
+        logger.info(f"✅ 成功加载 {pages} 页 文档，切分成 {chunks} 知识片段")
+        if replacing:
+            logger.info(f"🔁 增量替换 '{filename}'：保留 {kept} 个未变的切片，新增 {len(ids)} 个，删除 {len(stale)} 个")
+        
+        if save:
+            with timer.stage("save", accumulate=True):
+                kb.save()
+        timer.observe(INGEST_STAGE_SECONDS, names=("parse", "split", "embed", "save"))
+        logger.info(f"⏱️ [RAG] 入库各阶段耗时(ms): {timer.timings}")
+        hits = self.embeddings.hits - hits_before
+        misses = self.embeddings.misses - misses_before
+        logger.info(f"💽 嵌入缓存：本次命中 {hits}/{hits + misses}，累计命中率 {self.embeddings.stats()['hit_rate']:.1%}")
+
+    @staticmethod
+    def _with_source(docs, source):
+        for doc in docs:
+            doc.metadata["source"] = source
+            yield doc
+
+    # 切片的“身份”：文本 + 元数据 (页码、start_index 等) 都一样才算没变
+    @staticmethod
+    def _chunk_key(doc):
+        return doc.page_content, json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str)
+
+    # 🔑 这份内容在目标知识库里已经入过库了就返回那个文件名 (同名文件优先)，否则 None
+    def indexed_copy(self, filename, sha256):
+        name = kb_name_of(filename)
+        if name not in self.list_kbs():
+            return None
+        with self._use_kb(name) as kb:
+            return kb.file_with_hash(sha256, filename)
+
+    # ⏭️ 重复内容直接跳过 (批量导入重复跑、同一个文件传两次都不会再解析和嵌入)
+    def _skip_duplicate(self, file_path, sha256, progress):
+        filename = os.path.basename(file_path)
+        existing = self.indexed_copy(filename, sha256)
+        if existing is None:
+            return False
+        logger.info(f"⏭️ 文件 '{filename}' 和已入库的 '{existing}' 内容相同，跳过")
+        if progress:
+            progress(duplicate_of=existing)
+        return True
+
+    # 🧮 在嵌入线程池里跑：嵌入一批并把耗时累加到 embed 阶段
+    def _timed_embed(self, texts, timer):
+        with timer.stage("embed", accumulate=True):
+            return self.embeddings.embed_documents(texts)
+
+    # ➕ 把已经算好向量的切片写进索引（写操作拿知识库自己的锁，多个上传任务可以并发跑）
+    # 先追加 delta 日志再改内存 (write-ahead)，保存代价只和这一批切片有关
+    def _add_embedded(self, kb, docs, vectors, ids, filename):
+        texts = [d.page_content for d in docs]
+        metadatas = [d.metadata for d in docs]
+        kb.add_embedded(filename, ids, texts, metadatas, vectors, self.embeddings)
         
     # 2. 新增：添加 PDF 文件到知识库,调用上面的通用方法    
-    def add_pdf(self, file_path):
+    # source: 文件在知识库里的路径 (uploads/<文件名>)；上传任务从一个不会被改动的临时副本 (file_path) 解析，不传就是 file_path
+    def add_pdf(self, file_path, progress=None, save=True, sha256=None, source=None):
         # try:
         #     #加载 PDF 文件
         #     loader = PyPDFLoader(file_path)
@@ -158,88 +395,140 @@ class RAGService:
         # except Exception as e:
         #     print(f"❌ 添加文件失败: {e}")
         #     raise e # 抛出异常以便上层处理    
-        print(f"正在处理 PDF 文件: {file_path}")
+        source = source or file_path
+        sha256 = sha256 or file_sha256(file_path)
+        if self._skip_duplicate(source, sha256, progress):
+            return
+        logger.info(f"正在处理 PDF 文件: {source}")
+        pool = get_process_pool(config.INGEST_PARSE_WORKERS)
         try:
-            # 加载 PDF 文件
-            loader = PyPDFLoader(file_path)
-            docs = loader.load()
-            self._proccess_and_save(docs,file_path)
+            # 加载 PDF 文件：多进程按页解析，边解析边切分入库，不再一次性把所有页读进内存
+            docs = iter_pdf_pages(file_path, pages_per_task=config.PDF_PAGES_PER_TASK, pool=pool)
+            self._proccess_and_save(docs, source, progress=progress, save=save, sha256=sha256)
+        except BrokenProcessPool as e:
+            # 解析子进程崩了 (畸形 / 超大的 PDF 把它撑爆了)：这个文件失败，换一个新的进程池，后面的上传不受影响
+            discard_process_pool(pool)
+            logger.error(f"❌ PDF 解析进程异常退出，已重建进程池: {e}")
+            raise
         except Exception as e:
-            print(f"❌ 添加文件失败: {e}")
+            logger.error(f"❌ 添加文件失败: {e}")
             raise e  # 抛出异常以便上层处理
          
     # ➕ 新增：添加 Word 文件到知识库,调用上面的通用方法
-    def add_word(self, file_path):
-        print(f"正在处理 Word 文件: {file_path}")
+    def add_word(self, file_path, progress=None, save=True, sha256=None, source=None):
+        source = source or file_path
+        sha256 = sha256 or file_sha256(file_path)
+        if self._skip_duplicate(source, sha256, progress):
+            return
+        logger.info(f"正在处理 Word 文件: {source}")
         try:
             # 加载 Word 文件
-            loader = Docx2txtLoader(file_path)
-            docs = loader.load()
-            self._proccess_and_save(docs,file_path)
+            timer = StageTimer()
+            with timer.stage("parse"):
+                loader = Docx2txtLoader(file_path)
+                docs = loader.load()
+            self._proccess_and_save(docs, source, progress=progress, save=save, timer=timer, sha256=sha256)
         except Exception as e:
-            print(f"❌ 添加文件失败: {e}")
+            logger.error(f"❌ 添加文件失败: {e}")
             raise e  # 抛出异常以便上层处理
     
     # ➕ 新增：添加 Excel 文件到知识库,调用上面的通用方法
-    def add_excel(self, file_path):
-        print(f"正在处理 Excel 文件: {file_path}")
+    def add_excel(self, file_path, progress=None, save=True, sha256=None, source=None):
+        source = source or file_path
+        sha256 = sha256 or file_sha256(file_path)
+        if self._skip_duplicate(source, sha256, progress):
+            return
+        logger.info(f"正在处理 Excel 文件: {source}")
         try:
             # 加载 Excel 文件
-            #mode="elements" 按行加载，更适合表格
-            loader = UnstructuredExcelLoader(file_path,mode="elements")
-            docs = loader.load()
-            self._proccess_and_save(docs,file_path)
+            # openpyxl 只读模式逐行流式读取，每几十行一个切片 (带工作表名和表头)，不会把一行切成两半
+            # (以前 UnstructuredExcelLoader(mode="elements") 一个单元格一个 Document，又慢又碎)
+            docs = iter_excel_row_groups(
+                file_path, rows_per_chunk=config.EXCEL_ROWS_PER_CHUNK, max_tokens=PROFILES["xlsx"].chunk_tokens
+            )
+            self._proccess_and_save(docs, source, progress=progress, save=save, sha256=sha256)
         except Exception as e:
-            print(f"❌ 添加文件失败: {e}")
+            logger.error(f"❌ 添加文件失败: {e}")
             raise e  # 抛出异常以便上层处理
               
-    #🆕 新增：删除文件（通过重建索引的方式，这是最简单稳妥的方法）
-    def delete_file(self, filename):
-        # if not self.vector_store:
-        #     print("⚠️ 知识库为空，无需删除")
-        #     return
+    # 📦 新增：批量导入整个文件夹。多个文件并发处理，PDF 的页面解析共享同一个进程池，最后只保存一次
+    def add_directory(self, folder):
+        handlers = {".pdf": self.add_pdf, ".docx": self.add_word, ".xlsx": self.add_excel}
+        files = [
+            os.path.join(folder, f) for f in sorted(os.listdir(folder))
+            if os.path.splitext(f)[1].lower() in handlers
+        ]
+        logger.info(f"📦 开始批量导入 {len(files)} 个文件: {folder}")
         
-        # # 1. 获取所有文档
-        # all_docs = self.vector_store.documents
-        
-        # # 2. 过滤掉要删除的文件对应的文档
-        # remaining_docs = [doc for doc in all_docs if not doc.metadata.get("source", "").endswith(filename)]
-        
-        # # 3. 重建索引
-        # self.vector_store = FAISS.from_documents(remaining_docs, self.embeddings)
-        # print(f"✅ 文件 '{filename}' 已从知识库中删除！")
-        
-        # # 4. 保存更新后的索引
-        # self._save_vector_store()
-        
-        # 1. 简单粗暴方案：清空内存里的索引
-        self.vector_store = None
+        failed = []
+        with ThreadPoolExecutor(max_workers=config.BULK_IMPORT_FILE_CONCURRENCY) as executor:
+            futures = {
+                executor.submit(handlers[os.path.splitext(f)[1].lower()], f, save=False): f
+                for f in files
+            }
+            for future in as_completed(futures):
+                if future.exception():
+                    failed.append(os.path.basename(futures[future]))
         
-        # 2. 重新扫描 uploads 文件夹里的所有 PDF 重建
-        # (真实生产环境会用 delete by ID，但 FAISS 简单版不支持，重建最稳)
-        uploads_dir = "uploads"
-        if os.path.exists(uploads_dir):
-            files = [f for f in os.listdir(uploads_dir) if f.endswith(".pdf") and f != filename]
-            
-            # 如果还有其他文件，就重新把它们加进去
-            for f in files:
-                self.add_pdf(os.path.join(uploads_dir, f))
-                
-        # 如果删光了，记得把本地的索引文件也删了
-        if not self.vector_store and os.path.exists(self.vector_store_path):
-            import shutil
-            shutil.rmtree(self.vector_store_path)
+        self._save_all()
+        logger.info(f"✅ 批量导入完成：成功 {len(files) - len(failed)} 个，失败 {len(failed)} 个")
+        return failed
+
+    #🆕 新增：删除文件（按文件清单里的切片 ID 增量删除，不再重建整个索引）
+    def delete_file(self, filename):
+        # 只删这个文件自己的向量，flat 索引耗时和文件大小成正比，和整个知识库大小无关
+        # (HNSW / IVF 索引需要用剩下的向量重建，但也不用重新解析和嵌入)
+        # 分多知识库之前上传的带 [分类] 前缀的文件都在默认知识库里，分类知识库里没有就再去默认知识库找
+        # 还没建过的分类直接跳过，不为了删除在硬盘上建一个空知识库
+        known = self.list_kbs()
+        for name in dict.fromkeys([kb_name_of(filename), DEFAULT_KB]):
+            if name not in known:
+                continue
+            with self._use_kb(name) as kb:
+                deleted = kb.delete_file(filename, self.embeddings)
+            if deleted:
+                self._bump_index_version()
+                logger.info(f"✅ 文件 '{filename}' 的 {deleted} 个切片已从知识库 '{name}' 中删除！")
+                return
+        logger.warning(f"⚠️ 知识库中没有 '{filename}' 的切片，无需删除")
     
     # 🔴 也就是把原来的 chat 方法改造成下面这样
-    def chat_stream(self, question: str , model_name: str="deepseek-chat"):
-        if not self.vector_store:
+    # kb: 只在这个知识库里检索；不传就按向量均值路由到最相关的几个知识库 (见 _route_kbs)
+    # history: 多轮模式下这个会话最近的几条消息 [(role, content), ...]，带进检索和提示词
+    # 不管正常结束、命中缓存、出错还是客户端中途断开，各阶段耗时都会记进日志和 /metrics
+    def chat_stream(self, question: str , model_name: str="deepseek-chat", kb=None, history=None):
+        timer = StageTimer()
+        try:
+            yield from self._chat_stream(question, model_name, kb, history, timer)
+        finally:
+            self._report_chat_timings(timer)
+
+    def _chat_stream(self, question, model_name, kb, history, timer):
+        # 动态切换逻辑
+        # 如果前端传来的模型名，不在我们的配置表里，就用默认的 deepseek-chat
+        if model_name not in self.model_config:
+            yield f"⚠️ 模型 {model_name} 未配置，使用默认模型 deepseek-chat。"
+            model_name = "deepseek-chat"
+            
+        # 0. 先查语义答案缓存：问过几乎一样的问题，直接回放，不检索也不调模型
+        # (多轮模式下答案依赖上文，不查也不存缓存)
+        search_query = self._search_query(question, history)
+        with timer.stage("query_embed"):
+            query_vector = self.embeddings.embed_query(search_query)
+        index_version = self.index_version
+        cache_key = None if history else self._answer_cache_key(model_name, kb)
+        cached = self._cached_answer(query_vector, cache_key, index_version)
+        if cached is not None:
+            yield from iter_replay(cached)
+            return
+        
+        # 1. 检索 (召回 + 可选的重排)
+        docs = [d for d, _ in self._retrieve(search_query, query_vector, config.RETRIEVAL_K, timer=timer, kb=kb)]
+        if not docs:
             yield "知识库为空，请先上传文件！"
             return
-            
-        # 1. 检索 (和以前一样)
-        docs = self.vector_store.similarity_search(question, k=2)
-        context = "\n".join([d.page_content for d in docs])
-        prompt = f"已知信息：\n{context}\n\n用户问题：{question}\n请根据已知信息回答。"
+        with timer.stage("prompt_build"):
+            prompt = self._build_prompt(question, docs, model_name, history=history)
         
         # # 2. 调用 LLM (开启流式模式!)
         # # 注意：这里我们直接循环 llm.stream，而不是 invoke
@@ -249,23 +538,269 @@ class RAGService:
         #         # yield 就像是“挤牙膏”，挤一点出来给外面
         #         yield content
         
-        # 动态切换逻辑
-        # 如果前端传来的模型名，不在我们的配置表里，就用默认的 deepseek-chat
+        # 2. 动态创建模型
+        logger.info(f"🔄 当前请求使用模型: {model_name}")
+        answer = []
+        try:
+            target_llm = self._create_llm(model_name)
+
+            with self.llm_registry.limit(model_name):
+                with timer.stage("generation"):
+                    for chunk in target_llm.stream(prompt):
+                        content = chunk.content
+                        if content:
+                            if not answer:
+                                timer.record("ttft", timer.elapsed_ms())
+                            answer.append(content)
+                            yield content
+            self._record_speed(timer, answer)
+        except Exception as e:
+            yield f"❌ 调用模型失败: {e}"
+            return
+        self._store_answer(query_vector, cache_key, index_version, "".join(answer))
+
+    # 🚦 聊天请求进来先拿准入名额 (和 LLM 并发上限同一个数)；排队满了/等超时抛 admission.Overloaded
+    # 单轮的短问题走优先通道：提示词短、生成快，先放行能把尾延迟压下来
+    async def admit(self, question, model_name="deepseek-chat", history=None):
+        if model_name not in self.model_config:
+            model_name = "deepseek-chat"
+        priority = not history and estimate_tokens(question) <= config.CHAT_SHORT_QUERY_TOKENS
+        return await self.llm_registry.admission_gate(model_name).acquire(priority=priority)
+
+    # ⚡ 异步版 chat_stream：检索和 LLM 都不占用线程池，一个 worker 可以同时挂几百个流式回答
+    # 用 aclosing 逐层关闭生成器：调用方中途关掉 (客户端断开) 时上游 LLM 的流马上跟着关
+    # ticket: admit() 拿到的准入名额。传了就不再过 alimit (名额已经是同一个并发数)，
+    # 命中答案缓存、知识库为空这类不调模型的情况提前还掉名额，不白占 LLM 的并发
+    async def achat_stream(self, question: str, model_name: str = "deepseek-chat", kb=None, history=None, ticket=None):
+        timer = StageTimer()
+        try:
+            async with aclosing(self._achat_stream(question, model_name, kb, history, timer, ticket)) as pieces:
+                async for piece in pieces:
+                    yield piece
+        finally:
+            self._report_chat_timings(timer)
+
+    async def _achat_stream(self, question, model_name, kb, history, timer, ticket=None):
         if model_name not in self.model_config:
             yield f"⚠️ 模型 {model_name} 未配置，使用默认模型 deepseek-chat。"
             model_name = "deepseek-chat"
-            
-        # 2. 动态创建模型
-        print(f"🔄 当前请求使用模型: {model_name}")
+        
+        # 0. query 嵌入走 aembed_query；同一个向量既用来查答案缓存，也用来检索
+        search_query = self._search_query(question, history)
+        with timer.stage("query_embed"):
+            query_vector = await self.embeddings.aembed_query(search_query)
+        index_version = self.index_version
+        cache_key = None if history else self._answer_cache_key(model_name, kb)
+        cached = self._cached_answer(query_vector, cache_key, index_version)
+        if cached is not None:
+            if ticket is not None:
+                ticket.release()
+            for piece in iter_replay(cached):
+                yield piece
+            return
+        
+        # 1. 检索：向量搜索要拿锁 (可能还要加载知识库)，丢到线程里做，不卡事件循环；重排在自己的线程池里跑，有时间预算
+        docs = await self._aretrieve(search_query, query_vector, config.RETRIEVAL_K, timer=timer, kb=kb)
+        if not docs:
+            if ticket is not None:
+                ticket.release()
+            yield "知识库为空，请先上传文件！"
+            return
+        with timer.stage("prompt_build"):
+            prompt = self._build_prompt(question, docs, model_name, history=history)
+        
+        # 2. 异步流式调用 LLM
+        logger.info(f"🔄 当前请求使用模型: {model_name}")
+        answer = []
         try:
             target_llm = self._create_llm(model_name)
-
-            for chunk in target_llm.stream(prompt):
-                content = chunk.content
-                if content:
-                    yield content
+            
+            limit = nullcontext() if ticket is not None else self.llm_registry.alimit(model_name)
+            async with limit, aclosing(target_llm.astream(prompt)) as chunks:
+                with timer.stage("generation"):
+                    async for chunk in chunks:
+                        content = chunk.content
+                        if content:
+                            if not answer:
+                                timer.record("ttft", timer.elapsed_ms())
+                            answer.append(content)
+                            yield content
+            self._record_speed(timer, answer)
         except Exception as e:
             yield f"❌ 调用模型失败: {e}"
+            return
+        self._store_answer(query_vector, cache_key, index_version, "".join(answer))
+    
+    # 📈 内部方法：生成速度 (按 estimate_tokens 粗估的 token 数 / 生成耗时)
+    @staticmethod
+    def _record_speed(timer, answer):
+        seconds = timer.timings.get("generation", 0) / 1000
+        if answer and seconds > 0:
+            timer.timings["tokens_per_second"] = round(estimate_tokens("".join(answer)) / seconds, 1)
+
+    # 📈 内部方法：一次聊天请求结束时，把各阶段耗时记进日志和 Prometheus 直方图
+    # ttft 是从请求开始 (query 嵌入之前) 到第一个字，generation 是拿到模型并发名额之后到最后一个字
+    def _report_chat_timings(self, timer):
+        timer.observe(CHAT_STAGE_SECONDS, names=("query_embed", "retrieve", "rerank", "prompt_build", "ttft", "generation"))
+        if "tokens_per_second" in timer.timings:
+            CHAT_TOKENS_PER_SECOND.observe(timer.timings["tokens_per_second"])
+        logger.info(f"⏱️ [RAG] 各阶段耗时(ms): {timer.timings}")
+
+    # 🗂️ 内部方法：查/存语义答案缓存 (只缓存完整生成成功的答案)
+    # 同一个问题在不同知识库里答案不同，缓存按 模型 + 知识库 区分
+    @staticmethod
+    def _answer_cache_key(model_name, kb):
+        return f"{model_name}@{kb}" if kb else model_name
+
+    def _cached_answer(self, query_vector, model_name, index_version):
+        if not config.ANSWER_CACHE_ENABLED or model_name is None:
+            return None
+        answer = self.answer_cache.get(query_vector, model_name, index_version)
+        if answer is not None:
+            logger.info(f"🗂️ [RAG] 命中答案缓存 (累计命中率 {self.answer_cache.stats()['hit_rate']:.1%})")
+        return answer
+    
+    def _store_answer(self, query_vector, model_name, index_version, answer):
+        if config.ANSWER_CACHE_ENABLED and model_name is not None and answer:
+            self.answer_cache.put(query_vector, model_name, index_version, answer)
+    
+    # 🔖 内部方法：知识库内容变了，版本号 +1，旧答案全部作废
+    def _bump_index_version(self):
+        with self._lock:
+            self.index_version += 1
+            self._kb_centroids.clear()
+        self.answer_cache.invalidate()
+    
+    # 🧭 内部方法：不指定知识库时挑出要检索的知识库：向量均值离问题最近的 KB_ROUTE_TOP_N 个
+    # 还没有快照 (只有 delta 日志) 的知识库没有均值可比，总是检索，宁可多查不能漏
+    def _route_kbs(self, names, query_vector):
+        if config.KB_ROUTE_TOP_N <= 0 or len(names) <= config.KB_ROUTE_TOP_N:
+            return names
+        with self._lock:
+            centroids = dict(self._kb_centroids)
+        scored, unrouted = [], []
+        for name in names:
+            if name not in centroids:
+                centroids[name] = snapshot_centroid(self.vector_store_path, name)
+                with self._lock:
+                    self._kb_centroids[name] = centroids[name]
+            centroid = centroids[name]
+            if centroid is None or len(centroid) != len(query_vector):
+                unrouted.append(name)
+            else:
+                scored.append((float(np.sum((centroid - query_vector) ** 2)), name))
+        scored.sort()
+        return unrouted + [name for _, name in scored[:config.KB_ROUTE_TOP_N]]
+
+    # 🔍 内部方法：在指定的知识库 (或路由挑出的几个知识库) 里检索，返回 [(Document, 分数), ...]
+    # 每个知识库内部是向量 + BM25 的混合检索 (见 KnowledgeBase.search)；检索多个时逐个检索再合并：
+    # 同一个嵌入模型的 L2 距离、同一套公式的 RRF 分数在不同知识库之间可以直接比较
+    def _retrieve_with_scores(self, question, query_vector, k, hybrid=None, kb=None):
+        hybrid = config.HYBRID_ENABLED if hybrid is None else hybrid
+        names = self.list_kbs()
+        if kb is not None:
+            # 不认识的知识库直接返回空，不在硬盘上建空目录
+            names = [kb] if kb in names else []
+        else:
+            names = self._route_kbs(names, np.asarray(query_vector, dtype=np.float32))
+        results = []
+        # 这次检索用到的知识库全部拿到查完才放：后加载的不会把前面刚加载的挤出去 (否则下一次检索又得重新加载)
+        with ExitStack() as stack:
+            for name in names:
+                knowledge_base = stack.enter_context(self._use_kb(name))
+                results.extend(knowledge_base.search(question, query_vector, k, hybrid))
+        if len(names) > 1:
+            results.sort(key=lambda x: x[1], reverse=hybrid)
+        return results[:k]
+    
+    # 🎯 召回 + 重排：开了重排就先多取 RERANK_CANDIDATES 个候选，再按 cross-encoder 分数取前 k 个
+    # 重排超过 RERANK_BUDGET_MS、或者重排线程池积压太多就退回召回顺序；返回 [(Document, 召回分数), ...]，各阶段耗时记在 timer 里
+    def _retrieve(self, question, query_vector, k, timer=None, hybrid=None, kb=None):
+        timer = timer or StageTimer()
+        reranking = self.reranker is not None
+        with timer.stage("retrieve"):
+            candidates = self._retrieve_with_scores(
+                question, query_vector, config.RERANK_CANDIDATES if reranking else k, hybrid=hybrid, kb=kb
+            )
+        if not reranking or len(candidates) <= 1:
+            return candidates[:k]
+        with timer.stage("rerank"):
+            ranked, status = self.reranker.rerank(
+                question, [d for d, _ in candidates], k, config.RERANK_BUDGET_MS / 1000
+            )
+        return self._after_rerank(candidates, ranked, status, timer)
+
+    # 异步版：只返回 Document 列表
+    async def _aretrieve(self, question, query_vector, k, timer=None, kb=None):
+        timer = timer or StageTimer()
+        reranking = self.reranker is not None
+        with timer.stage("retrieve"):
+            candidates = await asyncio.to_thread(
+                self._retrieve_with_scores, question, query_vector, config.RERANK_CANDIDATES if reranking else k, kb=kb
+            )
+        if not reranking or len(candidates) <= 1:
+            return [d for d, _ in candidates[:k]]
+        with timer.stage("rerank"):
+            ranked, status = await self.reranker.arerank(
+                question, [d for d, _ in candidates], k, config.RERANK_BUDGET_MS / 1000
+            )
+        return [d for d, _ in self._after_rerank(candidates, ranked, status, timer)]
+
+    # 重排后把召回分数带回去；超时/跳过记成 timer 里的 rerank_timeout / rerank_skipped 标记
+    def _after_rerank(self, candidates, ranked, status, timer):
+        if status == "timeout":
+            timer.timings["rerank_timeout"] = True
+            logger.warning(f"⚠️ [RAG] 重排超过 {config.RERANK_BUDGET_MS}ms 预算，使用召回顺序")
+        elif status == "skipped":
+            timer.timings["rerank_skipped"] = True
+            logger.warning(f"⚠️ [RAG] 重排线程池积压已满 ({config.RERANK_MAX_INFLIGHT} 个)，跳过重排，使用召回顺序")
+        scores = {id(d): score for d, score in candidates}
+        return [(d, scores[id(d)]) for d in ranked]
+    
+    # 🔎 批量检索：所有问题一次前向算向量，再逐个查 top-k，返回 ([[(Document, 分数), ...], ...], 各阶段耗时)
+    def search_batch(self, questions, k=4, hybrid=None, kb=None):
+        timer = StageTimer()
+        with timer.stage("query_embed"):
+            vectors = self.embeddings.embed_queries(questions)
+        results = []
+        totals = {}
+        for q, v in zip(questions, vectors):
+            per_query = StageTimer()
+            results.append(self._retrieve(q, v, k, timer=per_query, hybrid=hybrid, kb=kb))
+            for stage, ms in per_query.timings.items():
+                if not isinstance(ms, bool):
+                    totals[stage] = totals.get(stage, 0) + ms
+        for stage, ms in totals.items():
+            timer.record(stage, ms)
+        return results, timer.timings
+    
+    # 💬 内部方法：多轮模式下，追问 (“那它呢？”) 单独拿去检索往往搜不到东西，拼上上一个问题一起检索
+    @staticmethod
+    def _search_query(question, history):
+        if not history:
+            return question
+        previous = [content for role, content in history if role == "user"]
+        return f"{previous[-1]} {question}" if previous else question
+
+    # 📝 内部方法：把检索到的片段拼成提示词
+    # 重叠/相邻片段先合并、近似重复的去掉，再按模型的 context_tokens 预算装箱，每段带上出处
+    # 多轮模式下从最近的消息往前带上对话历史 (不超过 SESSION_HISTORY_MAX_TOKENS)，占用的 token 从上下文预算里扣
+    def _build_prompt(self, question, docs, model_name="deepseek-chat", history=None):
+        budget = self.model_config.get(model_name, {}).get("context_tokens", config.DEFAULT_CONTEXT_TOKENS)
+        lines, used = [], 0
+        for role, content in reversed(history or []):
+            line = f"{'用户' if role == 'user' else 'AI'}：{content}"
+            cost = estimate_tokens(line)
+            if used + cost > config.SESSION_HISTORY_MAX_TOKENS:
+                break
+            lines.append(line)
+            used += cost
+        context, _ = build_context(docs, max(budget - used, 0), dedup_threshold=config.CONTEXT_DEDUP_THRESHOLD)
+        conversation = "对话历史：\n" + "\n".join(reversed(lines)) + "\n\n" if lines else ""
+        return (
+            f"{conversation}已知信息：\n{context}\n\n用户问题：{question}\n"
+            f"请根据已知信息回答，并用 [编号] 标注引用的出处。"
+        )
 
 # # 实例化一个全局对象供大家调用
 # rag_service = RAGService(
@@ -273,5 +808,34 @@ class RAGService:
 #     base_url=os.getenv("DEEPSEEK_BASE_URL")
 # )
 
-# 🆕 重构：实例化
-rag_service = RAGService()
\ No newline at end of file
+# 🆕 重构：懒加载单例。import 本模块不会加载任何模型，第一次调用 get_rag_service() 才真正初始化
+# (服务启动时由 main.py 的 warm-up 钩子提前调用，请求路径上不会付出冷启动代价)
+_rag_service = None
+_rag_service_lock = threading.Lock()
+
+def get_rag_service():
+    global _rag_service
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
+    return _rag_service
+
+# 🔧 换成调用方自己建好的服务实例 (压测 / 脚本里用，要在第一个请求之前调用)
+def set_rag_service(service):
+    global _rag_service
+    with _rag_service_lock:
+        _rag_service = service
+
+# 🧹 应用退出时关闭连接池 (服务没初始化过就什么都不做)
+async def close_rag_service():
+    if _rag_service is not None:
+        await _rag_service.llm_registry.aclose()
+
+# 🔥 预热：加载模型后先跑一次嵌入 (和重排)，把懒初始化的开销挪到启动阶段
+def warm_up():
+    service = get_rag_service()
+    service.embeddings.underlying.embed_query("warm up")
+    if service.reranker:
+        service.reranker.score("warm up", ["warm up"])
+    logger.info("🔥 [RAG] 模型预热完成")
\ No newline at end of file
@@ -0,0 +1,99 @@
+# server/reranker.py
+# 🎯 重排序：检索多取一些候选，用本地 cross-encoder 重新打分，超时就退回原来的顺序
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """sentence-transformers 的 CrossEncoder 包一层：批量打分 + 结果缓存 + 时间预算。
+
+    sentence-transformers 是可选依赖，没装或模型加载失败时 available=False，调用方直接跳过重排。
+    线程池里积压的任务 (在跑的 + 排队的) 到了 max_inflight 个就不再提交，直接用召回顺序。
+    """
+
+    def __init__(self, model_name, batch_size=16, cache_size=20000, max_workers=2, max_inflight=4):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.max_inflight = max_inflight
+        self._cache = OrderedDict()  # hash(问题, 片段) -> 分数
+        self._lock = threading.Lock()
+        self._inflight = 0           # 已提交还没结束 (包括被取消) 的任务数
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rerank")
+        try:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(model_name)
+            self.available = True
+        except Exception as e:
+            logger.warning(f"⚠️ [RAG] 重排模型 {model_name} 加载失败，跳过重排: {e}")
+            self._model = None
+            self.available = False
+
+    @staticmethod
+    def _key(question, text):
+        return hashlib.sha1(f"{question}\x00{text}".encode("utf-8")).hexdigest()
+
+    def score(self, question, texts):
+        """给每个片段打相关度分，缓存里有的不再算，剩下的按 batch_size 一批送进模型。"""
+        keys = [self._key(question, t) for t in texts]
+        with self._lock:
+            scores = [self._cache.get(k) for k in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            pairs = [(question, texts[i]) for i in missing]
+            new_scores = self._model.predict(pairs, batch_size=self.batch_size)
+            with self._lock:
+                for i, s in zip(missing, new_scores):
+                    scores[i] = float(s)
+                    self._cache[keys[i]] = float(s)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def _rerank(self, question, docs, k):
+        scores = self.score(question, [d.page_content for d in docs])
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:k]]
+
+    # 积压满了返回 None；任务结束或被取消时名额还回来
+    def _submit(self, question, docs, k):
+        with self._lock:
+            if self._inflight >= self.max_inflight:
+                return None
+            self._inflight += 1
+        future = self._executor.submit(self._rerank, question, docs, k)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._inflight -= 1
+
+    # 同步版：在重排线程池里跑，超过 budget_seconds 就用原始顺序
+    # 返回 (结果, 状态)：状态 None 表示重排成功，"timeout" 超时，"skipped" 积压太多没提交
+    # 超时的任务会取消掉：还在排队的直接丢弃，已经在算的算完 (结果进缓存) 再还名额
+    def rerank(self, question, docs, k, budget_seconds):
+        future = self._submit(question, docs, k)
+        if future is None:
+            return docs[:k], "skipped"
+        try:
+            return future.result(timeout=budget_seconds), None
+        except FutureTimeout:
+            future.cancel()
+            return docs[:k], "timeout"
+
+    async def arerank(self, question, docs, k, budget_seconds):
+        future = self._submit(question, docs, k)
+        if future is None:
+            return docs[:k], "skipped"
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=budget_seconds), None
+        except asyncio.TimeoutError:
+            future.cancel()
+            return docs[:k], "timeout"
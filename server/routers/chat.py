@@ -1,71 +1,138 @@
 # server/routers/chat.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from fastapi.responses import StreamingResponse
+import logging
+import uuid
+from contextlib import aclosing
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # 引入我们拆分出去的模块
 # from db import get_db, ChatHistory, Feedback ,SessionLocal # 假设没改名
-from database import SessionLocal, get_db
+from database import get_db
 from models import ChatHistory, Feedback
 from schemas import ChatRequest, FeedbackRequest
-from rag_core import rag_service
+import config
+from rag_core import get_rag_service
+from admission import AdmittedStreamingResponse, Overloaded
+from write_buffer import write_buffer
+from chat_sessions import buffered_messages, load_session_history, session_history
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter( tags=["聊天相关"])
 
 #1.聊天接口（流式响应版）
 @router.post("/chat")
-async def chat(req: ChatRequest, db: Session = Depends(get_db)):
+async def chat(req: ChatRequest):
     user_q = req.question
     user_model = req.model#获取前端传过来的模型名字
+    user_kb = req.kb #只在这个知识库里检索
+    # 会话 ID 和消息 ID 都在这里生成，不用等数据库分配
+    session_id = req.session_id or uuid.uuid4().hex
+    question_id, answer_id = str(uuid.uuid4()), str(uuid.uuid4())
     
-    # 1. 先存用户的问题 (记账)
-    user_msg = ChatHistory(role="user", content=user_q)
-    db.add(user_msg)
-    db.commit()
+    # 多轮模式：取这个会话最近的几条消息 (新会话没有历史)
+    history = await load_session_history(session_id) if req.multi_turn and req.session_id else None
+    
+    # 0. 准入控制：先排队拿这个模型的并发名额，排队满了或等太久直接 429，不去检索也不调模型
+    rag_service = get_rag_service()
+    try:
+        ticket = await rag_service.admit(user_q, model_name=user_model, history=history)
+    except Overloaded as e:
+        logger.warning(f"🚦 {e}，拒绝请求")
+        raise HTTPException(status_code=429, detail="当前提问的人太多了，请稍后再试", headers={"Retry-After": "1"})
+
+    # 1. 先存用户的问题 (记账)：放进批量写入队列就返回，不等数据库
+    write_buffer.add(ChatHistory(session_id=session_id, msg_id=question_id, role="user", content=user_q))
 
-    # 2. 定义一个生成器函数，负责一边挤牙膏，一边拼凑完整的答案（为了最后存数据库）
-    def generate_response():
-        full_response = ""
+    # 2. 定义一个异步生成器，负责一边挤牙膏，一边攒下完整的答案（为了最后存数据库）
+    # 用 async 生成器，StreamingResponse 直接在事件循环里迭代，不会每个请求占一个线程
+    # 答案片段先放进列表、最后 join 一次，不用每个字都重新拼一遍整个字符串
+    async def generate_response():
+        answer = []
         try:
-            # 调用刚才写的 rag.chat_stream
-            for chunk in rag_service.chat_stream(user_q, model_name=user_model):
-                full_response += chunk
-                yield chunk # 把这个字推给前端
+            # 调用异步版的 rag.achat_stream；客户端断开时 aclosing 会把上游 LLM 的流一起关掉
+            async with aclosing(rag_service.achat_stream(
+                user_q, model_name=user_model, kb=user_kb, history=history, ticket=ticket
+            )) as chunks:
+                async for chunk in chunks:
+                    answer.append(chunk)
+                    yield chunk # 把这个字推给前端
         
         finally:
+            full_response = "".join(answer)
             if full_response:
-                print(f"✅ AI 回答完毕: {full_response}")
-                # # 存 AI 的回答 (关键!)
-                # # 这里我们要手动开一个新的数据库会话，因为外面的 db 可能已经断开了
-                with SessionLocal() as db_save:
-                    ai_msg = ChatHistory(role="ai", content=full_response)
-                    db_save.add(ai_msg)
-                    db_save.commit()
+                logger.info(f"✅ AI 回答完毕: {full_response}")
+                # # 存 AI 的回答 (关键!)：同样交给后台批量写入，reply_to 指向对应的问题
+                write_buffer.add(ChatHistory(
+                    session_id=session_id, msg_id=answer_id, reply_to=question_id, role="ai", content=full_response
+                ))
+                session_history.append(session_id, "user", user_q)
+                session_history.append(session_id, "ai", full_response)
 
-    return StreamingResponse(generate_response(), media_type="text/plain")
+    # 会话 ID 给前端下次带上；回答的消息 ID 点赞反馈时用
+    # 响应结束 (包括客户端中途断开) 时归还准入名额
+    headers = {"X-Session-Id": session_id, "X-Message-Id": answer_id}
+    return AdmittedStreamingResponse(generate_response(), ticket, media_type="text/plain", headers=headers)
 
 
 # 2. 反馈接口
 @router.post("/feedback")  
-async def feedback(req: FeedbackRequest, db: Session = Depends(get_db)):
+async def feedback(req: FeedbackRequest):
     msg_id = req.msg_id
     score = req.score
 
     feedback_entry = Feedback(msg_id=msg_id, score=score)
-    db.add(feedback_entry)
-    db.commit()
+    write_buffer.add(feedback_entry)
 
     return {"message": "反馈已记录，感谢您的参与！"}
 
 # 3. 获取聊天记录接口
+# session_id: 只看这个会话；before_id: 上一页返回的 next_before_id，不传就是最新一页
 @router.get("/history")
-async def get_history(db: Session = Depends(get_db)):
-    # order_by(desc): 按时间倒序查（最新的在前面）
-    # limit(20): 只拿最近 20 条
-    messages = db.query(ChatHistory)\
-        .order_by(ChatHistory.create_time.desc())\
-        .limit(20)\
-        .all()
-    history = [{"role": msg.role, "content": msg.content} for msg in messages][::-1]
-    return {"history": history}    
+async def get_history(
+    session_id: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_db),
+):
+    limit = max(1, min(limit, config.HISTORY_PAGE_MAX))
+    # 最新一页不等批量写入 flush：还在队列里的记录接在库里查到的后面 (按 msg_id 去重)，刚聊完的也能看到
+    # 先拍下队列再查库，查询期间刚提交的记录要么查得到、要么在快照里
+    buffered = buffered_messages(session_id) if not before_id else []
+    # 按自增 id 倒序做 keyset 翻页 (最新的在前面)：走主键 / (session_id, id) 索引，
+    # 不管表有多大、翻到第几页都只读 limit 行，不用 OFFSET 也不用排序
+    query = select(ChatHistory)
+    if session_id:
+        query = query.where(ChatHistory.session_id == session_id)
+    if before_id:
+        query = query.where(ChatHistory.id < before_id)
+    result = await db.execute(query.order_by(ChatHistory.id.desc()).limit(limit))
+    stored = result.scalars().all()[::-1]
+    stored_msg_ids = {msg.msg_id for msg in stored}
+    messages = stored + [row for row in buffered if row.msg_id not in stored_msg_ids]
+    # 库里可能还有更早的 (查满了一页)，或者合并后超过一页被截掉了一部分：下一页从这一页最早的那条库里记录往前翻
+    has_more = len(stored) == limit or len(messages) > limit
+    messages = messages[-limit:]
+    page_ids = [msg.id for msg in messages if msg.id is not None]
+    if not has_more:
+        next_before_id = None
+    elif page_ids:
+        next_before_id = min(page_ids)
+    else:
+        next_before_id = stored[-1].id + 1 if stored else None
+    history = [
+        {
+            "id": msg.id,
+            "msg_id": msg.msg_id,
+            "reply_to": msg.reply_to,
+            "session_id": msg.session_id,
+            "role": msg.role,
+            "content": msg.content,
+        }
+        for msg in messages
+    ]
+    return {"history": history, "next_before_id": next_before_id}    
     
\ No newline at end of file
@@ -0,0 +1,14 @@
+# server/routers/metrics.py
+from fastapi import APIRouter, HTTPException, Response
+
+from observability import render_metrics
+
+router = APIRouter(tags=["监控"])
+
+# --- Prometheus 抓取接口 ---
+@router.get("/metrics")
+async def metrics():
+    content, content_type = render_metrics()
+    if content is None:
+        raise HTTPException(status_code=503, detail="没有安装 prometheus_client，指标不可用")
+    return Response(content=content, media_type=content_type)
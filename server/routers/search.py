@@ -0,0 +1,38 @@
+# server/routers/search.py
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+import config
+from schemas import SearchRequest
+from rag_core import get_rag_service
+
+router = APIRouter(tags=["检索相关"])
+
+# --- 批量检索接口 (只检索不生成，给评测脚本用) ---
+@router.post("/search")
+async def search(req: SearchRequest):
+    if not req.queries:
+        return {"results": []}
+    if len(req.queries) > config.SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"一次最多 {config.SEARCH_MAX_QUERIES} 个问题")
+    k = max(1, min(req.k, config.SEARCH_MAX_K))
+    
+    # 模型前向和向量搜索都是 CPU 活，放到线程池里
+    rag_service = get_rag_service()
+    batches, timings = await run_in_threadpool(rag_service.search_batch, req.queries, k, req.hybrid, req.kb)
+    results = [
+        {
+            "query": query,
+            "hits": [
+                {"content": doc.page_content, "metadata": doc.metadata, "score": float(score)}
+                for doc, score in hits
+            ],
+        }
+        for query, hits in zip(req.queries, batches)
+    ]
+    return {"results": results, "timings_ms": timings, "embedding_cache": rag_service.embeddings.stats()}
+
+# --- 知识库列表 (给前端的知识库下拉框用) ---
+@router.get("/kbs")
+async def list_kbs():
+    return get_rag_service().list_kbs()
@@ -1,51 +1,132 @@
 # server/routers/upload.py
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import os
 import shutil
-from rag_core import rag_service
-import traceback
+import uuid
+import config
+from rag_core import get_rag_service
+from jobs import job_manager
+from knowledge_base import kb_name_of
 
 # 1. 创建路由器
 router = APIRouter(prefix="/upload", tags=["文件上传"])
 
+INCOMING_DIR = "uploads/.incoming"
+
 # --- 上传接口 ---
+# 只负责把文件存下来并提交后台任务，马上返回 job_id，前端再轮询 /upload/jobs/{job_id}
 @router.post("/")
 async def upload_file(file: UploadFile = File(...)):
-    # 1. 确保目录存在
-    os.makedirs("uploads", exist_ok=True)
-    file_path = f"uploads/{file.filename}"
+    #根据文件名后缀决定如何处理
+    filename_lower = file.filename.lower()
+    rag_service = await run_in_threadpool(get_rag_service)  # 第一次调用会加载模型和索引，不能卡住事件循环
     
-    # 2. 保存文件
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # 3. 让 RAG 学习
+    if filename_lower.endswith(".pdf"):
+        handler = rag_service.add_pdf
+    elif filename_lower.endswith(".docx"):
+        handler = rag_service.add_word
+    elif filename_lower.endswith(".xlsx"):
+        handler = rag_service.add_excel
+    else:
+        return{"status": "error", "message": "不支持的文件类型，仅支持 PDF、Word 和 Excel 文件"}
+    
+    # 1. 确保目录存在 (文件名只取 basename，防止 ../ 之类的路径穿越)
+    # 上传先落到 uploads/.incoming/ 下一个唯一的文件，后台任务就从这份不会再被改动的副本解析；
+    # uploads/<文件名> 只是给列表和下载看的，之后同名文件再上传覆盖它也不影响正在跑的任务
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    filename = os.path.basename(file.filename)
+    file_path = f"uploads/{filename}"
+    kb = kb_name_of(filename)
+    tmp_path = os.path.join(INCOMING_DIR, f"{uuid.uuid4().hex}{os.path.splitext(filename)[1].lower()}")
+    staging_path = f"{tmp_path}.publish"
+    
+    # 2. 分块写到临时文件，边写边算 sha256，超过大小上限立刻停 (写盘是阻塞操作，放到线程池里)
+    max_bytes = config.UPLOAD_MAX_MB * 1024 * 1024
+    def save():
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, "wb") as buffer:
+            for block in iter(lambda: file.file.read(config.UPLOAD_CHUNK_KB * 1024), b""):
+                size += len(block)
+                if size > max_bytes:
+                    return None
+                digest.update(block)
+                buffer.write(block)
+        return digest.hexdigest()
+
+    # 后台任务：从临时副本入库，跑完 (成功失败都一样) 删掉副本
+    def ingest(path, progress=None):
+        try:
+            handler(path, progress=progress, sha256=sha256, source=file_path)
+        finally:
+            _remove(path)
+
+    submitted = False
     try:
-        # print(f"📂 开始处理文件: {file.filename} ...")
-        # rag_service.add_pdf(file_path)
-        # print("✅ 处理完成")
-        # return {"message": f"文件 {file.filename} 上传并处理成功！"}
+        sha256 = await run_in_threadpool(save)
+        if sha256 is None:
+            raise HTTPException(status_code=413, detail=f"文件太大了，最大允许 {config.UPLOAD_MAX_MB} MB")
         
-        #根据文件名后缀决定如何处理
-        filename_lower = file.filename.lower()
+        # 3. 同样的内容已经入过库了 (同名或者换了个名字)：不再解析和嵌入，免得索引里出现重复切片
+        existing = await run_in_threadpool(rag_service.indexed_copy, filename, sha256)
+        if existing is not None:
+            return {"status": "skipped", "duplicate_of": existing, "message": f"文件 {filename} 和已入库的 {existing} 内容相同，已跳过"}
         
-        if filename_lower.endswith(".pdf"):
-            rag_service.add_pdf(file_path)
-        elif filename_lower.endswith(".docx"):
-            rag_service.add_word(file_path)
-        elif filename_lower.endswith(".xlsx"):
-            rag_service.add_excel(file_path)
-        else:
-            return{"status": "error", "message": "不支持的文件类型，仅支持 PDF、Word 和 Excel 文件"}
-        return {"status": "success", "message": f"文件 {file.filename} 上传并处理成功！"}
-    except Exception as e:
-        print(f"❌ 上传失败: {e}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        # 4. 先给正式文件准备好一个硬链接 (不复制内容；任务可能在提交后马上跑完并删掉临时副本)
+        await run_in_threadpool(_link, tmp_path, staging_path)
+        
+        # 5. 提交后台任务：同名文件的任务串行跑；同样内容的任务已经在排队/在跑就不再提交
+        job = job_manager.submit(filename, tmp_path, ingest, kb=kb, sha256=sha256)
+        if job is None:
+            raise HTTPException(status_code=429, detail="后台任务太多了，请稍后再上传")
+        if job.file_path != tmp_path:
+            return {
+                "status": "skipped", "duplicate_of": job.filename, "job_id": job.id,
+                "message": f"文件 {filename} 和正在入库的 {job.filename} 内容相同，已跳过",
+            }
+        submitted = True
+        
+        # 6. 任务已经收下了才原子替换正式文件；同名旧版本的切片在入库时增量替换，正在跑的旧任务读的是它自己的副本
+        os.replace(staging_path, file_path)
+    finally:
+        if not submitted:
+            _remove(tmp_path)
+        _remove(staging_path)
+    return {"status": "accepted", "job_id": job.id, "message": f"文件 {filename} 已上传，正在后台处理"}
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# 不支持硬链接的文件系统就复制一份
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+# --- 任务状态接口 ---
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job.to_dict()
 
 # --- 删除接口 ---
 @router.delete("/{filename}")
 async def delete_file(filename: str):
+    # 这个文件还在入库：删掉的切片会被正在跑的任务写回去，让前端等任务结束再删
+    job = job_manager.active(filename, kb=kb_name_of(filename))
+    if job is not None:
+        raise HTTPException(status_code=409, detail=f"文件 {filename} 正在入库 (任务 {job.id})，请等任务结束后再删除")
+    
     file_path = f"uploads/{filename}"
     if os.path.exists(file_path):
         os.remove(file_path)
@@ -53,7 +134,7 @@ async def delete_file(filename: str):
         return {"status": "error", "message": "文件不存在"}
     
     try:
-        rag_service.delete_file(filename)
+        await run_in_threadpool(get_rag_service().delete_file, filename)
         return {"status": "success", "message": f"{filename} 已删除"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -81,10 +162,8 @@ async def list_files():
                 size_bytes = os.path.getsize(file_path)
                 size_str = f"{size_bytes / 1024:.1f} KB"
             
-            # 2. 算分类 (简单逻辑：提取中括号里的字)
-            category = "默认"
-            if filename.startswith("[") and "]" in filename:
-                category = filename.split("]")[0].strip("[")
+            # 2. 算分类 (简单逻辑：提取中括号里的字)，也就是这个文件所在的知识库
+            category = kb_name_of(filename)
             
             # 3. 塞进列表
             file_list.append({
@@ -1,14 +1,28 @@
 # server/schemas.py
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 # 接收前端聊天参数
 class ChatRequest(BaseModel):
     question: str
     # 👇 2. 新增这个字段：允许前端传模型名字，默认是用 deepseek-chat
     model: Optional[str] = "deepseek-chat"
+    # 知识库 (文件名 [xxx] 前缀里的分类)，不传就检索所有知识库
+    kb: Optional[str] = None
+    # 会话 ID，不传服务端生成一个，通过响应头 X-Session-Id 返回
+    session_id: Optional[str] = None
+    # 多轮模式：把这个会话最近几条消息带进检索和提示词
+    multi_turn: bool = False
 
 # 接收前端反馈参数
 class FeedbackRequest(BaseModel):
     msg_id: str
-    score: int
\ No newline at end of file
+    score: int
+
+# 批量检索参数
+class SearchRequest(BaseModel):
+    queries: List[str]
+    k: int = 4
+    # 不传就按服务端配置；true = 向量 + BM25 融合，false = 纯向量
+    hybrid: Optional[bool] = None
+    kb: Optional[str] = None
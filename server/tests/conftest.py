@@ -0,0 +1,36 @@
+# server/tests/conftest.py
+# 🧪 测试直接 import server 下的模块 (和 uvicorn main:app 一样以 server 目录为根)
+# 运行：cd server && python -m pytest -q
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 测试不连 MySQL：database.py 在 import 时就建引擎，先换成内存里的 SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from benchmarks.fakes import HashEmbeddings
+from database import Base
+
+
+@pytest.fixture
+def embeddings():
+    return HashEmbeddings(dim=32)
+
+
+# 建好表的 SQLite 文件库，返回会话工厂 (和 database.SessionLocal 一样用)
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
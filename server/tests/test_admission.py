@@ -0,0 +1,171 @@
+# server/tests/test_admission.py
+# 🚦 准入控制：名额交接、排队上限、等待超时、短问题通道的公平性、取消不漏名额
+import asyncio
+
+import pytest
+
+import config
+from admission import AdmissionGate, Overloaded
+
+
+def _gate(capacity=1, max_queue=8, queue_timeout=1.0, short_lane_burst=2):
+    return AdmissionGate("test", capacity, max_queue, queue_timeout, short_lane_burst=short_lane_burst)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_released_slot_is_handed_to_the_waiter():
+    async def scenario():
+        gate = _gate(capacity=2)
+        first, second = await gate.acquire(), await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        assert not waiter.done() and gate.waiting == 1
+
+        first.release()
+        third = await waiter
+        # 名额直接交给排队的请求，active 不变，新来的请求插不了队
+        assert gate.active == 2 and gate.waiting == 0
+        first.release()  # 重复 release 不会多还一个名额
+        assert gate.active == 2
+        second.release()
+        third.release()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        gate = _gate(max_queue=1)
+        await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        with pytest.raises(Overloaded) as e:
+            await gate.acquire()
+        assert e.value.reason == "queue_full"
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_leaves_the_queue():
+    async def scenario():
+        gate = _gate(queue_timeout=0.01)
+        ticket = await gate.acquire()
+        with pytest.raises(Overloaded) as e:
+            await gate.acquire()
+        assert e.value.reason == "queue_timeout"
+        assert gate.waiting == 0
+        ticket.release()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_short_lane_goes_first_but_cannot_starve_normal():
+    async def scenario():
+        gate = _gate(short_lane_burst=2)
+        ticket = await gate.acquire()
+        order = []
+
+        async def request(name, priority):
+            t = await gate.acquire(priority=priority)
+            order.append(name)
+            await asyncio.sleep(0)
+            t.release()
+
+        tasks = [asyncio.ensure_future(request("n1", False))]
+        await _settle()
+        tasks += [asyncio.ensure_future(request(f"s{i}", True)) for i in range(1, 5)]
+        await _settle()
+        ticket.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    # 连续两个短问题之后必须让普通问题先走
+    assert asyncio.run(scenario()) == ["s1", "s2", "n1", "s3", "s4"]
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        gate = _gate()
+        ticket = await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        waiter.cancel()
+        await _settle()
+        assert gate.waiting == 0
+        ticket.release()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_to_a_waiter_cancelled_in_the_same_tick_is_passed_on():
+    async def scenario():
+        gate = _gate()
+        ticket = await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await _settle()
+        # 名额刚交到等待者手上，它还没来得及运行就被取消了 (客户端断开)
+        ticket.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert gate.active == 0 and gate.waiting == 0
+        assert (await gate.acquire()) is not None
+
+    asyncio.run(scenario())
+
+
+def test_answer_cache_hit_gives_the_slot_back(tmp_path, monkeypatch, embeddings):
+    import config
+    from rag_core import RAGService
+
+    monkeypatch.setattr(config, "VECTOR_STORE_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(config, "ANSWER_CACHE_ENABLED", True)
+    service = RAGService(embeddings=embeddings)
+    question = "报销要谁审批"
+    service._store_answer(embeddings.embed_query(question), "deepseek-chat", service.index_version, "部门负责人")
+
+    async def scenario():
+        ticket = await service.admit(question)
+        gate = service.llm_registry.admission_gate("deepseek-chat")
+        assert gate.active == 1
+        answer = [piece async for piece in service.achat_stream(question, ticket=ticket)]
+        # 没调模型：回放缓存之前名额就还回去了
+        assert gate.active == 0
+        return "".join(answer)
+
+    assert asyncio.run(scenario()) == "部门负责人"
+
+
+def test_models_on_the_same_provider_get_their_own_gates():
+    from llm_registry import LLMRegistry
+
+    registry = LLMRegistry({
+        "deepseek-chat": {"provider": "deepseek", "max_concurrency": 8},
+        "deepseek-reasoner": {"provider": "deepseek", "max_concurrency": 2},
+        "qwen-plus": {"provider": "qwen"},
+    })
+    chat = registry.admission_gate("deepseek-chat")
+    reasoner = registry.admission_gate("deepseek-reasoner")
+    assert chat is not reasoner
+    assert (chat.capacity, reasoner.capacity) == (8, 2)
+    # 没写 max_concurrency 的模型用默认值
+    assert registry.admission_gate("qwen-plus").capacity == config.LLM_DEFAULT_MAX_CONCURRENCY
+
+    async def scenario():
+        # 推理模型的名额占满了，同厂商的聊天模型照样能进
+        held = [await reasoner.acquire() for _ in range(2)]
+        ticket = await chat.acquire()
+        ticket.release()
+        for t in held:
+            t.release()
+
+    asyncio.run(scenario())
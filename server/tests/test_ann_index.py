@@ -0,0 +1,66 @@
+# server/tests/test_ann_index.py
+# 🗺️ INDEX_MMAP：flat / HNSW / IVF 的向量真的是映射在文件上的 (不是整份读进内存)，写之前换成可写版本
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+import ann_index
+import config
+from index_store import IndexStore
+from knowledge_base import DEFAULT_KB, KnowledgeBase
+
+faiss = ann_index.faiss
+requires_ifc = pytest.mark.skipif(not hasattr(faiss, "IO_FLAG_MMAP_IFC"), reason="FAISS 没有 IO_FLAG_MMAP_IFC")
+
+
+def _codes(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.downcast_index(index.storage).codes
+    return index.codes
+
+
+def _save(folder, embeddings, index_type, n=300):
+    texts = [f"切片 {i}" for i in range(n)]
+    vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings)
+    if index_type != "flat":
+        store.index = ann_index.build_index(index_type, vectors)
+    store.save_local(str(folder))
+    return vectors
+
+
+@requires_ifc
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_mmap_load_maps_vectors_instead_of_copying(tmp_path, embeddings, index_type):
+    vectors = _save(tmp_path, embeddings, index_type)
+    loaded = ann_index.load_store(str(tmp_path), embeddings, mmap=True)
+    assert not _codes(loaded.index).is_owned  # 文件的只读视图
+    assert _codes(ann_index.load_store(str(tmp_path), embeddings).index).is_owned
+    _, positions = loaded.index.search(vectors[:1], 1)
+    assert positions[0][0] == 0
+
+
+@requires_ifc
+def test_mmap_load_works_for_ivf(tmp_path, embeddings, monkeypatch):
+    monkeypatch.setattr(config, "IVF_NLIST", 4)
+    vectors = _save(tmp_path, embeddings, "ivf_flat")
+    loaded = ann_index.load_store(str(tmp_path), embeddings, mmap=True)
+    _, positions = loaded.index.search(vectors[:1], 1)
+    assert positions[0][0] == 0
+
+
+@requires_ifc
+def test_writes_go_to_a_writable_copy(tmp_path, embeddings):
+    kb = KnowledgeBase(DEFAULT_KB, str(tmp_path))
+    kb.ensure_loaded(embeddings)
+    texts = ["报销流程", "请假流程"]
+    kb.add_embedded("a.pdf", ["a-0", "a-1"], texts, [{}, {}], embeddings.embed_documents(texts), embeddings)
+    kb.save(force=True)
+    kb.unload()
+
+    kb.ensure_loaded(embeddings, mmap=True)
+    assert isinstance(kb.store, IndexStore) and kb.store.mmapped
+    assert not _codes(kb.vector_store.index).is_owned
+    kb.add_embedded("b.pdf", ["b-0"], ["出差流程"], [{}], embeddings.embed_documents(["出差流程"]), embeddings)
+    assert not kb.store.mmapped and kb.ntotal() == 3
@@ -0,0 +1,63 @@
+# server/tests/test_chat_sessions.py
+# 💬 会话历史不在内存里时：不等写入队列 flush，库里的和队列里的消息合在一起
+import asyncio
+
+import chat_sessions
+from chat_sessions import SessionHistory, load_session_history
+from models import ChatHistory
+from write_buffer import WriteBehindBuffer
+
+
+def _row(session_id, msg_id, role):
+    return ChatHistory(session_id=session_id, msg_id=msg_id, role=role, content=f"{role}-{msg_id}")
+
+
+def test_history_merges_rows_still_in_the_write_buffer(session_factory, monkeypatch):
+    buffer = WriteBehindBuffer(session_factory)
+    monkeypatch.setattr(chat_sessions, "SessionLocal", session_factory)
+    monkeypatch.setattr(chat_sessions, "write_buffer", buffer)
+    monkeypatch.setattr(chat_sessions, "session_history", SessionHistory(window=3))
+
+    async def scenario():
+        for msg_id, role in (("q1", "user"), ("a1", "ai")):
+            buffer.add(_row("s", msg_id, role))
+        await buffer.flush()
+        # 还在队列里：这一轮的两条 + 别的会话的一条；a1 假装提交成功但还没出队 (去重)
+        for row in (_row("s", "q2", "user"), _row("other", "x", "user"), _row("s", "a2", "ai")):
+            buffer.add(row)
+        buffer._inflight = [_row("s", "a1", "ai")]
+
+        flushes = []
+        monkeypatch.setattr(buffer, "flush", lambda: flushes.append(1))
+        history = await load_session_history("s")
+        assert not flushes
+        return history
+
+    assert asyncio.run(scenario()) == [("ai", "ai-a1"), ("user", "user-q2"), ("ai", "ai-a2")]
+
+
+def test_history_page_merges_buffered_rows_without_flushing(session_factory, monkeypatch):
+    from routers.chat import get_history
+
+    buffer = WriteBehindBuffer(session_factory)
+    monkeypatch.setattr(chat_sessions, "write_buffer", buffer)
+
+    async def scenario():
+        for msg_id, role in (("q1", "user"), ("a1", "ai"), ("q2", "user")):
+            buffer.add(_row("s", msg_id, role))
+        await buffer.flush()
+        buffer.add(_row("s", "a2", "ai"))
+        buffer.add(_row("other", "x", "user"))
+
+        flushes = []
+        monkeypatch.setattr(buffer, "flush", lambda: flushes.append(1))
+        async with session_factory() as db:
+            newest = await get_history(session_id="s", before_id=None, limit=2, db=db)
+            older = await get_history(session_id="s", before_id=newest["next_before_id"], limit=2, db=db)
+        assert not flushes
+        return newest, older
+
+    newest, older = asyncio.run(scenario())
+    assert [m["msg_id"] for m in newest["history"]] == ["q2", "a2"]
+    assert newest["history"][1]["id"] is None  # 还没写进数据库
+    assert [m["msg_id"] for m in older["history"]] == ["q1", "a1"]
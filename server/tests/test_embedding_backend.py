@@ -0,0 +1,30 @@
+# server/tests/test_embedding_backend.py
+# 🧠 ONNX 后端加载失败：默认退回 PyTorch 且缓存键跟着变；strict 模式直接报错
+import pytest
+from langchain_community import embeddings as lc_embeddings
+
+import config
+from embedding_backend import cache_model_key, create_embeddings
+
+
+class _FakeHF:
+    def __init__(self, model_name, model_kwargs=None):
+        if (model_kwargs or {}).get("backend") == "onnx":
+            raise RuntimeError("onnxruntime not installed")
+        self.model_name = model_name
+
+
+@pytest.fixture(autouse=True)
+def fake_hf(monkeypatch):
+    monkeypatch.setattr(lc_embeddings, "HuggingFaceEmbeddings", _FakeHF)
+
+
+def test_onnx_failure_falls_back_with_matching_cache_key():
+    model, backend = create_embeddings("onnx")
+    assert isinstance(model, _FakeHF) and backend == "hf"
+    assert cache_model_key(backend) == config.EMBEDDING_MODEL_NAME != cache_model_key("onnx")
+
+
+def test_strict_mode_raises_instead_of_falling_back():
+    with pytest.raises(RuntimeError):
+        create_embeddings("onnx", strict=True)
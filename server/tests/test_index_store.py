@@ -0,0 +1,140 @@
+# server/tests/test_index_store.py
+# 💾 索引持久化的崩溃安全：重放 delta 日志、截掉写了一半的记录、最新快照坏了退回上一个
+import os
+
+from index_store import IndexStore
+from knowledge_base import DEFAULT_KB, KnowledgeBase
+
+
+def _open(root, embeddings):
+    kb = KnowledgeBase(DEFAULT_KB, str(root))
+    kb.ensure_loaded(embeddings)
+    return kb
+
+
+def _add(kb, embeddings, filename, n):
+    texts = [f"{filename} 第{i}段：报销需要部门负责人审批" for i in range(n)]
+    ids = [f"{filename}-{i}" for i in range(n)]
+    kb.add_embedded(filename, ids, texts, [{"source": filename}] * n, embeddings.embed_documents(texts), embeddings)
+    return ids
+
+
+def _reopen(kb, embeddings):
+    kb.unload()
+    return _open(kb.path, embeddings)
+
+
+def test_replay_restores_adds_and_deletes(tmp_path, embeddings):
+    kb = _open(tmp_path, embeddings)
+    _add(kb, embeddings, "a.pdf", 3)
+    ids_b = _add(kb, embeddings, "b.pdf", 2)
+    kb.delete_file("a.pdf", embeddings, ids=["a.pdf-0"])
+    kb.store.close()  # 模拟进程退出：没有写快照，只剩日志
+
+    kb = _reopen(kb, embeddings)
+    assert kb.ntotal() == 4
+    assert kb.file_index == {"a.pdf": ["a.pdf-1", "a.pdf-2"], "b.pdf": ids_b}
+    assert sorted(kb.vector_store.index_to_docstore_id.values()) == sorted(["a.pdf-1", "a.pdf-2"] + ids_b)
+
+
+def test_torn_tail_is_truncated(tmp_path, embeddings):
+    kb = _open(tmp_path, embeddings)
+    _add(kb, embeddings, "a.pdf", 2)
+    log_path = kb.store._log_path(kb.store.version)
+    valid_size = os.path.getsize(log_path)
+    kb.store.close()
+    with open(log_path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\xde\xad\xbe\xef half a rec")  # 崩溃时写了一半的记录
+
+    kb = _reopen(kb, embeddings)
+    assert kb.ntotal() == 2
+    assert os.path.getsize(log_path) == valid_size
+
+    # 截掉之后新记录接着追加，重启还能读到
+    _add(kb, embeddings, "b.pdf", 1)
+    kb.store.close()
+    kb = _reopen(kb, embeddings)
+    assert kb.ntotal() == 3
+    assert set(kb.file_index) == {"a.pdf", "b.pdf"}
+
+
+def test_falls_back_to_previous_snapshot(tmp_path, embeddings):
+    kb = _open(tmp_path, embeddings)
+    _add(kb, embeddings, "a.pdf", 2)
+    kb.save(force=True)
+    _add(kb, embeddings, "b.pdf", 2)
+    kb.save(force=True)
+    assert kb.store.version == 2
+    kb.store.close()
+    with open(os.path.join(kb.store._snapshot_dir(2), "index.faiss"), "wb") as f:
+        f.write(b"corrupted")
+
+    kb = _reopen(kb, embeddings)
+    # 快照 1 + 它的日志 (b.pdf 在快照 1 之后写进了 delta-000001.log) 还原出全部数据
+    assert kb.store.version == 1
+    assert kb.ntotal() == 4
+    assert set(kb.file_index) == {"a.pdf", "b.pdf"}
+    with open(os.path.join(str(tmp_path), "CURRENT"), encoding="utf-8") as f:
+        assert f.read() == "snapshot-000001"
+
+
+def test_unappliable_record_is_skipped_on_replay(tmp_path, embeddings):
+    kb = _open(tmp_path, embeddings)
+    _add(kb, embeddings, "a.pdf", 2)
+    # 日志里有一条删除已经不存在的 ID 的记录，和一条向量维度不对、根本加不进去的记录
+    kb.store.append_delete("a.pdf", ["missing-id"])
+    kb.store.append_add("c.pdf", ["c-0"], ["x"], [{}], [[0.0] * 5])
+    _add(kb, embeddings, "b.pdf", 1)
+    kb.store.close()
+
+    kb = _reopen(kb, embeddings)
+    assert kb.ntotal() == 3
+    assert set(kb.file_index) == {"a.pdf", "b.pdf"}
+
+
+def test_delete_is_idempotent(tmp_path, embeddings):
+    kb = _open(tmp_path, embeddings)
+    _add(kb, embeddings, "a.pdf", 3)
+    assert kb.delete_file("a.pdf", embeddings, ids=["a.pdf-0"]) == 1
+    log_size = kb.store.log_offset
+    # 同样的 ID 再删一次 (例如两个替换任务算出了同一批旧切片)：什么都不写
+    assert kb.delete_file("a.pdf", embeddings, ids=["a.pdf-0"]) == 0
+    assert kb.store.log_offset == log_size
+    kb.store.close()
+
+    kb = _reopen(kb, embeddings)
+    assert kb.ntotal() == 2
+
+
+def test_load_without_snapshot_or_log(tmp_path, embeddings):
+    store = IndexStore(str(tmp_path / "empty"))
+    vector_store, file_index, _ = store.load(embeddings)
+    assert vector_store is None and file_index == {}
+    store.close()
+
+
+def test_read_only_load_leaves_files_untouched(tmp_path, embeddings):
+    kb = _open(tmp_path, embeddings)
+    _add(kb, embeddings, "a.pdf", 2)
+    kb.save(force=True)
+    _add(kb, embeddings, "b.pdf", 2)
+    kb.save(force=True)
+    _add(kb, embeddings, "c.pdf", 1)
+    kb.store.close()
+    with open(os.path.join(kb.store._snapshot_dir(2), "index.faiss"), "wb") as f:
+        f.write(b"corrupted")
+    log_path = kb.store._log_path(2)
+    with open(log_path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00 half")
+
+    def listing():
+        return {name: os.stat(os.path.join(str(tmp_path), name)).st_mtime_ns for name in os.listdir(str(tmp_path))}
+
+    before, log_size = listing(), os.path.getsize(log_path)
+    store = IndexStore(str(tmp_path))
+    vector_store, file_index, _ = store.load(embeddings, read_only=True)
+    # 退回快照 1 读出了数据，但 CURRENT 没改、残缺的日志没截、也没建新的日志文件
+    assert store.version == 1 and vector_store.index.ntotal == 4
+    assert listing() == before
+    assert os.path.getsize(log_path) == log_size
+    store.close()
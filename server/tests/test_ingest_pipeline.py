@@ -0,0 +1,37 @@
+# server/tests/test_ingest_pipeline.py
+# 🏭 PDF 解析子进程崩溃 (OOM 被杀、畸形文件) 只让当前文件失败，下一个文件换新进程池照常入库
+import os
+import random
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import config
+import ingest_pipeline
+from benchmarks.corpus import write_pdf
+from knowledge_base import DEFAULT_KB
+from rag_core import RAGService
+
+
+def test_ingest_recovers_after_a_parse_worker_dies(tmp_path, monkeypatch, embeddings):
+    monkeypatch.setattr(config, "VECTOR_STORE_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(config, "INGEST_PARSE_WORKERS", 1)
+    service = RAGService(embeddings=embeddings)
+    pdf = str(tmp_path / "a.pdf")
+    write_pdf(pdf, 3, random.Random(0))
+
+    try:
+        # 把唯一的解析子进程直接杀掉，进程池变成 BrokenProcessPool
+        broken = ingest_pipeline.get_process_pool(1)
+        with pytest.raises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+        with pytest.raises(BrokenProcessPool):
+            service.add_pdf(pdf)
+
+        service.add_pdf(pdf)
+        assert ingest_pipeline.get_process_pool(1) is not broken
+        with service._use_kb(DEFAULT_KB) as kb:
+            assert kb.ntotal() > 0
+    finally:
+        ingest_pipeline.shutdown_process_pool()
@@ -0,0 +1,83 @@
+# server/tests/test_jobs.py
+# 🧵 后台入库任务：同名文件串行、相同内容不重复提交、排队满了返回 None
+import threading
+import time
+
+from jobs import IngestJobManager
+
+
+def _wait(manager):
+    deadline = time.time() + 5
+    while any(j.status in ("pending", "running") for j in manager._jobs.values()):
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_same_file_runs_one_at_a_time():
+    manager = IngestJobManager(max_workers=4, max_pending=10)
+    running, peak, order = [0], [0], []
+    lock = threading.Lock()
+
+    def handler(name):
+        def run(path, progress=None):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            order.append(name)
+            with lock:
+                running[0] -= 1
+        return run
+
+    for i in range(3):
+        manager.submit("a.pdf", f"/tmp/a{i}", handler(f"a{i}"), kb="默认", sha256=f"v{i}")
+    manager.submit("b.pdf", "/tmp/b", handler("b"), kb="默认", sha256="vb")
+    _wait(manager)
+    assert [name for name in order if name.startswith("a")] == ["a0", "a1", "a2"]
+    assert "b" in order
+    assert peak[0] == 2  # b.pdf 和 a.pdf 并行，a.pdf 的三个版本串行
+
+
+def test_same_content_is_not_submitted_twice():
+    manager = IngestJobManager(max_workers=1, max_pending=10)
+    release = threading.Event()
+    first = manager.submit("a.pdf", "/tmp/a", lambda path, progress=None: release.wait(5), kb="默认", sha256="same")
+    assert manager.submit("b.pdf", "/tmp/b", lambda path, progress=None: None, kb="默认", sha256="same") is first
+    # 别的知识库里的同样内容照常提交
+    other = manager.submit("[财务]b.pdf", "/tmp/c", lambda path, progress=None: None, kb="财务", sha256="same")
+    assert other is not first
+    release.set()
+    _wait(manager)
+
+
+def test_full_queue_returns_none():
+    manager = IngestJobManager(max_workers=1, max_pending=1)
+    release = threading.Event()
+    assert manager.submit("a.pdf", "/tmp/a", lambda path, progress=None: release.wait(5)) is not None
+    assert manager.submit("b.pdf", "/tmp/b", lambda path, progress=None: None) is None
+    release.set()
+    _wait(manager)
+
+
+def test_delete_is_refused_while_the_file_is_ingesting(monkeypatch):
+    import asyncio
+
+    import pytest
+    from fastapi import HTTPException
+
+    from routers import upload
+
+    manager = IngestJobManager(max_workers=1, max_pending=10)
+    monkeypatch.setattr(upload, "job_manager", manager)
+    release = threading.Event()
+    job = manager.submit("[财务]a.pdf", "/tmp/a", lambda path, progress=None: release.wait(5), kb="财务")
+    assert manager.active("[财务]a.pdf", kb="财务") is job
+    assert manager.active("[财务]a.pdf", kb="默认") is None
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(upload.delete_file("[财务]a.pdf"))
+    assert excinfo.value.status_code == 409
+
+    release.set()
+    _wait(manager)
+    assert manager.active("[财务]a.pdf", kb="财务") is None
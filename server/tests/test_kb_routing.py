@@ -0,0 +1,57 @@
+# server/tests/test_kb_routing.py
+# 🧭 不指定知识库的检索只查向量均值离问题最近的知识库，用到的知识库在检索过程中不会被卸载
+import config
+from knowledge_base import DEFAULT_KB, KnowledgeBase, snapshot_centroid
+from rag_core import RAGService
+
+
+def _make_kb(root, name, texts, embeddings):
+    kb = KnowledgeBase(name, str(root))
+    kb.ensure_loaded(embeddings)
+    ids = [f"{name}-{i}" for i in range(len(texts))]
+    kb.add_embedded(f"[{name}]a.pdf", ids, texts, [{}] * len(texts), embeddings.embed_documents(texts), embeddings)
+    kb.save(force=True)
+    kb.unload()
+
+
+def _service(tmp_path, monkeypatch, embeddings, **overrides):
+    monkeypatch.setattr(config, "VECTOR_STORE_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    for key, value in overrides.items():
+        monkeypatch.setattr(config, key, value)
+    return RAGService(embeddings=embeddings)
+
+
+def test_query_without_kb_searches_nearest_kb_only(tmp_path, monkeypatch, embeddings):
+    root = tmp_path / "index"
+    for name in ("财务", "人事", "行政"):
+        _make_kb(root, name, [f"{name}制度"], embeddings)
+    assert snapshot_centroid(str(root), "财务") is not None
+    service = _service(tmp_path, monkeypatch, embeddings, KB_ROUTE_TOP_N=1)
+
+    hits = service._retrieve_with_scores("人事制度", embeddings.embed_query("人事制度"), k=4, hybrid=False)
+    assert [doc.page_content for doc, _ in hits] == ["人事制度"]
+    # 默认知识库还没有快照 (没有均值可比)，总是检索；其它两个分类没加载
+    assert {name for name, kb in service.kbs.items() if kb.loaded} == {DEFAULT_KB, "人事"}
+
+
+def test_kbs_of_one_query_are_not_evicted_mid_query(tmp_path, monkeypatch, embeddings):
+    root = tmp_path / "index"
+    for name in ("财务", "人事"):
+        _make_kb(root, name, [f"{name}制度"], embeddings)
+    service = _service(tmp_path, monkeypatch, embeddings, KB_ROUTE_TOP_N=0, KB_MEMORY_LIMIT_MB=0)
+    unloaded = []
+    original = KnowledgeBase.unload
+    monkeypatch.setattr(KnowledgeBase, "unload", lambda kb: (unloaded.append(kb.name), original(kb)))
+
+    hits = service._retrieve_with_scores("制度", embeddings.embed_query("制度"), k=4, hybrid=False)
+    assert len(hits) == 2
+    # 内存上限是 0，但检索期间用到的知识库一个都没卸载
+    assert unloaded == []
+
+
+def test_delete_unknown_category_creates_nothing(tmp_path, monkeypatch, embeddings):
+    service = _service(tmp_path, monkeypatch, embeddings)
+    service.delete_file("[没有这个分类]a.pdf")
+    assert service.list_kbs() == [DEFAULT_KB]
+    assert not (tmp_path / "index" / "kbs").exists()
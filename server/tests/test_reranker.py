@@ -0,0 +1,72 @@
+# server/tests/test_reranker.py
+# 🎯 重排时间预算：超时的任务取消掉，线程池积压满了直接跳过
+import asyncio
+import threading
+import time
+
+from langchain_core.documents import Document
+
+from reranker import CrossEncoderReranker
+
+
+class _SlowModel:
+    """predict 会一直卡住，直到测试放行；分数就是片段长度。"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, pairs, batch_size=16):
+        self.release.wait(5)
+        return [len(text) for _, text in pairs]
+
+
+def _reranker(max_workers=1, max_inflight=2):
+    reranker = CrossEncoderReranker("fake", max_workers=max_workers, max_inflight=max_inflight)
+    reranker._model = _SlowModel()
+    return reranker
+
+
+def _wait_idle(reranker):
+    deadline = time.monotonic() + 5
+    while reranker._inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reranker._inflight == 0
+
+
+def test_timeout_cancels_queued_work_and_backlog_skips():
+    reranker = _reranker(max_workers=1, max_inflight=2)
+    docs = [Document(page_content="a"), Document(page_content="ccc"), Document(page_content="bb")]
+
+    # 第一个任务占住唯一的线程，超时后取消不掉 (已经在算)，名额继续占着
+    assert reranker.rerank("q", docs, 2, 0.05) == (docs[:2], "timeout")
+    assert reranker._inflight == 1
+    # 第二个还在排队，超时后被取消，名额立刻还回来
+    assert reranker.rerank("q2", docs, 2, 0.05) == (docs[:2], "timeout")
+    assert reranker._inflight == 1
+
+    # 积压满了：不提交，直接返回召回顺序
+    reranker.max_inflight = 1
+    assert reranker.rerank("q3", docs, 2, 1.0) == (docs[:2], "skipped")
+    assert asyncio.run(reranker.arerank("q3", docs, 2, 1.0)) == (docs[:2], "skipped")
+
+    reranker._model.release.set()
+    _wait_idle(reranker)
+    ranked, status = asyncio.run(reranker.arerank("q3", docs, 2, 1.0))
+    assert status is None
+    assert [d.page_content for d in ranked] == ["ccc", "bb"]
+
+
+def test_async_timeout_releases_slot():
+    reranker = _reranker(max_workers=1, max_inflight=2)
+    docs = [Document(page_content="a"), Document(page_content="bb")]
+
+    async def scenario():
+        first = await reranker.arerank("q", docs, 1, 0.05)
+        second = await reranker.arerank("q2", docs, 1, 0.05)
+        return first, second
+
+    assert asyncio.run(scenario()) == ((docs[:1], "timeout"), (docs[:1], "timeout"))
+    # 排队的那个被取消了，只剩在跑的占着名额
+    assert reranker._inflight == 1
+    reranker._model.release.set()
+    _wait_idle(reranker)
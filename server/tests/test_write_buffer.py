@@ -0,0 +1,90 @@
+# server/tests/test_write_buffer.py
+# ✍️ 批量写入：退出时不丢已取出的批次，一条坏记录不会堵住后面的写入
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from models import ChatHistory
+from write_buffer import WriteBehindBuffer
+
+
+async def _msg_ids(session_factory):
+    async with session_factory() as db:
+        return sorted((await db.execute(select(ChatHistory.msg_id))).scalars())
+
+
+def _row(msg_id):
+    return ChatHistory(session_id="s", msg_id=msg_id, role="user", content=msg_id)
+
+
+def test_stop_finishes_the_batch_in_flight(session_factory):
+    class SlowSession:
+        """提交要花点时间的会话：stop() 正好赶上后台任务在提交中途。"""
+
+        def __init__(self):
+            self._db = session_factory()
+
+        async def __aenter__(self):
+            self.db = await self._db.__aenter__()
+            return self
+
+        async def __aexit__(self, *exc):
+            return await self._db.__aexit__(*exc)
+
+        def add_all(self, rows):
+            self.db.add_all(rows)
+
+        async def commit(self):
+            await asyncio.sleep(0.05)
+            await self.db.commit()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(SlowSession, flush_ms=1, batch_size=2)
+        buffer.start()
+        for i in range(5):
+            buffer.add(_row(f"m{i}"))
+        await asyncio.sleep(0.02)  # 后台任务已经取出第一批，正在提交
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert asyncio.run(_msg_ids(session_factory)) == [f"m{i}" for i in range(5)]
+    assert buffer.written == 5 and not buffer._pending
+
+
+def test_bad_row_is_dropped_without_blocking_the_rest(session_factory):
+    async def scenario():
+        buffer = WriteBehindBuffer(session_factory, batch_size=10)
+        buffer.add(_row("dup"))
+        await buffer.flush()
+        # 确认丢了的重试：同一个 msg_id 又进了队列，和后面的新记录在同一批里
+        for msg_id in ("a", "dup", "b"):
+            buffer.add(_row(msg_id))
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert asyncio.run(_msg_ids(session_factory)) == ["a", "b", "dup"]
+    assert buffer.dropped == 1 and not buffer._pending
+
+
+def test_database_outage_keeps_rows_for_retry(session_factory):
+    class DownSession:
+        async def __aenter__(self):
+            raise OperationalError("connect", {}, Exception("database is down"))
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def scenario():
+        buffer = WriteBehindBuffer(DownSession, batch_size=10)
+        for msg_id in ("a", "b"):
+            buffer.add(_row(msg_id))
+        await buffer.flush()
+        assert [row.msg_id for row in buffer._pending] == ["a", "b"]
+        buffer.session_factory = session_factory
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    assert asyncio.run(_msg_ids(session_factory)) == ["a", "b"]
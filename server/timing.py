@@ -0,0 +1,68 @@
+# server/timing.py
+# ⏱️ 分阶段计时：with timer.stage("xxx"): ... 结束后 timer.timings["xxx"] 就是耗时 (毫秒)
+import threading
+import time
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    # accumulate=True: 同一个阶段进出多次，耗时累加 (例如入库时一批一批地写索引)
+    def stage(self, name, accumulate=False):
+        return _Stage(self, name, accumulate)
+
+    def record(self, name, ms):
+        self.timings[name] = round(ms, 2)
+
+    # 同一个阶段分好几段跑 (例如入库时一批一批地嵌入)，耗时累加；多个线程同时加也没问题
+    def add(self, name, ms):
+        with self._lock:
+            self.timings[name] = round(self.timings.get(name, 0) + ms, 2)
+
+    # 从创建 timer 到现在过了多少毫秒
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    # 📈 把各阶段耗时 (秒) 记进带 stage 标签的直方图；names 不传就是所有数值型的阶段
+    def observe(self, histogram, names=None):
+        for name, ms in self.timings.items():
+            if names is not None and name not in names:
+                continue
+            if isinstance(ms, (int, float)) and not isinstance(ms, bool):
+                histogram.labels(stage=name).observe(ms / 1000)
+
+
+class _Stage:
+    def __init__(self, timer, name, accumulate=False):
+        self.timer = timer
+        self.name = name
+        self.accumulate = accumulate
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.start) * 1000
+        if self.accumulate:
+            self.timer.add(self.name, ms)
+        else:
+            self.timer.record(self.name, ms)
+        return False
+
+
+def timed_iter(iterable, timer, name):
+    """包一层迭代器：每次取下一个元素花的时间累加到 timer 的 name 阶段 (用来给边解析边产出的生成器计时)。"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timer.add(name, (time.perf_counter() - start) * 1000)
+            return
+        timer.add(name, (time.perf_counter() - start) * 1000)
+        yield item
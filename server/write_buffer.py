@@ -0,0 +1,130 @@
+# server/write_buffer.py
+# ✍️ 聊天记录 / 反馈的批量写入 (write-behind)
+# 请求里只把要写的行放进内存队列就返回，后台任务每 DB_WRITE_FLUSH_MS 毫秒 (或攒够一批) 一次性 INSERT
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+import config
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """攒一批 ORM 对象一次提交，聊天接口不用等数据库往返。
+
+    写失败的批次放回队列下次重试；数据库长时间不可用时最多在内存里压 max_pending 条，超出丢最早的。
+    批次因为某一行本身有问题 (唯一键冲突、数据超长) 写不进去时改成逐行写，只丢掉写不进去的那几行，
+    不会让一条坏记录堵住后面所有的写入。
+    """
+
+    def __init__(self, session_factory, flush_ms=200, batch_size=200, max_pending=10000):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = []
+        self._inflight = []  # 已经从队列取出、正在提交的一批
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+
+    def add(self, row):
+        # 入队时就记下时间：create_time 的默认值要到 INSERT 时才算，同一批的几条会变成同一个时间
+        if getattr(row, "create_time", None) is None:
+            row.create_time = datetime.now()
+        self._pending.append(row)
+        if len(self._pending) > self.max_pending:
+            overflow = len(self._pending) - self.max_pending
+            del self._pending[:overflow]
+            self.dropped += overflow
+            logger.warning(f"⚠️ [DB] 待写入的记录太多，丢弃了最早的 {overflow} 条")
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """把当前攒着的记录全部写进去 (读历史记录前调用，保证刚写的能读到)。"""
+        async with self._flush_lock:
+            while self._pending:
+                rows, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                try:
+                    await self._commit(rows)
+                except (IntegrityError, DataError) as e:
+                    logger.warning(f"⚠️ [DB] 批量写入 {len(rows)} 条被拒绝，改为逐行写入: {e.orig}")
+                    if not await self._commit_one_by_one(rows):
+                        return
+                except Exception as e:
+                    logger.error(f"❌ [DB] 批量写入 {len(rows)} 条失败，稍后重试: {e}")
+                    self._pending[:0] = rows
+                    return
+
+    async def _commit(self, rows):
+        self._inflight = rows
+        try:
+            async with self.session_factory() as db:
+                db.add_all(rows)
+                await db.commit()
+        finally:
+            self._inflight = []
+        self.written += len(rows)
+
+    def pending(self):
+        """还没确认写进数据库的记录 (正在提交的一批 + 队列里的)，按入队顺序；读的时候不用先 flush。"""
+        return self._inflight + self._pending
+
+    # 逐行写：行本身有问题 (比如确认丢了但其实已经提交过的记录再插一次，撞了唯一键) 就丢掉这一行；
+    # 遇到数据库本身的故障就把没写的放回队列，返回 False 等下次重试
+    async def _commit_one_by_one(self, rows):
+        for i, row in enumerate(rows):
+            try:
+                await self._commit([row])
+            except (IntegrityError, DataError) as e:
+                self.dropped += 1
+                logger.error(f"❌ [DB] 记录写不进去，已丢弃 ({type(row).__name__} msg_id={getattr(row, 'msg_id', None)}): {e.orig}")
+            except Exception as e:
+                logger.error(f"❌ [DB] 逐行写入失败，稍后重试: {e}")
+                self._pending[:0] = rows[i:]
+                return False
+        return True
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    # 🧹 退出前把剩下的记录写完
+    # 不 cancel 后台任务：取消可能打断正在提交的一批，已经从队列里取出的记录就不知道写没写进去了
+    # 只通知它这一轮写完就退出，等它结束后再把剩下的写掉
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.warning(f"⚠️ [DB] 退出时还有 {len(self._pending)} 条记录没能写入")
+
+
+# 全局对象，main.py 启动时 start()，退出时 stop()
+write_buffer = WriteBehindBuffer(
+    SessionLocal,
+    flush_ms=config.DB_WRITE_FLUSH_MS,
+    batch_size=config.DB_WRITE_BATCH_SIZE,
+    max_pending=config.DB_WRITE_MAX_PENDING,
+)
@@ -17,6 +17,10 @@ function App() {
   //模型选择状态
   const [currentModel, setCurrentModel] = useState('deepseek-chat');
 
+  // 知识库选择状态 ('' 表示自动：后端挑最相关的几个知识库)
+  const [kbs, setKbs] = useState<string[]>([]);
+  const [currentKb, setCurrentKb] = useState('');
+
   // 🆕 新增：文件列表状态 (之前缺这个)
   const [files, setFiles] = useState<any[]>([]);
 
@@ -47,6 +51,16 @@ function App() {
       } catch (e) {
         console.error("加载文件列表失败:", e);
       }
+
+      // C. 加载知识库列表
+      try {
+        const kbList = await chatApi.getKbs();
+        if (Array.isArray(kbList)) {
+            setKbs(kbList);
+        }
+      } catch (e) {
+        console.error("加载知识库列表失败:", e);
+      }
     };
 
     initData();
@@ -78,10 +92,10 @@ function App() {
           lastMsg.content = fullText;
           return newMessages;
         });
-      });
+      }, currentKb || undefined);
     } catch (error) {
       console.error(error);
-      alert("生成失败");
+      alert(error instanceof Error ? error.message : "生成失败");
     } finally {
       setLoading(false);
     }
@@ -94,8 +108,19 @@ function App() {
 
     setLoading(true);
     try {
-      await chatApi.uploadFile(file);
-      alert('📚 上传并学习完成！');
+      const result = await chatApi.uploadFile(file);
+
+      // 后端改成后台入库了，这里轮询任务状态，直到学习完成
+      if (result && result.job_id) {
+        while (true) {
+          await new Promise(resolve => setTimeout(resolve, 1000));
+          const job = await chatApi.getUploadJob(result.job_id);
+          if (job.status === 'success') break;
+          if (job.status === 'failed') throw new Error(job.error);
+        }
+      }
+      // 内容和已入库的文件一样，后端直接跳过了
+      alert(result && result.status === 'skipped' ? `⏭️ ${result.message}` : '📚 上传并学习完成！');
       
       // 刷新文件列表
       const updatedList = await chatApi.getFiles();
@@ -203,6 +228,17 @@ function App() {
                 <option value="qwen-plus">通义千问PLUS (Qwen PLUS)</option>
                 <option value="gpt-3.5-turbo">OpenAI GPT-3.5 Turbo</option>
               </select>
+              {/* 知识库选择：选定后只检索这一个知识库 */}
+              <select
+                value={currentKb}
+                onChange={(e) => setCurrentKb(e.target.value)}
+                style={{ padding: '5px', borderRadius: '4px', border: '1px solid #ccc' }}
+              >
+                <option value="">自动选择知识库</option>
+                {kbs.map((kb) => (
+                  <option key={kb} value={kb}>{kb}</option>
+                ))}
+              </select>
             </div>
 
 
@@ -21,15 +21,21 @@ export const chatApi = {
 
     // ➕ 新增：流式对话
     // onMessage 是一个回调函数，每收到一个字，就调用它一次
-    chatStream: async (question: string, model: string, onMessage: (text: string) => void) => {
+    // kb: 只在某个知识库 (分类) 里检索，不传就由后端挑最相关的几个知识库
+    chatStream: async (question: string, model: string, onMessage: (text: string) => void, kb?: string) => {
         const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/chat`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ question, model  }),
+            body: JSON.stringify({ question, model, kb }),
         });
 
+        // 🚦 服务端繁忙 (排队满了) 会直接回 429，不能把错误 JSON 当成回答显示
+        if (!response.ok) {
+            const data = await response.json().catch(() => null);
+            throw new Error(data?.detail || `请求失败 (${response.status})`);
+        }
         if (!response.body) return;
 
         // 1. 获取读取器
@@ -58,6 +64,12 @@ export const chatApi = {
         return response.data;
     },
 
+    // ➕ 新增：查询后台入库任务进度
+    getUploadJob: async (jobId: string) => {
+        const response = await apiClient.get(`/upload/jobs/${jobId}`);
+        return response.data;
+    },
+
     // 点赞反馈
     sendFeedback: async (msgId: string, score: number) => {
         const response = await apiClient.post('/feedback', {
@@ -81,6 +93,12 @@ export const chatApi = {
         return response.data;
     },
 
+    // ➕ 新增：获取知识库 (分类) 列表
+    getKbs: async () => {
+        const response = await apiClient.get('/kbs');
+        return response.data;
+    },
+
     // ➕ 新增：获取文件列表
     getFiles: async () => {
         const response = await apiClient.get('/upload/list');